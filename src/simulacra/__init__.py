@@ -11,4 +11,4 @@ os.environ['FOR_DISABLE_CONSOLE_CTRL_HANDLER'] = '1'
 
 from .sims import *
 from .info import Info
-from . import math, utils, vis, cluster, units, summables, exceptions
+from . import math, utils, vis, cluster, units, summables, exceptions, serialization, bundles
@@ -0,0 +1,279 @@
+import collections.abc
+import json
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from . import serialization
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+BUNDLE_MAGIC = b'SIMULACRA-BUNDLE'
+BUNDLE_VERSION = 1
+
+_FOOTER = struct.Struct('>QQQ')  # index offset, index length, offset table offset
+_TABLE_DTYPE = np.dtype('>u8')  # (offset, length) of each record
+
+
+class BeetBundle(collections.abc.Mapping):
+    """
+    A single file holding many saved :class:`simulacra.Beet`, each of which can be loaded individually by name without reading the others.
+
+    Bundles are written by :class:`BeetBundleWriter`.
+    Each Beet is stored in the same format as :func:`simulacra.Beet.save`, and an offset table at the end of the file records where each one starts.
+    Bundles are mappings from names (usually the ``file_name`` of each Beet) to the loaded Beets.
+    Integer names are converted to strings, so Specifications can be looked up by their simulation number.
+
+    .. code-block:: python
+
+        with BeetBundle(path) as bundle:
+            spec = bundle[42]
+    """
+
+    def __init__(self, path: Union[Path, str], mmap: bool = False, store: Optional[serialization.ContentStore] = None):
+        """
+        Parameters
+        ----------
+        path
+            The path to the bundle.
+        mmap
+            If ``True``, memory-map large numpy arrays when loading Beets (see :func:`simulacra.Beet.load`).
+        store
+            The :class:`simulacra.serialization.ContentStore` that the Beets were written with, if any.
+        """
+        self.path = Path(path)
+        self.mmap = mmap
+        self.store = store
+
+        self._file = self.path.open(mode = 'rb')
+        self._lock = threading.Lock()
+
+        try:
+            if self._file.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+                raise ValueError(f'{self.path} is not a Simulacra bundle')
+
+            self._file.seek(-(_FOOTER.size + len(BUNDLE_MAGIC)), os.SEEK_END)
+            index_offset, index_length, table_offset = _FOOTER.unpack(self._file.read(_FOOTER.size))
+            if self._file.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+                raise ValueError(f'{self.path} is not a complete Simulacra bundle')
+
+            self._file.seek(index_offset)
+            index = json.loads(self._file.read(index_length).decode('utf-8'))
+
+            self.names = index['names']
+            self._table = np.frombuffer(self._file.read(len(self.names) * 2 * _TABLE_DTYPE.itemsize), dtype = _TABLE_DTYPE).reshape(-1, 2)
+            self._positions = {name: position for position, name in enumerate(self.names)}
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close the bundle file."""
+        self._file.close()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(path = {self.path}, len = {len(self)})'
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __contains__(self, name) -> bool:
+        return str(name) in self._positions
+
+    def _seek(self, name: Union[str, int]):
+        offset, _ = self._table[self._positions[str(name)]]
+        self._file.seek(int(offset))
+
+    def __getitem__(self, name: Union[str, int]) -> Any:
+        """Load the Beet with the given name."""
+        with self._lock:
+            self._seek(name)
+            return serialization.load(self._file, mmap = self.mmap, store = self.store)
+
+    def read_bytes(self, name: Union[str, int]) -> bytes:
+        """Return the stored bytes of the Beet with the given name, exactly as :func:`simulacra.Beet.save` would have written them."""
+        with self._lock:
+            offset, length = self._table[self._positions[str(name)]]
+            self._file.seek(int(offset))
+            return self._file.read(int(length))
+
+    def load_metadata(self, name: Union[str, int]) -> Optional[Dict[str, Any]]:
+        """Load the metadata of the Beet with the given name (see :func:`simulacra.Beet.load_metadata`), without loading the Beet itself."""
+        with self._lock:
+            self._seek(name)
+            header = serialization.read_header(self._file)
+
+        if header is None:
+            return None
+
+        return header.get('metadata')
+
+
+class BeetBundleWriter:
+    """
+    Writes a :class:`BeetBundle`, one :class:`simulacra.Beet` at a time.
+
+    The bundle is written to a working file, which replaces the target file atomically when the writer is closed.
+    Should be used as a context manager:
+
+    .. code-block:: python
+
+        with BeetBundleWriter(path) as writer:
+            for spec in specs:
+                writer.add(spec)
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        compressed: bool = True,
+        codec: Optional[Union[str, serialization.Codec]] = None,
+        mmap_threshold: Optional[int] = serialization.CLASS_DEFAULT,
+        store: Optional[serialization.ContentStore] = None,
+    ):
+        """
+        Parameters
+        ----------
+        path
+            The path to write the bundle to.
+        compressed, codec, mmap_threshold, store
+            How to write each Beet (see :func:`simulacra.Beet.save`).
+        """
+        self.path = Path(path).absolute()
+        self.working_path = self.path.with_name(f'{self.path.name}.working')
+
+        self.compressed = compressed
+        self.codec = codec
+        self.mmap_threshold = mmap_threshold
+        self.store = store
+
+        self.names = []
+        self._table = []
+        self._seen = set()
+
+        self.working_path.parent.mkdir(parents = True, exist_ok = True)
+        self._file = self.working_path.open(mode = 'wb')
+        self._file.write(BUNDLE_MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _start_record(self, name: Union[str, int]) -> int:
+        name = str(name)
+        if name in self._seen:
+            raise ValueError(f'{self.path} already has an entry named {name}')
+
+        # start every record aligned, so that uncompressed buffers inside it are aligned in the file too
+        self._file.write(bytes(serialization._padding(self._file.tell())))
+
+        return self._file.tell()
+
+    def _finish_record(self, name: Union[str, int], start: int):
+        name = str(name)
+        self.names.append(name)
+        self._seen.add(name)
+        self._table.append((start, self._file.tell() - start))
+
+    def add(self, beet, name: Optional[Union[str, int]] = None):
+        """
+        Add a Beet to the bundle.
+
+        Parameters
+        ----------
+        beet
+            The :class:`simulacra.Beet` to add.
+        name
+            The name to store the Beet under. Defaults to its ``file_name``.
+        """
+        if name is None:
+            name = beet.file_name
+
+        start = self._start_record(name)
+        beet.dump(self._file, compressed = self.compressed, codec = self.codec, mmap_threshold = self.mmap_threshold, store = self.store)
+        self._finish_record(name, start)
+
+    def add_bytes(self, name: Union[str, int], data: bytes):
+        """Add a Beet that has already been serialized (e.g., by :func:`simulacra.Beet.dump` in another process) to the bundle."""
+        start = self._start_record(name)
+        self._file.write(data)
+        self._finish_record(name, start)
+
+    def close(self) -> Path:
+        """Write the offset table, close the file, and move it into place."""
+        index_offset = self._file.tell()
+        index = json.dumps({'version': BUNDLE_VERSION, 'names': self.names}).encode('utf-8')
+        self._file.write(index)
+
+        table_offset = self._file.tell()
+        self._file.write(np.array(self._table, dtype = _TABLE_DTYPE).reshape(-1, 2).tobytes())
+
+        self._file.write(_FOOTER.pack(index_offset, len(index), table_offset))
+        self._file.write(BUNDLE_MAGIC)
+        self._file.close()
+
+        os.replace(self.working_path, self.path)
+
+        logger.debug(f'Wrote bundle of {len(self.names)} Beets to {self.path}')
+
+        return self.path
+
+    def abort(self):
+        """Close and remove the working file without writing the bundle."""
+        self._file.close()
+        self.working_path.unlink()
+
+
+def write_bundle(
+    path: Union[Path, str],
+    beets: Iterable,
+    compressed: bool = True,
+    codec: Optional[Union[str, serialization.Codec]] = None,
+    mmap_threshold: Optional[int] = serialization.CLASS_DEFAULT,
+    store: Optional[serialization.ContentStore] = None,
+) -> Path:
+    """
+    Write many Beets to a single :class:`BeetBundle`, named by their ``file_name``.
+
+    Parameters
+    ----------
+    path
+        The path to write the bundle to.
+    beets
+        The :class:`simulacra.Beet` to write.
+    compressed, codec, mmap_threshold, store
+        How to write each Beet (see :func:`simulacra.Beet.save`).
+
+    Returns
+    -------
+    path
+        The path to the bundle.
+    """
+    with BeetBundleWriter(path, compressed = compressed, codec = codec, mmap_threshold = mmap_threshold, store = store) as writer:
+        for beet in beets:
+            writer.add(beet)
+
+    return writer.path
@@ -1,3 +1,4 @@
 from .interface import *
+from .async_interface import *
 from .job_creation import *
 from .processing import *
@@ -0,0 +1,356 @@
+import asyncio
+import functools
+import io
+import logging
+import threading
+from concurrent import futures
+from typing import Any, Callable, Iterable, List, Optional
+
+from .. import utils
+from .interface import ClusterInterface, CmdOutput
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class AsyncClusterInterface:
+    """
+    An :mod:`asyncio` version of :class:`ClusterInterface`, for talking to one or more clusters concurrently from a single event loop.
+
+    The blocking :mod:`paramiko` calls are run in a bounded pool of threads, each with its own SFTP channel on the interface's SSH connection, so up to ``max_workers`` transfers and directory listings can be in progress at once for each host.
+    Each command opens its own SSH channel, so commands run concurrently too, unless the interface has a persistent :class:`RemoteShell`, which runs them one at a time per host.
+
+    Should be used as an asynchronous context manager:
+
+    .. code-block:: python
+
+        async with AsyncClusterInterface(hostname, username, key_path) as ci:
+            await ci.mirror_dir(remote_dir)
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        username: str,
+        key_path: str,
+        local_mirror_root: str = 'mirror',
+        persistent_shell: bool = False,
+        max_workers: int = 4,
+    ):
+        """
+        Parameters
+        ----------
+        hostname
+            The hostname of the remote host.
+        username
+            The username to log in with.
+        key_path
+            The path to the SSH key file that corresponds to the `username`.
+        local_mirror_root
+            The name to give the root directory of the local mirror.
+        persistent_shell
+            If ``True``, run commands in a single long-lived :class:`RemoteShell` (see :class:`ClusterInterface`).
+            This saves starting a remote shell for each command, but only one command can run at a time.
+        max_workers
+            The maximum number of blocking operations (transfers, listings, and commands) to run at once.
+        """
+        self.interface = ClusterInterface(
+            hostname,
+            username,
+            key_path,
+            local_mirror_root = local_mirror_root,
+            persistent_shell = persistent_shell,
+        )
+        self.max_workers = max_workers
+
+        self._executor = None
+        self._opened_ftps = []
+        self._opened_ftps_lock = threading.Lock()
+
+    async def __aenter__(self):
+        """Open the SSH and FTP connections."""
+        await self.connect()
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Close the SSH and FTP connections."""
+        await self.close()
+
+    def __str__(self):
+        return f'Async interface to {self.remote_host} as {self.username}'
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(hostname = {self.remote_host}, username = {self.username})'
+
+    @property
+    def remote_host(self) -> str:
+        return self.interface.remote_host
+
+    @property
+    def username(self) -> str:
+        return self.interface.username
+
+    async def connect(self):
+        """Open the connection to the remote host."""
+        await asyncio.get_running_loop().run_in_executor(None, self.interface.connect)
+        self._open_executor()
+
+    def _open_executor(self):
+        """Open the pool of threads that blocking operations run in. Must be called after the SSH connection is open, because each thread opens its own SFTP channel on it."""
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers = self.max_workers,
+            initializer = self.interface._open_thread_ftp,
+            initargs = (self._opened_ftps, self._opened_ftps_lock),
+        )
+
+    async def close(self):
+        """Close the connection to the remote host."""
+        await asyncio.get_running_loop().run_in_executor(None, self._close)
+
+    def _close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait = True)
+            self._executor = None
+        for ftp in self._opened_ftps:
+            ftp.close()
+        self._opened_ftps.clear()
+
+        self.interface.close()
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function in the pool of threads."""
+        if self._executor is None:
+            raise RuntimeError(f'{self} is not connected')
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def remote_home_dir(self) -> str:
+        """The path to the home directory on the remote host."""
+        return await self._run(lambda: self.interface.remote_home_dir)
+
+    def remote_path_to_local_path(self, remote_path: str, local_root: str) -> str:
+        """Return the local path corresponding to a remote path."""
+        return self.interface.remote_path_to_local_path(remote_path, local_root)
+
+    def _cmd(self, *cmds: str) -> CmdOutput:
+        output = self.interface.cmd(*cmds)
+
+        if output.exit_status is None:  # the output is still on an exec channel, so read it now instead of on the event loop
+            stdout, stderr = output.stdout.read(), output.stderr.read()
+            output = CmdOutput(None, io.BytesIO(stdout), io.BytesIO(stderr), output.stdout.channel.recv_exit_status())
+
+        return output
+
+    async def cmd(self, *cmds: str) -> CmdOutput:
+        """Run a list of commands sequentially on the remote host (see :func:`ClusterInterface.cmd`). The output has been read completely by the time it is returned."""
+        return await self._run(self._cmd, *cmds)
+
+    async def cmd_batch(self, cmds: Iterable[str]) -> List[CmdOutput]:
+        """Run many independent commands on the remote host, returning the output of each separately (see :func:`ClusterInterface.cmd_batch`)."""
+        cmds = list(cmds)
+        if self.interface.shell is None:
+            return await asyncio.gather(*(self.cmd(cmd) for cmd in cmds))
+
+        return await self._run(self.interface.cmd_batch, cmds)
+
+    async def get_file(
+        self,
+        remote_path: str,
+        local_path: str,
+        remote_stat = None,
+        preserve_timestamps: bool = True,
+    ):
+        """Download a file from the remote machine to the local machine (see :func:`ClusterInterface.get_file`)."""
+        await self._run(
+            self.interface.get_file,
+            remote_path,
+            local_path,
+            remote_stat = remote_stat,
+            preserve_timestamps = preserve_timestamps,
+        )
+
+    async def mirror_file(
+        self,
+        remote_path: str,
+        remote_stat,
+        local_root: str,
+        force_download: bool = False,
+        integrity_check: bool = True,
+        hash_algorithm: str = 'md5',
+    ) -> str:
+        """Mirror a remote file, only downloading it if it does not match a local copy at a derived local path name (see :func:`ClusterInterface.mirror_file`)."""
+        return await self._run(
+            self.interface.mirror_file,
+            remote_path,
+            remote_stat,
+            local_root,
+            force_download = force_download,
+            integrity_check = integrity_check,
+            hash_algorithm = hash_algorithm,
+        )
+
+    async def walk_remote_path(
+        self,
+        remote_path: str,
+        func_on_dirs: Optional[Callable] = None,
+        func_on_files: Optional[Callable] = None,
+        exclude_hidden: bool = True,
+        blacklist_dir_names: Iterable[str] = (),
+        whitelist_file_ext: Iterable[str] = (),
+        max_pending: Optional[int] = None,
+    ) -> int:
+        """
+        Walk a remote directory starting at the given path, listing up to ``max_workers`` directories at once.
+
+        The functions are passed the full path to the remote file and the ftp.stat of that file, and are called on the event loop.
+        They may be coroutine functions, in which case the calls to ``func_on_files`` are awaited concurrently with the rest of the walk, and the calls to ``func_on_dirs`` are awaited before walking into the directory.
+        The walk waits for a free slot before starting each directory listing or call to ``func_on_files``, so large trees aren't queued up all at once.
+
+        Parameters
+        ----------
+        remote_path
+            The remote path to start walking from.
+        func_on_dirs
+            The function to call on directories.
+        func_on_files
+            The function to call on files.
+        exclude_hidden
+            Do not walk over hidden files or directories.
+        blacklist_dir_names
+            Do not walk over directories with these names.
+        whitelist_file_ext
+            Only walk over files with these extensions.
+        max_pending
+            The maximum number of directory listings and calls to ``func_on_files`` in progress at once. Defaults to four per worker.
+
+        Returns
+        -------
+        path_count : int
+            The number of paths checked.
+        """
+        path_count = 0
+        slots = asyncio.Semaphore(max_pending or 4 * self.max_workers)
+        tasks = set()
+
+        def spawn(coro):
+            tasks.add(asyncio.ensure_future(coro))
+
+        async def call(func, *args):
+            if func is not None:
+                result = func(*args)
+                if asyncio.iscoroutine(result):
+                    await result
+
+        async def call_on_file(*args):
+            try:
+                await call(func_on_files, *args)
+            finally:
+                slots.release()
+
+        async def walk(remote_path: str):
+            nonlocal path_count
+
+            async with slots:  # released before walking into subdirectories, so that waiting walks don't hold slots
+                entries = await self._run(
+                    self.interface._list_remote_dir,
+                    remote_path,
+                    exclude_hidden = exclude_hidden,
+                    blacklist_dir_names = blacklist_dir_names,
+                    whitelist_file_ext = whitelist_file_ext,
+                )
+
+            for full_remote_path, remote_stat, kind in entries:
+                path_count += 1
+
+                if kind == 'dir':
+                    await call(func_on_dirs, full_remote_path, remote_stat)
+
+                    logger.debug(f'Walking remote dir {full_remote_path}')
+                    spawn(walk(full_remote_path))
+                elif kind == 'file':
+                    await slots.acquire()
+                    spawn(call_on_file(full_remote_path, remote_stat))
+
+        spawn(walk(remote_path))
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when = asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    tasks.discard(task)
+                    task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return path_count
+
+    async def mirror_dir(
+        self,
+        remote_dir: str = None,
+        local_root: str = 'mirror',
+        blacklist_dir_names: Iterable[str] = ('python', 'build_python', 'backend', 'logs'),
+        whitelist_file_ext: Iterable[str] = ('.txt', '.json', '.spec', '.bundle', '.value', '.sim', '.pkl'),
+        integrity_check: bool = True,
+        hash_algorithm: str = 'md5',
+        integrity_check_batch_size: int = 200,
+        bulk: bool = False,
+        bulk_compression: Optional[str] = None,
+    ):
+        """
+        Mirror a directory recursively, with up to ``max_workers`` listings and downloads in progress at once.
+
+        If no directory is given, mirror the remote home directory.
+        The parameters are the same as those of :func:`ClusterInterface.mirror_dir`, except that there is no ``workers`` (see ``max_workers`` instead).
+        Incremental mirroring with a :class:`MirrorManifest` (``use_manifest`` and ``recheck_unchanged``) is not supported here: the whole remote tree is walked every time.
+        """
+        remote_dir = remote_dir or await self.remote_home_dir()
+
+        logger.info(f'Mirroring remote dir {remote_dir}')
+
+        to_verify = []
+        to_download = []
+        verifications = []
+
+        def verify(batch):
+            if integrity_check and len(batch) > 0:
+                verifications.append(asyncio.ensure_future(self._run(self.interface.verify_files, batch, hash_algorithm = hash_algorithm)))
+
+        async def mirror(remote_path, remote_stat):
+            if bulk:
+                if not self.interface.is_file_synced(remote_stat, self.remote_path_to_local_path(remote_path, local_root)):
+                    to_download.append((remote_path, remote_stat))
+                return
+
+            local_path, downloaded = await self._run(self.interface._mirror_file, remote_path, remote_stat, local_root = local_root)
+            if downloaded:
+                to_verify.append((remote_path, remote_stat, local_path))
+                if len(to_verify) >= integrity_check_batch_size:
+                    verify(to_verify[:])
+                    to_verify.clear()
+
+        with utils.BlockTimer() as timer:
+            await self.walk_remote_path(
+                remote_dir,
+                func_on_files = mirror,
+                func_on_dirs = lambda d, _: utils.ensure_parents_exist(d),
+                blacklist_dir_names = tuple(blacklist_dir_names),
+                whitelist_file_ext = tuple(whitelist_file_ext),
+            )
+            verify(to_verify)
+
+            failed = []
+            if bulk:
+                downloaded = await self._run(self.interface.download_files_in_bulk, to_download, local_root, compression = bulk_compression)
+                delivered = {remote_path for remote_path, _, _ in downloaded}
+                failed.extend(remote_path for remote_path, _ in to_download if remote_path not in delivered)
+                for start in range(0, len(downloaded), integrity_check_batch_size):
+                    verify(downloaded[start:start + integrity_check_batch_size])
+
+            for failed_batch in await asyncio.gather(*verifications):
+                failed.extend(failed_batch)
+
+        if len(failed) > 0:
+            logger.warning(f'Mirroring complete, but {len(failed)} files were not mirrored correctly. {timer}')
+        else:
+            logger.info(f'Mirroring complete. {timer}')
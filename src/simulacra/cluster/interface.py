@@ -1,20 +1,36 @@
+import io
+import functools
+import json
 import logging
 import os
-import hashlib
 import posixpath
+import re
+import shlex
+import shutil
 import stat
+import tarfile
 import collections
-import functools
-from typing import Any, Iterable, Optional, Callable, Type, Tuple, Union, List
+import threading
+import uuid
+from concurrent import futures
+from pathlib import Path
+from typing import Any, Iterable, Optional, Callable, Type, Tuple, Union, List, Dict, Collection
 
 import paramiko
 
-from .. import utils
+from .. import utils, exceptions
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-CmdOutput = collections.namedtuple('CmdOutput', ['stdin', 'stdout', 'stderr'])
+CmdOutput = collections.namedtuple('CmdOutput', ['stdin', 'stdout', 'stderr', 'exit_status'], defaults = (None,))
+
+TAR_COMPRESSION = {  # compression: (tar flag, tarfile stream mode)
+    None: ('', 'r|'),
+    'gzip': ('z', 'r|gz'),
+    'bz2': ('j', 'r|bz2'),
+    'xz': ('J', 'r|xz'),
+}
 
 
 class ClusterInterface:
@@ -29,6 +45,7 @@ class ClusterInterface:
         username: str,
         key_path: str,
         local_mirror_root: str = 'mirror',
+        persistent_shell: bool = False,
     ):
         """
         Parameters
@@ -41,6 +58,9 @@ class ClusterInterface:
             The path to the SSH key file that corresponds to the `username`.
         local_mirror_root
             The name to give the root directory of the local mirror.
+        persistent_shell
+            If ``True``, run commands in a single long-lived :class:`RemoteShell` instead of starting a new shell (and running the remote profile) for every command.
+            The :class:`CmdOutput` of each command then holds its complete output as binary :class:`io.BytesIO` (and no ``stdin``), instead of paramiko's channel files.
         """
         self.remote_host = hostname
         self.username = username
@@ -51,7 +71,12 @@ class ClusterInterface:
         self.ssh = paramiko.SSHClient()
         self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
-        self.ftp = None
+        self.shell = RemoteShell(self.ssh) if persistent_shell else None
+
+        self._ftp = None
+        self._thread_local = threading.local()
+
+        self.local_hash_cache = {}  # (local_path, algorithm) -> (size, mtime, digest)
 
     def __enter__(self):
         """Open the SSH and FTP connections."""
@@ -72,11 +97,32 @@ class ClusterInterface:
 
     def close(self):
         """Close the connection to the remote host."""
+        if self.shell is not None:
+            self.shell.close()
         self.ftp.close()
         self.ssh.close()
 
         logger.info(f'Closed connection to {self.username}@{self.remote_host}')
 
+    @property
+    def ftp(self) -> paramiko.SFTPClient:
+        """The SFTP client to use in the current thread. Worker threads of concurrent operations each have their own SFTP channel."""
+        thread_ftp = getattr(self._thread_local, 'ftp', None)
+        if thread_ftp is not None:
+            return thread_ftp
+
+        return self._ftp
+
+    @ftp.setter
+    def ftp(self, ftp: paramiko.SFTPClient):
+        self._ftp = ftp
+
+    def _open_thread_ftp(self, opened: List[paramiko.SFTPClient], lock: threading.Lock):
+        """Open a new SFTP channel on the existing SSH transport for the current thread."""
+        ftp = self._thread_local.ftp = paramiko.SFTPClient.from_transport(self.ssh.get_transport())
+        with lock:
+            opened.append(ftp)
+
     def __str__(self):
         return f'Interface to {self.remote_host} as {self.username}'
 
@@ -89,19 +135,48 @@ class ClusterInterface:
 
         return local_home
 
-    def cmd(self, *cmds: Iterable[str]):
-        """Run a list of commands sequentially on the remote host. Each command list begins in a totally fresh environment."""
+    def cmd(self, *cmds: Iterable[str]) -> CmdOutput:
+        """
+        Run a list of commands sequentially on the remote host.
+
+        If the interface has a persistent shell, the commands run in a subshell of it, so changes to the working directory or environment do not leak into later commands.
+        Otherwise, each command list begins in a totally fresh environment.
+        """
+        if self.shell is not None:
+            return self.shell.run(';'.join(cmds))
+
         cmd_list = ['. ~/.profile', '. ~/.bash_profile'] + list(cmds)  # run the remote bash profile to pick up settings
         cmd = ';'.join(cmd_list)
         stdin, stdout, stderr = self.ssh.exec_command(cmd)
 
         return CmdOutput(stdin, stdout, stderr)
 
+    def cmd_batch(self, cmds: Iterable[str]) -> List[CmdOutput]:
+        """
+        Run many independent commands on the remote host, returning the output of each separately.
+
+        With a persistent shell, all of the commands are sent at once, so the whole batch only costs a single round trip.
+
+        Parameters
+        ----------
+        cmds
+            The commands to run.
+
+        Returns
+        -------
+        outputs : list
+            The :class:`CmdOutput` of each command, in the same order as ``cmds``.
+        """
+        if self.shell is not None:
+            return self.shell.run_batch(cmds)
+
+        return [self.cmd(cmd) for cmd in cmds]
+
     @utils.cached_property
     def remote_home_dir(self):
         cmd_output = self.cmd('pwd')  # print name of home dir to stdout
 
-        home_path = str(cmd_output.stdout.readline()).strip('\n')  # extract path of home dir from stdout
+        home_path = cmd_output.stdout.read().decode('utf-8', errors = 'surrogateescape').partition('\n')[0]  # extract path of home dir from stdout
 
         logger.debug('Got home directory for {}@{}: {}'.format(self.username, self.remote_host, home_path))
 
@@ -177,11 +252,13 @@ class ClusterInterface:
         local_root: str,
         force_download: bool = False,
         integrity_check: bool = True,
+        hash_algorithm: str = 'md5',
     ):
         """
         Mirror a remote file, only downloading it if it does not match a local copy at a derived local path name.
 
-        File integrity is checked by comparing the MD5 hash of the remote and local files.
+        File integrity is checked by comparing the hashes of the remote and local files (see :func:`ClusterInterface.verify_files`).
+        When mirroring many files, :func:`ClusterInterface.mirror_dir` checks them in batches instead.
 
         Parameters
         ----------
@@ -194,28 +271,170 @@ class ClusterInterface:
         force_download
             If ``True``, download the file even if it synced.
         integrity_check
-            If ``True``, check that the MD5 hash of the remote and local files are the same, and redownload if they are not.
+            If ``True``, check that the hashes of the remote and local files are the same, and redownload if they are not.
+        hash_algorithm
+            The hash algorithm to use for the integrity check (``'md5'`` or ``'sha256'``, for example).
 
         Returns
         -------
         local_path : str
             The path to the local file.
         """
+        local_path, downloaded = self._mirror_file(remote_path, remote_stat, local_root, force_download = force_download)
+        if downloaded and integrity_check:
+            self.verify_files([(remote_path, remote_stat, local_path)], hash_algorithm = hash_algorithm)
+
+        return local_path
+
+    def _mirror_file(
+        self,
+        remote_path: str,
+        remote_stat,
+        local_root: str,
+        force_download: bool = False,
+    ) -> Tuple[str, bool]:
+        """Download a remote file if it is not synced, returning the local path and whether it was downloaded."""
         local_path = self.remote_path_to_local_path(remote_path, local_root)
         if force_download or not self.is_file_synced(remote_stat, local_path):
             self.get_file(remote_path, local_path, remote_stat = remote_stat, preserve_timestamps = True)
-            if integrity_check:
-                output = self.cmd(f'md5sum {remote_path}')
-                md5_remote = output.stdout.readline().split(' ')[0].strip()
-                with open(local_path, mode = 'rb') as f:
-                    md5_local = hashlib.md5()
-                    md5_local.update(f.read())
-                    md5_local = md5_local.hexdigest().strip()
-                if md5_local != md5_remote:
-                    logger.debug(f'MD5 hash on {self.remote_host} for file {remote_path} did not match local file at {local_path}, retrying')
-                    self.mirror_file(remote_path, remote_stat, local_root = local_root, force_download = True)
+            return local_path, True
 
-        return local_path
+        return local_path, False
+
+    def remote_file_hashes(
+        self,
+        remote_paths: Iterable[str],
+        hash_algorithm: str = 'md5',
+        batch_size: int = 200,
+    ) -> Dict[str, str]:
+        """
+        Get the hashes of many remote files, running a single hashing command (e.g., ``md5sum``) for each batch of paths.
+
+        Parameters
+        ----------
+        remote_paths
+            The remote paths to hash.
+        hash_algorithm
+            The hash algorithm to use. The remote host must have a ``{hash_algorithm}sum`` command.
+        batch_size
+            The maximum number of paths to hash per remote command.
+
+        Returns
+        -------
+        hashes : dict
+            A dictionary mapping remote paths to their hex digests. Paths that could not be hashed (e.g., because they don't exist) are missing.
+        """
+        hashes = {}
+
+        for batch in utils.grouper(remote_paths, batch_size):
+            batch = [path for path in batch if path is not None]
+            output = self.cmd(f'{hash_algorithm}sum -- {" ".join(shlex.quote(path) for path in batch)}')
+            for line in output.stdout.read().decode('utf-8', errors = 'surrogateescape').splitlines():
+                parsed = _parse_hash_line(line)
+                if parsed is not None:
+                    path, digest = parsed
+                    hashes[path] = digest
+
+        return hashes
+
+    def local_file_hash(self, local_path: str, hash_algorithm: str = 'md5') -> str:
+        """Get the hash of a local file, reusing a cached hash if the size and modification time of the file have not changed."""
+        local_stat = os.stat(local_path)
+        key = (local_path, hash_algorithm)
+
+        cached = self.local_hash_cache.get(key)
+        if cached is not None and cached[:2] == (local_stat.st_size, local_stat.st_mtime):
+            return cached[2]
+
+        digest = utils.get_file_hash(local_path, algorithm = hash_algorithm)
+        self.local_hash_cache[key] = (local_stat.st_size, local_stat.st_mtime, digest)
+
+        return digest
+
+    def verify_files(
+        self,
+        files: Collection[Tuple[str, Any, str]],
+        hash_algorithm: str = 'md5',
+        retries: int = 3,
+    ) -> List[str]:
+        """
+        Check that local files have the same hashes as the remote files they were downloaded from, redownloading any that don't.
+
+        The remote hashes are computed in batches (see :func:`ClusterInterface.remote_file_hashes`), so this does not need a remote command per file.
+
+        Parameters
+        ----------
+        files
+            ``(remote_path, remote_stat, local_path)`` for each file to check.
+        hash_algorithm
+            The hash algorithm to use.
+        retries
+            How many times to redownload and recheck files whose hashes don't match.
+
+        Returns
+        -------
+        failed : list
+            The remote paths of the files that still did not match after all of the retries.
+        """
+        files = list(files)
+
+        for attempt in range(retries + 1):
+            if len(files) == 0:
+                break
+
+            remote_hashes = self.remote_file_hashes((remote_path for remote_path, _, _ in files), hash_algorithm = hash_algorithm)
+
+            mismatched = []
+            for remote_path, remote_stat, local_path in files:
+                remote_hash = remote_hashes.get(remote_path)
+                if remote_hash is None:
+                    logger.warning(f'Could not get {hash_algorithm} hash of {remote_path} on {self.remote_host}, skipping integrity check')
+                    continue
+
+                if self.local_file_hash(local_path, hash_algorithm = hash_algorithm) != remote_hash:
+                    mismatched.append((remote_path, remote_stat, local_path))
+
+            files = mismatched
+            if attempt < retries:
+                for remote_path, remote_stat, local_path in files:
+                    logger.debug(f'{hash_algorithm} hash on {self.remote_host} for file {remote_path} did not match local file at {local_path}, retrying')
+                    self.get_file(remote_path, local_path, remote_stat = remote_stat, preserve_timestamps = True)
+
+        for remote_path, _, local_path in files:
+            logger.error(f'{hash_algorithm} hash on {self.remote_host} for file {remote_path} still did not match local file at {local_path} after {retries} retries')
+
+        return [remote_path for remote_path, _, _ in files]
+
+    def _list_remote_dir(
+        self,
+        remote_path: str,
+        exclude_hidden: bool = True,
+        blacklist_dir_names: Iterable[str] = (),
+        whitelist_file_ext: Iterable[str] = (),
+    ) -> List[Tuple[str, Any, Optional[str]]]:
+        """Return a list of ``(full_remote_path, remote_stat, kind)`` for the contents of a remote directory, where ``kind`` is ``'dir'`` or ``'file'`` if the path should be walked (see :func:`ClusterInterface.walk_remote_path`) and ``None`` otherwise."""
+        blacklist_dir_names = tuple(blacklist_dir_names)
+        whitelist_file_ext = tuple(ext if ext.startswith('.') else f'.{ext}' for ext in whitelist_file_ext)
+
+        entries = []
+        try:
+            remote_stats = self.ftp.listdir_attr(remote_path)
+            for remote_stat in remote_stats:
+                full_remote_path = posixpath.join(remote_path, remote_stat.filename)
+
+                logger.debug(f'Checking remote path {full_remote_path}')
+
+                kind = None
+                if not exclude_hidden or remote_stat.filename[0] != '.':
+                    if stat.S_ISDIR(remote_stat.st_mode) and remote_stat.filename not in blacklist_dir_names:
+                        kind = 'dir'
+                    elif stat.S_ISREG(remote_stat.st_mode) and full_remote_path.endswith(whitelist_file_ext):
+                        kind = 'file'
+                entries.append((full_remote_path, remote_stat, kind))
+        except UnicodeDecodeError as e:
+            logger.exception(f'Encountered unicode decode error while getting directory attributes for {remote_path}. This can happen if there is a unicode filename in the directory.')
+
+        return entries
 
     def walk_remote_path(
         self,
@@ -225,6 +444,8 @@ class ClusterInterface:
         exclude_hidden: bool = True,
         blacklist_dir_names: Iterable[str] = (),
         whitelist_file_ext: Iterable[str] = (),
+        workers: int = 1,
+        max_pending: Optional[int] = None,
     ):
         """
         Walk a remote directory starting at the given path.
@@ -245,6 +466,12 @@ class ClusterInterface:
             Do not walk over directories with these names.
         whitelist_file_ext
             Only walk over files with these extensions.
+        workers
+            If greater than one, list directories and call ``func_on_files`` in this many threads, each with its own SFTP channel on the existing SSH connection.
+            ``func_on_dirs`` is always called from the calling thread.
+        max_pending
+            When walking concurrently, the maximum number of directory listings and file operations in progress, and separately the maximum number of directories and files waiting for them.
+            Defaults to four per worker.
 
         Returns
         -------
@@ -256,57 +483,406 @@ class ClusterInterface:
         if func_on_files is None:
             func_on_files = lambda *args: None
 
-        blacklist_dir_names = tuple(blacklist_dir_names)
-        whitelist_file_ext = tuple(ext if ext.startswith('.') else f'.{ext}' for ext in whitelist_file_ext)
+        list_dir = functools.partial(
+            self._list_remote_dir,
+            exclude_hidden = exclude_hidden,
+            blacklist_dir_names = blacklist_dir_names,
+            whitelist_file_ext = whitelist_file_ext,
+        )
 
         path_count = 0
         longest_full_remote_path_len = 0
 
+        def report(full_remote_path: str):
+            # print a string that keeps track of the walked paths
+            nonlocal path_count, longest_full_remote_path_len
+            path_count += 1
+            longest_full_remote_path_len = max(longest_full_remote_path_len, len(full_remote_path))
+
+            status_str = f'\rPaths Found: {path_count}'.ljust(25) + f'|  Current Path: {full_remote_path}'.ljust(longest_full_remote_path_len + 20)
+            print(status_str, end = '')
+
         def walk(remote_path: str):
-            try:
-                remote_stats = self.ftp.listdir_attr(remote_path)
-                for remote_stat in remote_stats:
-                    full_remote_path = posixpath.join(remote_path, remote_stat.filename)
+            for full_remote_path, remote_stat, kind in list_dir(remote_path):
+                report(full_remote_path)
 
-                    logger.debug(f'Checking remote path {full_remote_path}')
+                if kind == 'dir':
+                    func_on_dirs(full_remote_path, remote_stat)
 
-                    # print a string that keeps track of the walked paths
-                    nonlocal path_count, longest_full_remote_path_len
-                    path_count += 1
-                    longest_full_remote_path_len = max(longest_full_remote_path_len, len(full_remote_path))
+                    logger.debug(f'Walking remote dir {full_remote_path}')
+                    walk(full_remote_path)
+                elif kind == 'file':
+                    func_on_files(full_remote_path, remote_stat)
 
-                    status_str = f'\rPaths Found: {path_count}'.ljust(25) + f'|  Current Path: {full_remote_path}'.ljust(longest_full_remote_path_len + 20)
-                    print(status_str, end = '')
+        def walk_concurrently(remote_path: str):
+            opened_ftps = []
+            lock = threading.Lock()
+            limit = max_pending or 4 * workers
 
-                    if not exclude_hidden or remote_stat.filename[0] != '.':
-                        if stat.S_ISDIR(remote_stat.st_mode) and remote_stat.filename not in blacklist_dir_names:
-                            func_on_dirs(full_remote_path, remote_stat)
+            with futures.ThreadPoolExecutor(max_workers = workers, initializer = self._open_thread_ftp, initargs = (opened_ftps, lock)) as executor:
+                listings = {executor.submit(list_dir, remote_path)}
+                file_ops = set()
+                listed = []  # the entries of finished listings that haven't been queued yet, as a stack, so that it only grows with the depth of the tree
+                queued_dirs = collections.deque()
+                queued_files = collections.deque()
 
-                            logger.debug(f'Walking remote dir {full_remote_path}')
-                            walk(full_remote_path)
+                try:
+                    while listings or file_ops or listed or queued_dirs or queued_files:
+                        # only take entries from finished listings while there is room to queue them, so that the backlog doesn't grow with the width of the tree
+                        while listed and len(queued_dirs) + len(queued_files) < limit:
+                            entry = next(listed[-1], None)
+                            if entry is None:
+                                listed.pop()
+                                continue
 
-                        elif stat.S_ISREG(remote_stat.st_mode) and full_remote_path.endswith(whitelist_file_ext):
-                            func_on_files(full_remote_path, remote_stat)
-            except UnicodeDecodeError as e:
-                logger.exception(f'Encountered unicode decode error while getting directory attributes for {remote_path}. This can happen if there is a unicode filename in the directory.')
+                            full_remote_path, remote_stat, kind = entry
+                            report(full_remote_path)
+
+                            if kind == 'dir':
+                                func_on_dirs(full_remote_path, remote_stat)
+                                queued_dirs.append(full_remote_path)
+                            elif kind == 'file':
+                                queued_files.append((full_remote_path, remote_stat))
+
+                        # keep the pool busy, preferring file operations, since listings only make more work
+                        while len(listings) + len(file_ops) < limit:
+                            if queued_files:
+                                file_ops.add(executor.submit(func_on_files, *queued_files.popleft()))
+                            elif queued_dirs:
+                                full_remote_path = queued_dirs.popleft()
+                                logger.debug(f'Walking remote dir {full_remote_path}')
+                                listings.add(executor.submit(list_dir, full_remote_path))
+                            else:
+                                break
 
-        walk(remote_path)
+                        done, _ = futures.wait(listings | file_ops, return_when = futures.FIRST_COMPLETED)
+                        for future in done:
+                            if future in file_ops:
+                                file_ops.remove(future)
+                                future.result()
+                            else:
+                                listings.remove(future)
+                                listed.append(iter(future.result()))
+                except BaseException:
+                    for future in listings | file_ops:
+                        future.cancel()
+                    raise
+                finally:
+                    executor.shutdown(wait = True)
+                    for ftp in opened_ftps:
+                        ftp.close()
+
+        if workers > 1:
+            walk_concurrently(remote_path)
+        else:
+            walk(remote_path)
         print()
 
         return path_count
 
+    def download_files_in_bulk(
+        self,
+        files: Collection[Tuple[str, Any]],
+        local_root: str,
+        compression: Optional[str] = None,
+    ) -> List[Tuple[str, Any, str]]:
+        """
+        Download many remote files at once by having the remote host ``tar`` them into a single stream over an SSH channel, which is unpacked locally as it arrives.
+
+        This avoids a round trip per file, so it is much faster than :func:`ClusterInterface.get_file` for many small files.
+        Modification times are preserved, so :func:`ClusterInterface.is_file_synced` still works afterwards.
+
+        Parameters
+        ----------
+        files
+            ``(remote_path, remote_stat)`` for each file to download.
+        local_root
+            The local directory to use as the root directory.
+        compression
+            If not ``None``, compress the stream with this method (``'gzip'``, ``'bz2'``, or ``'xz'``).
+            Useful on slow links, but usually not worth it for already-compressed files like saved Simulations.
+
+        Returns
+        -------
+        downloaded : list
+            ``(remote_path, remote_stat, local_path)`` for each file that was downloaded.
+            Files that the remote ``tar`` could not read (e.g., because they were deleted in the meantime) are left out, and its error messages are logged.
+
+        Raises
+        ------
+        :class:`simulacra.exceptions.BulkDownloadFailed`
+            If the stream could not be unpacked, e.g. because the remote ``tar`` died partway through.
+        """
+        tar_flag, tar_mode = TAR_COMPRESSION[compression]
+
+        wanted = {}
+        for remote_path, remote_stat in files:
+            if not remote_path.startswith('/'):
+                remote_path = posixpath.join(self.remote_home_dir, remote_path)
+            wanted[remote_path.lstrip('/')] = (remote_path, remote_stat, self.remote_path_to_local_path(remote_path, local_root))
+
+        if len(wanted) == 0:
+            return []
+
+        stdin, stdout, stderr = self.ssh.exec_command(f'tar -C / -c{tar_flag}f - --null -T -')
+
+        def send_names():  # in a separate thread, so that a long list of names can't deadlock against the output stream
+            for name in wanted:
+                stdin.write(name.encode('utf-8', errors = 'surrogateescape') + b'\0')
+            stdin.flush()
+            stdin.channel.shutdown_write()
+
+        sender = threading.Thread(target = send_names, daemon = True)
+        sender.start()
+
+        errors = []
+
+        def drain_stderr():  # in a separate thread, so that lots of warnings from tar can't fill the channel's window and stall the output stream
+            errors.append(stderr.read())
+
+        drainer = threading.Thread(target = drain_stderr, daemon = True)
+        drainer.start()
+
+        def error_message() -> str:
+            drainer.join()
+            return b''.join(errors).decode('utf-8', errors = 'replace').strip()
+
+        downloaded = []
+        try:
+            self._unpack_bulk_stream(stdout, tar_mode, wanted, downloaded)
+        except tarfile.TarError as e:
+            exit_status = stdout.channel.recv_exit_status()
+            raise exceptions.BulkDownloadFailed(f'Bulk download from {self.remote_host} failed after {len(downloaded)} / {len(wanted)} files (remote tar exited with status {exit_status}): {error_message()}') from e
+
+        sender.join()
+        exit_status = stdout.channel.recv_exit_status()
+        message = error_message()
+        if exit_status != 0:
+            logger.warning(f'Remote tar on {self.remote_host} exited with status {exit_status}: {message}')
+
+        logger.info(f'Downloaded {len(downloaded)} / {len(wanted)} files in bulk from {self.remote_host}')
+
+        return downloaded
+
+    def _unpack_bulk_stream(
+        self,
+        stream,
+        tar_mode: str,
+        wanted: Dict[str, Tuple[str, Any, str]],
+        downloaded: List[Tuple[str, Any, str]],
+    ):
+        """Unpack the files in a ``tar`` stream to their local paths as they arrive, appending each one to ``downloaded``."""
+        with tarfile.open(fileobj = stream, mode = tar_mode) as archive:
+            for member in archive:
+                if not member.isfile() or member.name not in wanted:
+                    logger.warning(f'Skipping unexpected member {member.name} in bulk download from {self.remote_host}')
+                    continue
+
+                remote_path, remote_stat, local_path = wanted[member.name]
+
+                utils.ensure_parents_exist(local_path)
+                working_path = f'{local_path}.working'
+                with archive.extractfile(member) as src, open(working_path, mode = 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.utime(working_path, (member.mtime, member.mtime))
+                os.replace(working_path, local_path)
+
+                logger.debug(f'{local_path}   <--   {remote_path}')
+                downloaded.append((remote_path, remote_stat, local_path))
+
+    def remote_dir_mtimes(self, remote_dir: str, exclude_hidden: bool = False, blacklist_dir_names: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Get the modification times of a remote directory and all of the directories below it, using a single remote ``find`` command.
+
+        Parameters
+        ----------
+        remote_dir
+            The remote directory to start from.
+        exclude_hidden
+            Do not descend into hidden directories.
+        blacklist_dir_names
+            Do not descend into directories with these names.
+
+        Returns
+        -------
+        mtimes : dict
+            A dictionary mapping remote directory paths to their modification times (as strings, exactly as ``find`` printed them).
+        """
+        patterns = [*(['.*'] if exclude_hidden else []), *(_escape_find_pattern(name) for name in blacklist_dir_names)]
+        prune = ''
+        if patterns:
+            names = ' -o '.join(f'-name {shlex.quote(pattern)}' for pattern in patterns)
+            prune = f"-type d ! -path {shlex.quote(_escape_find_pattern(remote_dir))} \\( {names} \\) -prune -o "
+        output = self.cmd(f"find {shlex.quote(remote_dir)} {prune}-type d -printf '%T@ %p\\n'")
+
+        mtimes = {}
+        for line in output.stdout.read().decode('utf-8', errors = 'surrogateescape').splitlines():
+            mtime, sep, path = line.partition(' ')
+            if sep:
+                mtimes[path] = mtime
+
+        return mtimes
+
+    def _map_with_thread_ftps(self, func: Callable, items: Iterable, workers: int = 1) -> List:
+        """Return ``[func(item) for item in items]``, running in a pool of threads that each have their own SFTP channel if ``workers`` is greater than one."""
+        if workers <= 1:
+            return [func(item) for item in items]
+
+        opened_ftps = []
+        lock = threading.Lock()
+        try:
+            with futures.ThreadPoolExecutor(max_workers = workers, initializer = self._open_thread_ftp, initargs = (opened_ftps, lock)) as executor:
+                return list(executor.map(func, items))
+        finally:
+            for ftp in opened_ftps:
+                ftp.close()
+
+    def walk_remote_path_with_manifest(
+        self,
+        remote_path: str,
+        manifest: 'MirrorManifest',
+        func_on_files: Optional[Callable] = None,
+        exclude_hidden: bool = True,
+        blacklist_dir_names: Iterable[str] = (),
+        whitelist_file_ext: Iterable[str] = (),
+        workers: int = 1,
+        include_unchanged: bool = False,
+    ) -> int:
+        """
+        Walk a remote directory like :func:`ClusterInterface.walk_remote_path`, but only list the directories whose modification times have changed since they were recorded in the ``manifest``.
+
+        The manifest is updated in place.
+        If it was recorded with a different filter (``exclude_hidden``, ``blacklist_dir_names``, and ``whitelist_file_ext``), its directory listings are discarded and every directory is listed again.
+        ``func_on_files`` is only called on the files in changed directories, unless ``include_unchanged`` is ``True``, in which case it is also called on the files in unchanged directories, with their cached stats from the manifest.
+        ``func_on_files`` is passed the full path to the remote file and a stat of that file.
+
+        Parameters
+        ----------
+        remote_path
+            The remote path to start walking from.
+        manifest
+            The :class:`MirrorManifest` to read cached directory listings from and record new ones in.
+        func_on_files
+            The function to call on files.
+        exclude_hidden
+            Do not walk over hidden files or directories.
+        blacklist_dir_names
+            Do not walk over directories with these names.
+        whitelist_file_ext
+            Only walk over files with these extensions.
+        workers
+            The number of threads (each with its own SFTP channel) to list directories and call ``func_on_files`` with.
+        include_unchanged
+            If ``True``, call ``func_on_files`` on the files in unchanged directories too.
+
+        Returns
+        -------
+        file_count : int
+            The number of files found, including the ones in unchanged directories.
+        """
+        if func_on_files is None:
+            func_on_files = lambda *args: None
+
+        blacklist_dir_names = tuple(blacklist_dir_names)
+        whitelist_file_ext = tuple(ext if ext.startswith('.') else f'.{ext}' for ext in whitelist_file_ext)
+
+        def is_walkable(remote_dir: str) -> bool:
+            relative = posixpath.relpath(remote_dir, remote_path)
+            if relative == '.':
+                return True
+
+            return not any(
+                (exclude_hidden and part.startswith('.')) or part in blacklist_dir_names
+                for part in relative.split('/')
+            )
+
+        def list_files(remote_dir: str) -> Optional[Dict[str, Tuple[int, int]]]:
+            try:
+                return {
+                    posixpath.join(remote_dir, remote_stat.filename): (remote_stat.st_size, remote_stat.st_mtime)
+                    for remote_stat in self.ftp.listdir_attr(remote_dir)
+                    if stat.S_ISREG(remote_stat.st_mode)
+                    and (not exclude_hidden or remote_stat.filename[0] != '.')
+                    and remote_stat.filename.endswith(whitelist_file_ext)
+                }
+            except UnicodeDecodeError as e:
+                logger.exception(f'Encountered unicode decode error while getting directory attributes for {remote_dir}. This can happen if there is a unicode filename in the directory.')
+                return None
+
+        walk_filter = {
+            'exclude_hidden': exclude_hidden,
+            'blacklist_dir_names': sorted(blacklist_dir_names),
+            'whitelist_file_ext': sorted(whitelist_file_ext),
+        }
+        if manifest.filter != walk_filter:
+            if manifest.dirs:
+                logger.info(f'Listing every directory under {remote_path} again, because the mirror filter has changed')
+            manifest.dirs.clear()
+            manifest.filter = walk_filter
+
+        dir_mtimes = {
+            d: mtime
+            for d, mtime in self.remote_dir_mtimes(remote_path, exclude_hidden = exclude_hidden, blacklist_dir_names = blacklist_dir_names).items()
+            if is_walkable(d)
+        }
+        changed_dirs = [d for d, mtime in dir_mtimes.items() if manifest.dirs.get(d, {}).get('mtime') != mtime]
+
+        for remote_dir in set(manifest.dirs) - set(dir_mtimes):
+            if remote_dir == remote_path or remote_dir.startswith(remote_path.rstrip('/') + '/'):
+                del manifest.dirs[remote_dir]
+
+        for remote_dir, files in zip(changed_dirs, self._map_with_thread_ftps(list_files, changed_dirs, workers = workers)):
+            if files is None:
+                manifest.dirs.pop(remote_dir, None)  # list it again next time
+                continue
+
+            manifest.dirs[remote_dir] = {'mtime': dir_mtimes[remote_dir], 'files': files}
+
+        logger.info(f'Listed {len(changed_dirs)} changed directories out of {len(dir_mtimes)} under {remote_path}')
+
+        file_count = sum(len(manifest.dirs.get(remote_dir, {}).get('files', {})) for remote_dir in dir_mtimes)
+
+        files = []
+        for remote_dir in (dir_mtimes if include_unchanged else changed_dirs):
+            for full_remote_path, (size, mtime) in manifest.dirs.get(remote_dir, {}).get('files', {}).items():
+                remote_stat = paramiko.SFTPAttributes()
+                remote_stat.st_size = size
+                remote_stat.st_mtime = mtime
+                remote_stat.st_atime = mtime
+                files.append((full_remote_path, remote_stat))
+
+        self._map_with_thread_ftps(lambda file: func_on_files(*file), files, workers = workers)
+
+        return file_count
+
     def mirror_dir(
         self,
         remote_dir: str = None,
         local_root: str = 'mirror',
         blacklist_dir_names: Iterable[str] = ('python', 'build_python', 'backend', 'logs'),
-        whitelist_file_ext: Iterable[str] = ('.txt', '.json', '.spec', '.sim', '.pkl'),
+        whitelist_file_ext: Iterable[str] = ('.txt', '.json', '.spec', '.bundle', '.value', '.sim', '.pkl'),
+        workers: int = 1,
+        integrity_check: bool = True,
+        hash_algorithm: str = 'md5',
+        integrity_check_batch_size: int = 200,
+        use_manifest: bool = False,
+        recheck_unchanged: bool = False,
+        bulk: bool = False,
+        bulk_compression: Optional[str] = None,
     ):
         """
         Mirror a directory recursively.
 
         If no directory is given, mirror the remote home directory.
 
+        If ``use_manifest`` is ``True``, the remote directory tree is recorded in a :class:`MirrorManifest` in ``local_root``, and later mirrors are incremental.
+        The modification times of all of the remote directories are fetched with a single remote ``find`` command, and only directories whose modification times have changed are listed again.
+        This relies on files being replaced (as :func:`simulacra.Beet.save` does) or created rather than modified in place, since modifying a file in place does not change the modification time of its directory.
+        Files in unchanged directories are assumed to still be mirrored locally, and are not checked at all unless ``recheck_unchanged`` is ``True``.
+        The manifest is only saved once the whole mirror has succeeded, and directories holding files that failed their integrity check (or that a bulk download did not deliver) are left out of it, so that they are listed again next time.
+
+        If ``bulk`` is ``True``, the out-of-date files are collected during the walk and then downloaded in a single stream using :func:`ClusterInterface.download_files_in_bulk`.
+
         Parameters
         ----------
         remote_dir
@@ -317,18 +893,340 @@ class ClusterInterface:
             The directory to use as the root directory locally.
         whitelist_file_ext
             Only files with these file extensions will be transferred.
+        workers
+            The number of SFTP channels to list directories and download files with concurrently.
+        integrity_check
+            If ``True``, check the hashes of downloaded files against the remote files, and redownload any that don't match.
+        hash_algorithm
+            The hash algorithm to use for the integrity check.
+        integrity_check_batch_size
+            Downloaded files are checked in batches of this size, with one remote hashing command per batch.
+        use_manifest
+            If ``True``, mirror incrementally using a persistent manifest of the remote directory tree.
+        recheck_unchanged
+            If ``True`` (and ``use_manifest`` is ``True``), compare the local copies of the files in unchanged directories to their cached remote stats too, and download any that are missing or out of date.
+        bulk
+            If ``True``, download all of the out-of-date files in a single ``tar`` stream instead of one at a time.
+        bulk_compression
+            The compression to use for the ``tar`` stream in bulk mode (see :func:`ClusterInterface.download_files_in_bulk`).
         """
         remote_dir = remote_dir or self.remote_home_dir
 
         logger.info(f'Mirroring remote dir {remote_dir}')
 
+        to_verify = []
+        to_verify_lock = threading.Lock()
+        failed = []
+
+        def verify(batch):
+            if integrity_check and len(batch) > 0:
+                failed_batch = self.verify_files(batch, hash_algorithm = hash_algorithm)
+                with to_verify_lock:
+                    failed.extend(failed_batch)
+
+        to_download = []
+
+        def mirror(remote_path, remote_stat):
+            if bulk:
+                if not self.is_file_synced(remote_stat, self.remote_path_to_local_path(remote_path, local_root)):
+                    with to_verify_lock:
+                        to_download.append((remote_path, remote_stat))
+                return
+
+            local_path, downloaded = self._mirror_file(remote_path, remote_stat, local_root = local_root)
+            if not downloaded:
+                return
+
+            batch = []
+            with to_verify_lock:
+                to_verify.append((remote_path, remote_stat, local_path))
+                if len(to_verify) >= integrity_check_batch_size:
+                    batch = to_verify[:]
+                    to_verify.clear()
+            verify(batch)
+
+        def download_in_bulk():
+            if bulk:
+                downloaded = self.download_files_in_bulk(to_download, local_root, compression = bulk_compression)
+                delivered = {remote_path for remote_path, _, _ in downloaded}
+                failed.extend(remote_path for remote_path, _ in to_download if remote_path not in delivered)
+                for start in range(0, len(downloaded), integrity_check_batch_size):
+                    verify(downloaded[start:start + integrity_check_batch_size])
+
         with utils.BlockTimer() as timer:
-            self.walk_remote_path(
-                self.remote_home_dir,
-                func_on_files = functools.partial(self.mirror_file, local_root = local_root),
-                func_on_dirs = lambda d, _: utils.ensure_parents_exist(d),
-                blacklist_dir_names = tuple(blacklist_dir_names),
-                whitelist_file_ext = tuple(whitelist_file_ext),
+            if use_manifest:
+                manifest = MirrorManifest.load(os.path.join(local_root, f'.{self.username}@{self.remote_host}.manifest.json'))
+                self.local_hash_cache.update(manifest.hashes)
+
+                self.walk_remote_path_with_manifest(
+                    remote_dir,
+                    manifest,
+                    func_on_files = mirror,
+                    blacklist_dir_names = tuple(blacklist_dir_names),
+                    whitelist_file_ext = tuple(whitelist_file_ext),
+                    workers = workers,
+                    include_unchanged = recheck_unchanged,
+                )
+                verify(to_verify)
+                download_in_bulk()
+
+                for remote_dir in sorted({posixpath.dirname(remote_path) for remote_path in failed}):
+                    if manifest.dirs.pop(remote_dir, None) is not None:
+                        logger.debug(f'Dropping {remote_dir} from the mirror manifest, since some of its files were not mirrored')
+
+                manifest.hashes = self.local_hash_cache
+                manifest.save()
+            else:
+                self.walk_remote_path(
+                    remote_dir,
+                    func_on_files = mirror,
+                    func_on_dirs = lambda d, _: utils.ensure_parents_exist(d),
+                    blacklist_dir_names = tuple(blacklist_dir_names),
+                    whitelist_file_ext = tuple(whitelist_file_ext),
+                    workers = workers,
+                )
+                verify(to_verify)
+                download_in_bulk()
+
+        if len(failed) > 0:
+            logger.warning(f'Mirroring complete, but {len(failed)} files were not mirrored correctly. {timer}')
+        else:
+            logger.info(f'Mirroring complete. {timer}')
+
+
+class RemoteShell:
+    """
+    A long-lived shell session on a remote host, which commands can be sent to without paying the cost of starting a new shell (and running the remote profile) each time.
+
+    Commands are written to the standard input of a remote ``bash``, and each one is followed by a sentinel line that marks the end of its output and carries its exit status.
+    Each command runs in a subshell with its standard input closed, and its standard error is captured separately and sent after the sentinel.
+    The shell is opened on first use, and reopened automatically if it dies.
+    """
+
+    startup_cmds = ('. ~/.profile', '. ~/.bash_profile')
+
+    def __init__(self, ssh: paramiko.SSHClient, timeout: Optional[float] = None, chunk_size: int = 2 ** 16):
+        """
+        Parameters
+        ----------
+        ssh
+            The (connected) SSH client to open the shell with.
+        timeout
+            If not ``None``, the maximum time to wait for output, in seconds.
+        chunk_size
+            The maximum number of bytes to read from the channel at once.
+        """
+        self.ssh = ssh
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+        self.token = f'__simulacra_{uuid.uuid4().hex}'.encode()
+        self._sentinel = re.compile(b'\n' + self.token + rb' (\d+) (\d+) *(\d+)\n')
+
+        self._channel = None
+        self._buffer = bytearray()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._channel is not None and not self._channel.closed
+
+    def open(self):
+        """Open the shell and run the remote profile in it."""
+        channel = self.ssh.get_transport().open_session()
+        channel.set_combine_stderr(True)  # anything the shell itself prints is discarded with the startup output
+        channel.settimeout(self.timeout)
+        channel.exec_command('bash --noprofile --norc')
+
+        self._channel = channel
+        self._buffer = bytearray()
+
+        startup = ''.join(f'{cmd} </dev/null >/dev/null 2>&1\n' for cmd in self.startup_cmds)
+        startup += '__simulacra_err=$(mktemp)\n'
+        self._count += 1
+        self._exchange(startup + self._frame('true', self._count), [self._count])
+
+        logger.debug('Opened remote shell')
+
+    def close(self):
+        """Close the shell, if it is open."""
+        if not self.is_open:
+            self._channel = None
+            return
+
+        try:
+            self._channel.sendall(b'rm -f "$__simulacra_err"; exit\n')
+        except (OSError, EOFError):
+            pass
+        self._channel.close()
+        self._channel = None
+
+        logger.debug('Closed remote shell')
+
+    def _frame(self, cmd: str, number: int) -> str:
+        """Return the script that runs a single command in a subshell and then prints its sentinel and standard error."""
+        return (
+            f'( eval {shlex.quote(cmd)} ) </dev/null 2>"$__simulacra_err"\n'
+            f'__simulacra_status=$?\n'
+            f'printf \'\\n%s %d %d %d\\n\' {self.token.decode()} {number} "$__simulacra_status" "$(wc -c <"$__simulacra_err")"\n'
+            f'cat "$__simulacra_err"\n'
+        )
+
+    def _receive(self, number: int) -> CmdOutput:
+        """Read from the channel until the complete output of the command with the given number has arrived."""
+        sentinel = None
+        searched = 0
+        while True:
+            if sentinel is None:
+                match = self._sentinel.search(self._buffer, max(searched - len(self.token) - 64, 0))  # only search the new data (plus enough to catch a sentinel split across reads)
+                searched = len(self._buffer)
+                if match is not None:
+                    sentinel = (match.start(), match.end(), *(int(group) for group in match.groups()))
+
+            if sentinel is not None and len(self._buffer) >= sentinel[1] + sentinel[4]:
+                break
+
+            data = self._channel.recv(self.chunk_size)
+            if len(data) == 0:
+                raise exceptions.RemoteShellClosed('Remote shell closed unexpectedly')
+            self._buffer += data
+
+        start, end, received_number, exit_status, stderr_length = sentinel
+        if received_number != number:
+            raise exceptions.RemoteShellClosed(f'Remote shell output is out of sync: expected output for command {number}, but got output for command {received_number}')
+
+        stdout = bytes(self._buffer[:start])
+        stderr = bytes(self._buffer[end:end + stderr_length])
+        del self._buffer[:end + stderr_length]
+
+        return CmdOutput(None, io.BytesIO(stdout), io.BytesIO(stderr), exit_status)
+
+    def _exchange(self, script: str, numbers: List[int]) -> List[CmdOutput]:
+        """Send the script and receive the outputs of the numbered commands in it."""
+        # the script is sent from a separate thread so that a long script can't deadlock against a command that produces a lot of output
+        sender = threading.Thread(target = self._channel.sendall, args = (script.encode('utf-8', errors = 'surrogateescape'),), daemon = True)
+        sender.start()
+
+        try:
+            outputs = [self._receive(number) for number in numbers]
+        except Exception:
+            self.close()  # the framing is in an unknown state, so start over with a new shell next time
+            raise
+
+        sender.join()
+
+        return outputs
+
+    def run(self, cmd: str) -> CmdOutput:
+        """Run a command in the shell and return its output."""
+        return self.run_batch([cmd])[0]
+
+    def run_batch(self, cmds: Iterable[str]) -> List[CmdOutput]:
+        """Run many commands in the shell, sending them all at once, and return their outputs in the same order."""
+        with self._lock:
+            if not self.is_open:
+                self.open()
+
+            script = []
+            numbers = []
+            for cmd in cmds:
+                self._count += 1
+                script.append(self._frame(cmd, self._count))
+                numbers.append(self._count)
+
+            if len(numbers) == 0:
+                return []
+
+            return self._exchange(''.join(script), numbers)
+
+
+class MirrorManifest:
+    """
+    A persistent record of a remote directory tree, used by :func:`ClusterInterface.mirror_dir` to mirror incrementally.
+
+    Attributes
+    ----------
+    dirs
+        A dictionary mapping remote directory paths to ``{'mtime': mtime, 'files': {remote_path: (size, mtime)}}``.
+    filter
+        The filter that the directory listings were made with (see :func:`ClusterInterface.walk_remote_path_with_manifest`), or ``None`` if there aren't any yet.
+    hashes
+        A cache of hashes of local files, in the same format as :attr:`ClusterInterface.local_hash_cache`.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path
+            The path to store the manifest at.
+        """
+        self.path = Path(path)
+        self.dirs = {}
+        self.filter = None
+        self.hashes = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'MirrorManifest':
+        """Load a manifest from ``path``, or return an empty manifest if there isn't one there yet."""
+        manifest = cls(path)
+
+        try:
+            with manifest.path.open(mode = 'r', encoding = 'utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return manifest
+
+        manifest.dirs = {
+            remote_dir: {'mtime': entry['mtime'], 'files': {k: tuple(v) for k, v in entry['files'].items()}}
+            for remote_dir, entry in data['dirs'].items()
+        }
+        manifest.filter = data.get('filter')  # not in manifests written before the filter was recorded, so their listings are discarded
+        manifest.hashes = {(local_path, algorithm): (size, mtime, digest) for local_path, algorithm, size, mtime, digest in data['hashes']}
+
+        logger.debug(f'Loaded mirror manifest from {manifest.path}')
+
+        return manifest
+
+    def save(self):
+        """Atomically save the manifest."""
+        working_path = self.path.with_name(f'{self.path.name}.working')
+        utils.ensure_parents_exist(working_path)
+
+        with working_path.open(mode = 'w', encoding = 'utf-8') as file:
+            json.dump(
+                {
+                    'dirs': self.dirs,
+                    'filter': self.filter,
+                    'hashes': [[local_path, algorithm, *value] for (local_path, algorithm), value in self.hashes.items()],
+                },
+                file,
             )
 
-        logger.info(f'Mirroring complete. {timer}')
+        os.replace(working_path, self.path)
+
+        logger.debug(f'Saved mirror manifest to {self.path}')
+
+
+def _escape_find_pattern(name: str) -> str:
+    """Escape the characters that are special in the patterns of ``find -name`` and ``find -path``, so that ``name`` only matches itself."""
+    return re.sub(r'([*?\[\\])', r'\\\1', name)
+
+
+def _parse_hash_line(line: str) -> Optional[Tuple[str, str]]:
+    """Parse a line of output from ``md5sum`` (or ``sha256sum``, etc.) into ``(path, digest)``."""
+    escaped = line.startswith('\\')  # coreutils escapes file names that contain backslashes or newlines
+    if escaped:
+        line = line[1:]
+
+    digest, sep, path = line.partition('  ')
+    if not sep:
+        digest, sep, path = line.partition(' *')  # binary mode marker
+    if not sep:
+        return None
+
+    if escaped:
+        path = re.sub(r'\\(.)', lambda match: '\n' if match.group(1) == 'n' else match.group(1), path)
+
+    return path, digest.strip()
@@ -1,5 +1,11 @@
+import collections
+import contextlib
+import functools
+import io
 import itertools
 import logging
+import multiprocessing
+import operator
 import os
 import pickle
 import sys
@@ -10,7 +16,7 @@ from typing import Any, Iterable, Optional, Callable, Type, Tuple, Union, List,
 
 from tqdm import tqdm
 
-from .. import sims, utils
+from .. import sims, utils, bundles, serialization
 
 # these imports need to be here so that ask_for_eval works
 import numpy as np
@@ -20,6 +26,9 @@ from .. import units as u
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+SPECIFICATIONS_BUNDLE = 'specifications.bundle'  # the name of the bundle in the inputs directory, if the Specifications were bundled
+SPECIFICATIONS_STORE = 'store'  # the name of the content store in the job directory, if the Specifications share large values
+
 
 class Parameter:
     """A class that represents a parameter of a :class:`Specification`."""
@@ -50,6 +59,93 @@ class Parameter:
             return out
 
 
+def _is_expandable(parameter: Parameter) -> bool:
+    # make sure the value is an iterable that isn't a string and has a length
+    return parameter.expandable and hasattr(parameter.value, '__iter__') and not isinstance(parameter.value, str) and hasattr(parameter.value, '__len__')
+
+
+class ParameterCombinations(collections.abc.Sequence):
+    """
+    A lazy sequence of all of the combinations of the values of some :class:`Parameter`, as produced by :func:`iter_parameters`.
+
+    Combinations are only built when they are asked for, so this takes constant memory no matter how many combinations there are.
+    The combinations are in the same order as :func:`expand_parameters`: the last expandable :class:`Parameter` varies fastest.
+    Indexing decodes the index as a mixed-radix number whose digits are the indices into the values of each expandable :class:`Parameter`.
+    """
+
+    def __init__(self, parameters: Iterable[Parameter]):
+        """
+        Parameters
+        ----------
+        parameters
+            The parameters to expand over.
+        """
+        self._parameters = []  # (name, values or fixed value, is expanded)
+        self._axes = []
+        for par in parameters:
+            if _is_expandable(par):
+                values = par.value
+                if not hasattr(values, '__getitem__') or isinstance(values, collections.abc.Mapping):
+                    values = tuple(values)
+                self._parameters.append((par.name, values, True))
+                self._axes.append(values)
+            else:
+                self._parameters.append((par.name, par.value, False))
+
+        self._len = functools.reduce(operator.mul, (len(values) for values in self._axes), 1)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _combination(self, values: Iterable[Any]) -> Dict[str, Any]:
+        values = iter(values)
+        return {name: next(values) if expanded else value for name, value, expanded in self._parameters}
+
+    def __iter__(self):
+        for values in itertools.product(*self._axes):
+            yield self._combination(values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'{self.__class__.__name__} index out of range')
+
+        digits = []
+        for values in reversed(self._axes):
+            index, digit = divmod(index, len(values))
+            digits.append(values[digit])
+
+        return self._combination(reversed(digits))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(parameters = [{", ".join(name for name, _, _ in self._parameters)}], len = {len(self)})'
+
+
+def iter_parameters(parameters: Iterable[Parameter]) -> ParameterCombinations:
+    """
+    Lazily expand an iterable of :class:`Parameter` to all of the combinations of parameter values, like :func:`expand_parameters`.
+
+    The combinations are built one at a time as they are iterated over, and the values are not copied, so values are shared between combinations.
+    The result also supports ``len()`` and random access by index.
+
+    Parameters
+    ----------
+    parameters
+        The parameters to expand over.
+
+    Returns
+    -------
+    parameter_combinations
+        A :class:`ParameterCombinations` of dictionaries containing all of the combinations of parameters.
+    """
+    return ParameterCombinations(parameters)
+
+
 def expand_parameters(parameters: Collection[Parameter]) -> List[Dict[str, Any]]:
     """
     Expand an iterable of :class:`Parameter` to a list of dictionaries containing all of the combinations of parameter values.
@@ -57,6 +153,9 @@ def expand_parameters(parameters: Collection[Parameter]) -> List[Dict[str, Any]]
 
     If a :class:`Parameter` has ``expandable = True``, it will be expanded across the values in the outermost iterable in that :class:`Parameter`'s ``value``.
 
+    The values of the parameters that come before the last expandable :class:`Parameter` are deep-copied into each combination, so each combination can be changed without affecting the others.
+    To avoid building (and copying) all of the combinations at once, use :func:`iter_parameters` instead.
+
     Parameters
     ----------
     parameters
@@ -67,17 +166,19 @@ def expand_parameters(parameters: Collection[Parameter]) -> List[Dict[str, Any]]
     parameter_combinations
         An list of dictionaries containing all of the combinations of parameters.
     """
-    dicts = [{}]
-
-    for par in parameters:
-        # make sure the value is an iterable that isn't a string and has a length
-        if par.expandable and hasattr(par.value, '__iter__') and not isinstance(par.value, str) and hasattr(par.value, '__len__'):
-            dicts = [deepcopy(d) for d in dicts for _ in range(len(par.value))]
-            for d, v in zip(dicts, itertools.cycle(par.value)):
-                d[par.name] = v
-        else:
-            for d in dicts:
-                d[par.name] = par.value
+    combinations = iter_parameters(parameters)
+
+    expanded = [position for position, (_, _, is_expanded) in enumerate(combinations._parameters) if is_expanded]
+    if not expanded:
+        return list(combinations)
+
+    later_names = {name for name, _, _ in combinations._parameters[expanded[-1]:]}
+    copied_names = [name for name, _, _ in combinations._parameters[:expanded[-1]] if name not in later_names]
+
+    dicts = []
+    for combination in combinations:
+        combination.update(deepcopy({name: combination[name] for name in copied_names}))
+        dicts.append(combination)
 
     return dicts
 
@@ -215,27 +316,256 @@ def create_job_subdirs(job_dir: str, subdirs = ('inputs', 'outputs', 'logs')):
         (job_dir / subdir).mkdir(parents = True, exist_ok = True)
 
 
-def save_specifications(specifications: Iterable[sims.Specification], job_dir: Union[Path, str]):
-    """Save a list of Specifications."""
+def save_specifications(
+    specifications: Iterable[sims.Specification],
+    job_dir: Union[Path, str],
+    workers: Optional[int] = None,
+    chunksize: int = 16,
+    bundle: bool = False,
+    store: Optional[serialization.ContentStore] = None,
+):
+    """
+    Save a list of Specifications.
+
+    Parameters
+    ----------
+    specifications
+        The Specifications to save.
+    job_dir
+        The job directory. The Specifications are saved in its ``inputs`` subdirectory.
+    workers
+        If greater than one, serialize, compress, and write the Specifications in a pool of this many processes.
+    chunksize
+        The number of Specifications to send to a worker process at once.
+    bundle
+        If ``True``, write all of the Specifications to a single :class:`simulacra.bundles.BeetBundle` in the ``inputs`` subdirectory instead of one file each.
+        Use :func:`load_specification` to load them individually.
+    store
+        If given, large values that the Specifications share (like big numpy arrays) are written once to this :class:`simulacra.serialization.ContentStore` instead of into every Specification.
+        Use :func:`job_store` to make one in the job directory, where :func:`load_specification` will find it.
+    """
     print('Saving Specifications...')
 
-    for spec in tqdm(specifications, ascii = True):
-        spec.save(target_dir = Path(job_dir) / 'inputs')
+    target_dir = Path(job_dir) / 'inputs'
+    total = len(specifications) if hasattr(specifications, '__len__') else None
+    save = functools.partial(_save_specification, target_dir = target_dir, bundle = bundle, store = store)
+
+    with contextlib.ExitStack() as stack:
+        if workers is None or workers <= 1:
+            saved = map(save, specifications)
+        else:
+            pool = stack.enter_context(multiprocessing.Pool(processes = workers))
+            saved = _imap_in_windows(pool, save, specifications, chunksize = chunksize, window = 2 * workers)
+
+        writer = stack.enter_context(bundles.BeetBundleWriter(target_dir / SPECIFICATIONS_BUNDLE)) if bundle else None
+        for name, data in tqdm(saved, total = total, ascii = True):
+            if writer is not None:
+                writer.add_bytes(name, data)
 
     logger.debug('Saved Specifications')
 
 
+def _imap_in_windows(
+    pool: 'multiprocessing.pool.Pool',
+    func: Callable,
+    iterable: Iterable,
+    chunksize: int,
+    window: int,
+) -> Iterable:
+    """
+    Like ``pool.imap(func, iterable, chunksize)``, but only read ``iterable`` as fast as the results are consumed, with at most ``window`` chunks in flight.
+
+    :meth:`multiprocessing.pool.Pool.imap` reads its whole input as fast as it can, so it would hold every Specification in memory at once.
+    """
+    iterator = iter(iterable)
+    chunks = iter(lambda: list(itertools.islice(iterator, chunksize)), [])
+
+    pending = collections.deque(pool.apply_async(_call_on_chunk, (func, chunk)) for chunk in itertools.islice(chunks, window))
+    while len(pending) > 0:
+        results = pending.popleft().get()
+        for chunk in itertools.islice(chunks, 1):
+            pending.append(pool.apply_async(_call_on_chunk, (func, chunk)))
+
+        yield from results
+
+
+def _call_on_chunk(func: Callable, chunk: List) -> List:
+    return [func(item) for item in chunk]
+
+
+def _save_specification(
+    spec: sims.Specification,
+    target_dir: Path,
+    bundle: bool,
+    store: Optional[serialization.ContentStore] = None,
+) -> Tuple[str, Optional[bytes]]:
+    """Save the Specification to its own file, or, if it is going into a bundle, return its serialized form so that the bundle writer can add it."""
+    if not bundle:
+        spec.save(target_dir = target_dir, store = store)
+        return str(spec.file_name), None
+
+    with io.BytesIO() as buffer:
+        spec.dump(buffer, store = store)
+        return str(spec.file_name), buffer.getvalue()
+
+
+def _create_and_save_specification(
+    number_and_parameters: Tuple[int, Dict[str, Any]],
+    make_specification: Callable[[int, Dict[str, Any]], sims.Specification],
+    target_dir: Path,
+    bundle: bool,
+    store: Optional[serialization.ContentStore] = None,
+) -> Tuple[str, Optional[bytes], str]:
+    spec = make_specification(*number_and_parameters)
+    name, data = _save_specification(spec, target_dir = target_dir, bundle = bundle, store = store)
+
+    return name, data, str(spec.info())
+
+
+def create_specifications(
+    make_specification: Callable[[int, Dict[str, Any]], sims.Specification],
+    parameter_combinations: Iterable[Dict[str, Any]],
+    job_dir: Union[Path, str],
+    workers: Optional[int] = None,
+    chunksize: int = 16,
+    bundle: bool = False,
+    store: Optional[serialization.ContentStore] = None,
+) -> int:
+    """
+    Create, save, and describe the Specifications for a job in a single streaming pass, without ever holding all of them in memory.
+
+    Each Specification is created from its number and its parameter combination (e.g., from :func:`iter_parameters`), saved to the ``inputs`` subdirectory of the job directory, and its info is appended to ``specifications.txt`` (in the same format as :func:`write_specifications_info_to_file`).
+
+    Parameters
+    ----------
+    make_specification
+        A function that takes the number of a Specification and a dictionary of parameters and returns a :class:`simulacra.Specification`.
+        If ``workers`` is greater than one, it must be picklable (e.g., a module-level function).
+    parameter_combinations
+        The parameter combinations to create Specifications from, numbered in order from zero.
+    job_dir
+        The job directory.
+    workers
+        If greater than one, create, serialize, and write the Specifications in a pool of this many processes.
+    chunksize
+        The number of Specifications to send to a worker process at once.
+    bundle
+        If ``True``, write all of the Specifications to a single bundle (see :func:`save_specifications`).
+    store
+        If given, write large shared values to this content store (see :func:`save_specifications`).
+
+    Returns
+    -------
+    count : int
+        The number of Specifications that were created.
+    """
+    print('Creating and saving Specifications...')
+
+    target_dir = Path(job_dir) / 'inputs'
+    total = len(parameter_combinations) if hasattr(parameter_combinations, '__len__') else None
+    create = functools.partial(
+        _create_and_save_specification,
+        make_specification = make_specification,
+        target_dir = target_dir,
+        bundle = bundle,
+        store = store,
+    )
+    numbered = enumerate(parameter_combinations)
+
+    with contextlib.ExitStack() as stack:
+        if workers is None or workers <= 1:
+            created = map(create, numbered)
+        else:
+            pool = stack.enter_context(multiprocessing.Pool(processes = workers))
+            created = _imap_in_windows(pool, create, numbered, chunksize = chunksize, window = 2 * workers)
+
+        writer = stack.enter_context(bundles.BeetBundleWriter(target_dir / SPECIFICATIONS_BUNDLE)) if bundle else None
+
+        def infos():
+            for name, data, info in tqdm(created, total = total, ascii = True):
+                if writer is not None:
+                    writer.add_bytes(name, data)
+                yield info
+
+        count = _write_info_to_file(infos(), Path(job_dir) / 'specifications.txt')
+
+    logger.debug(f'Created and saved {count} Specifications')
+
+    return count
+
+
+def load_specification(
+    job_dir: Union[Path, str],
+    sim_name: Union[str, int],
+    store: Optional[serialization.ContentStore] = None,
+) -> sims.Specification:
+    """
+    Load a single Specification of a job by its name (usually its simulation number), whether the Specifications were saved to individual files or to a bundle (see :func:`save_specifications`).
+
+    Parameters
+    ----------
+    job_dir
+        The job directory.
+    sim_name
+        The name of the Specification.
+    store
+        The content store that the Specifications were saved with.
+        Defaults to the job's own store (see :func:`job_store`), if it has one.
+        Shared values are only loaded once per process.
+
+    Returns
+    -------
+    spec
+        The Specification.
+    """
+    if store is None and (Path(job_dir) / SPECIFICATIONS_STORE).exists():
+        store = serialization.get_store(Path(job_dir) / SPECIFICATIONS_STORE)
+
+    inputs_dir = Path(job_dir) / 'inputs'
+    bundle_path = inputs_dir / SPECIFICATIONS_BUNDLE
+    if bundle_path.exists():
+        with bundles.BeetBundle(bundle_path, store = store) as bundle:
+            return bundle[sim_name]
+
+    return sims.Specification.load(inputs_dir / f'{sim_name}.spec', store = store)
+
+
+def job_store(job_dir: Union[Path, str], threshold: int = 2 ** 16, types: Tuple[type, ...] = ()) -> serialization.ContentStore:
+    """
+    Return a :class:`simulacra.serialization.ContentStore` in the job directory, for deduplicating large values shared between the job's Specifications (see :func:`save_specifications`).
+
+    Parameters
+    ----------
+    job_dir
+        The job directory.
+    threshold, types
+        Which values to store (see :class:`simulacra.serialization.ContentStore`).
+    """
+    return serialization.ContentStore(Path(job_dir) / SPECIFICATIONS_STORE, threshold = threshold, types = types)
+
+
+def _write_info_to_file(infos: Iterable[str], path: Path) -> int:
+    """Write the info strings to the file one at a time, separated by newlines, and return the number written."""
+    count = 0
+    with path.open(mode = 'w', encoding = 'utf-8') as file:
+        for info in infos:
+            if count > 0:
+                file.write('\n')
+            file.write(info)
+            count += 1
+
+    return count
+
+
 def write_specifications_info_to_file(
-    specifications: Collection[sims.Specification],
+    specifications: Iterable[sims.Specification],
     job_dir: Union[Path, str],
 ):
-    """Write information from the list of the Specifications to a file."""
+    """Write information from the list of the Specifications to a file. The information is written one Specification at a time, so the Specifications may be produced lazily."""
     print('Writing Specification info to file...')
 
     path = Path(job_dir) / 'specifications.txt'
-    text = '\n'.join(str(spec.info()) for spec in specifications)
-    with path.open(mode = 'w', encoding = 'utf-8') as file:
-        file.write(text)
+    _write_info_to_file((str(spec.info()) for spec in specifications), path)
 
     logger.debug('Wrote Specification information to file')
 
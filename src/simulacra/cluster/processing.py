@@ -1,15 +1,23 @@
 import collections
+import collections.abc
 import datetime
+import functools
 import itertools
 import logging
+import multiprocessing
 import os
+import pickle
+import uuid
 from copy import copy
-from typing import Any, Iterable, Optional, Callable, Type, Tuple, Union, List, Collection
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Optional, Callable, Type, Tuple, Union, List, Collection, Dict
 
+import numpy as np
 from tqdm import tqdm
 
-from .. import sims, vis, utils, exceptions
+from .. import sims, vis, utils, exceptions, bundles
 from .. import units as u
+from . import job_creation
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -38,6 +46,238 @@ class SimulationResult:
         self.running_time = copy(sim.running_time.total_seconds())
 
 
+class SimulationResultTable(collections.abc.MutableMapping):
+    """
+    A columnar store for :class:`SimulationResult`, which can be used as a drop-in replacement for the ``OrderedDict`` in :attr:`JobProcessor.data`.
+
+    Each attribute of the stored results is kept in a typed :class:`numpy.ndarray` column (datetimes as ``datetime64``, numbers as numeric dtypes, everything else as ``object``), with one row per simulation name.
+    Whole-job summaries and selections can then be done with vectorized operations instead of by iterating over result objects.
+
+    Indexing by simulation name still returns a :class:`SimulationResult` (reconstructed from the columns), or ``None`` if that simulation has not been processed.
+    """
+
+    def __init__(self, sim_names: Iterable[str], simulation_result_type: Type[SimulationResult] = SimulationResult):
+        """
+        Parameters
+        ----------
+        sim_names
+            The names of the simulations, in row order.
+        simulation_result_type
+            The type of :class:`SimulationResult` to reconstruct when results are retrieved.
+        """
+        self.sim_names = list(sim_names)
+        self.simulation_result_type = simulation_result_type
+
+        self._rows = {sim_name: row for row, sim_name in enumerate(self.sim_names)}
+        self._processed = np.zeros(len(self.sim_names), dtype = bool)
+        self._columns = collections.OrderedDict()
+        self._nulls = collections.OrderedDict()
+        self._untyped_attrs = set()  # attributes that have only ever been None, so their object columns are replaced by typed ones when they get a value
+
+    def __getitem__(self, sim_name: str) -> Optional[SimulationResult]:
+        row = self._rows[sim_name]
+        if not self._processed[row]:
+            return None
+
+        return self._reconstruct(row)
+
+    def __setitem__(self, sim_name: str, sim_result: Optional[SimulationResult]):
+        row = self._rows[sim_name]
+        if sim_result is None:
+            self._processed[row] = False
+            return
+
+        for attr, value in vars(sim_result).items():
+            self._set_value(attr, row, value)
+
+        self._processed[row] = True
+
+    def __delitem__(self, sim_name: str):
+        self[sim_name] = None
+
+    def __iter__(self):
+        return iter(self.sim_names)
+
+    def __len__(self):
+        return len(self.sim_names)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(processed {self.processed.sum()}/{len(self)}, columns = {list(self._columns)})'
+
+    @property
+    def processed(self) -> np.ndarray:
+        """A boolean mask of the rows that hold a processed :class:`SimulationResult`."""
+        return self._processed.copy()
+
+    @property
+    def column_names(self) -> List[str]:
+        """The names of the stored columns, which are the attribute names of the stored results."""
+        return list(self._columns)
+
+    def column(self, attr: str, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Return the values of an attribute for the processed results (or for the rows selected by ``mask``).
+
+        ``None`` values are represented by ``NaT`` in datetime columns, ``NaN`` in float columns, and ``None`` in object columns.
+
+        Parameters
+        ----------
+        attr
+            The name of the attribute.
+        mask
+            A boolean mask over all of the rows. Defaults to :attr:`SimulationResultTable.processed`.
+
+        Returns
+        -------
+        column : :class:`numpy.ndarray`
+            The values of the attribute.
+        """
+        if mask is None:
+            mask = self._processed
+
+        return self._columns[attr][mask]
+
+    def nulls(self, attr: str, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return a boolean mask of the entries of :meth:`SimulationResultTable.column` that are ``None``, with the same arguments."""
+        if mask is None:
+            mask = self._processed
+
+        return self._nulls[attr][mask]
+
+    def mask(self, **kwargs) -> np.ndarray:
+        """
+        Return a boolean mask over the rows that selects processed results whose attributes match the key-value pairs passed as keyword arguments.
+
+        Parameters
+        ----------
+        kwargs
+            Key-value pairs to match against.
+
+        Returns
+        -------
+        mask : :class:`numpy.ndarray`
+            A boolean array with one entry per row.
+        """
+        mask = self._processed.copy()
+
+        for attr, value in kwargs.items():
+            try:
+                column = self._columns[attr]
+            except KeyError:
+                raise AttributeError(f'{self.simulation_result_type.__name__} has no attribute {attr}')
+
+            mask &= _column_equals(column, self._nulls[attr], value)
+
+        return mask
+
+    def select(self, mask: np.ndarray) -> List[SimulationResult]:
+        """Return the processed :class:`SimulationResult` in the rows selected by a boolean mask, in row order."""
+        rows = np.flatnonzero(np.asarray(mask, dtype = bool) & self._processed)
+
+        return [self._reconstruct(row) for row in rows]
+
+    def _set_value(self, attr: str, row: int, value: Any):
+        try:
+            column = self._columns[attr]
+        except KeyError:
+            column = self._columns[attr] = _empty_column(value, len(self.sim_names))
+            self._nulls[attr] = np.ones(len(self.sim_names), dtype = bool)
+            if value is None:
+                self._untyped_attrs.add(attr)
+
+        nulls = self._nulls[attr]
+
+        if value is None:
+            column[row] = _null_value(column.dtype)
+            nulls[row] = True
+            return
+
+        if attr in self._untyped_attrs:
+            self._untyped_attrs.discard(attr)
+            column = self._columns[attr] = _empty_column(value, len(self.sim_names))
+
+        if column.dtype.kind != 'O' and not np.can_cast(_infer_dtype(value), column.dtype):
+            column = self._columns[attr] = column.astype(object)
+            column[nulls] = None
+
+        column[row] = value
+        nulls[row] = False
+
+    def _reconstruct(self, row: int) -> SimulationResult:
+        sim_result = self.simulation_result_type.__new__(self.simulation_result_type)
+        for attr, column in self._columns.items():
+            if self._nulls[attr][row]:
+                value = None
+            else:
+                value = _to_builtin(column[row])
+            setattr(sim_result, attr, value)
+
+        return sim_result
+
+
+def _infer_dtype(value: Any) -> np.dtype:
+    """Return the dtype that a column holding ``value`` should have."""
+    if isinstance(value, bool):
+        return np.dtype(bool)
+    elif isinstance(value, int):
+        return np.dtype(np.int64)
+    elif isinstance(value, float):
+        return np.dtype(np.float64)
+    elif isinstance(value, datetime.datetime):
+        return np.dtype('datetime64[us]')
+    elif isinstance(value, datetime.timedelta):
+        return np.dtype('timedelta64[us]')
+    elif isinstance(value, (np.number, np.bool_, np.datetime64, np.timedelta64)):
+        return value.dtype
+
+    return np.dtype(object)
+
+
+def _null_value(dtype: np.dtype) -> Any:
+    """Return the placeholder value used for ``None`` in a column of the given dtype."""
+    if dtype.kind in 'Mm':
+        return dtype.type('NaT')
+    elif dtype.kind in 'fc':
+        return np.nan
+    elif dtype.kind == 'O':
+        return None
+
+    return dtype.type(0)
+
+
+def _empty_column(value: Any, length: int) -> np.ndarray:
+    dtype = _infer_dtype(value)
+
+    return np.full(length, _null_value(dtype), dtype = dtype)
+
+
+def _to_builtin(value: Any) -> Any:
+    """Convert a numpy scalar (e.g., a ``datetime64``) to the equivalent Python object."""
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+def _column_equals(column: np.ndarray, nulls: np.ndarray, value: Any) -> np.ndarray:
+    """Return a boolean mask of the entries of ``column`` that are equal to ``value``."""
+    if value is None:
+        return nulls.copy()
+
+    if column.dtype.kind != 'O' and np.can_cast(_infer_dtype(value), column.dtype):
+        return (column == value) & ~nulls
+
+    return np.fromiter((not null and _entry_equals(entry, value) for entry, null in zip(column, nulls)), dtype = bool, count = len(column))
+
+
+def _entry_equals(entry: Any, value: Any) -> bool:
+    """Compare an entry of an object column to a value, even if either one is an array (for which ``==`` is elementwise)."""
+    if isinstance(entry, np.ndarray) or isinstance(value, np.ndarray):
+        return np.array_equal(entry, value)
+
+    return bool(entry == value)
+
+
 class JobProcessor(sims.Beet):
     """
     A class that processes a collection of pickled Simulations. Should be subclassed for specialization.
@@ -48,10 +288,20 @@ class JobProcessor(sims.Beet):
         The total running time of all the simulations in the job.
     elapsed_time
         The elapsed time of the job (first simulation started to last simulation ended).
+    columnar_data
+        A class attribute which determines how :attr:`JobProcessor.data` is stored.
+        If ``False`` (the default), it is an ``OrderedDict`` of :class:`SimulationResult`.
+        If ``True``, it is a :class:`SimulationResultTable`, which makes summaries and selections over large jobs much faster.
+    mmap_sims
+        A class attribute which determines whether Simulations are loaded with ``mmap = True``, so that arrays they stored uncompressed are only read if they are used (see :func:`simulacra.Beet.load`).
+        The ``load`` method of :attr:`JobProcessor.simulation_type` must accept ``mmap`` if this is ``True``.
+        Only arrays in Simulations saved with a ``default_mmap_threshold`` (see :class:`simulacra.Beet`) are memory-mapped, so this is off by default too.
     """
 
     simulation_type = sims.Simulation
     simulation_result_type = SimulationResult
+    columnar_data = False
+    mmap_sims = False
 
     def __init__(self, job_name: str, job_dir_path: str):
         """
@@ -73,7 +323,10 @@ class JobProcessor(sims.Beet):
         self.sim_count = len(self.sim_names)
         self.unprocessed_sim_names = set(self.sim_names)
 
-        self.data = collections.OrderedDict((sim_name, None) for sim_name in self.sim_names)
+        if self.columnar_data:
+            self.data = SimulationResultTable(self.sim_names, simulation_result_type = self.simulation_result_type)
+        else:
+            self.data = collections.OrderedDict((sim_name, None) for sim_name in self.sim_names)
 
     def __str__(self):
         return '{} for job {}, processed {}/{} Simulations'.format(self.__class__.__name__, self.name, self.sim_count - len(self.unprocessed_sim_names), self.sim_count)
@@ -101,20 +354,39 @@ class JobProcessor(sims.Beet):
     @property
     def running_time(self):
         return datetime.timedelta(
-            seconds = sum(r.running_time for r in self.data.values() if r is not None)
+            seconds = float(self._result_column('running_time').sum())
         )
 
     @property
     def elapsed_time(self):
-        earliest = min(r.init_time for r in self.data.values() if r is not None)
-        latest = max(r.end_time for r in self.data.values() if r is not None)
+        earliest = self._result_column('init_time').min()
+        latest = self._result_column('end_time').max()
+
+        return _to_builtin(latest - earliest)
+
+    def _result_column(self, attr: str) -> np.ndarray:
+        """Return an array of the values of an attribute of all of the processed :class:`SimulationResult`."""
+        if isinstance(self.data, SimulationResultTable):
+            return self.data.column(attr)
 
-        return latest - earliest
+        return np.array([getattr(r, attr) for r in self.data.values() if r is not None])
+
+    @property
+    def spec_bundle_path(self):
+        return os.path.join(self.inputs_dir, job_creation.SPECIFICATIONS_BUNDLE)
 
     def get_sim_names_from_specs(self):
-        """Get a list of Simulation file names based on their Specifications."""
+        """Get a list of Simulation file names based on their Specifications, which may be in individual files or in a bundle (see :func:`simulacra.cluster.save_specifications`)."""
+        if os.path.exists(self.spec_bundle_path):
+            with bundles.BeetBundle(self.spec_bundle_path) as bundle:
+                return sorted(bundle, key = int)
+
         return sorted([f.strip('.spec') for f in os.listdir(self.inputs_dir)], key = int)
 
+    def load_spec(self, sim_name: Union[str, int]) -> sims.Specification:
+        """Load the Specification of a single Simulation by its file name, from its own file or from the bundle."""
+        return job_creation.load_specification(self.job_dir_path, sim_name)
+
     def get_sim_names_from_sims(self):
         """Get a list of Simulation file names actually found in the output directory."""
         return sorted([f.strip('.sim') for f in os.listdir(self.outputs_dir)], key = int)
@@ -127,6 +399,54 @@ class JobProcessor(sims.Beet):
     ):
         return super().save(target_dir = target_dir, file_extension = file_extension, **kwargs)
 
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'JobProcessor':
+        """
+        Load a JobProcessor from ``path``, then replay any :class:`SimulationResult` recorded in its journal since it was last saved.
+
+        Parameters
+        ----------
+        path
+            The path to load a JobProcessor from.
+        kwargs
+            Keyword arguments are passed to :func:`simulacra.Beet.load`.
+
+        Returns
+        -------
+        :class:`JobProcessor`
+            The loaded JobProcessor.
+        """
+        job_processor = super().load(path, **kwargs)
+        job_processor._replay_journal(_journal_path(path))
+
+        return job_processor
+
+    def _replay_journal(self, journal_path: Path):
+        """Add the :class:`SimulationResult` stored in a journal file to the collected data."""
+        if not journal_path.exists():
+            return
+
+        replayed = 0
+        with journal_path.open(mode = 'rb') as journal:
+            if _read_journal_owner(journal) != self.uuid:
+                logger.warning(f'Ignoring journal {journal_path}, which was written by a different JobProcessor than the one saved at {journal_path.with_suffix("")}')
+                return
+
+            while True:
+                try:
+                    sim_name, sim_result = pickle.load(journal)
+                except EOFError:
+                    break
+                except Exception:  # the last record may have been cut off by a crash while writing it
+                    logger.warning(f'Ignoring incomplete record at the end of journal {journal_path}')
+                    break
+
+                self.data[sim_name] = sim_result
+                self.unprocessed_sim_names.discard(sim_name)
+                replayed += 1
+
+        logger.debug(f'Replayed {replayed} SimulationResults from journal {journal_path}')
+
     def _load_sim(self, sim_file_name: str, **load_kwargs) -> sims.Simulation:
         """
         Load a :class:`Simulation` by its ``file_name``.
@@ -137,6 +457,7 @@ class JobProcessor(sims.Beet):
             The ``file_name`` of the :class:`Simulation` to load.
         load_kwargs
             Keyword arguments are passed to the ``load`` method of the :class:`Simulation``.
+            If :attr:`JobProcessor.mmap_sims` is ``True``, ``mmap = True`` is passed by default.
 
         Returns
         -------
@@ -144,8 +465,14 @@ class JobProcessor(sims.Beet):
             The loaded :class:`Simulation`.
         """
         sim_path = os.path.join(self.outputs_dir, f'{sim_file_name}.sim')
+        if self.mmap_sims:
+            load_kwargs.setdefault('mmap', True)
 
         try:
+            metadata = self.simulation_type.load_metadata(sim_path)  # only reads the header, so unfinished Simulations are cheap to skip
+            if metadata is not None and metadata.get('status') != sims.Status.FINISHED:
+                raise exceptions.UnfinishedSimulation(f'{sim_file_name}.sim from job {self.name} exists but is not finished')
+
             sim = self.simulation_type.load(os.path.join(sim_path), **load_kwargs)
             logger.debug(f'Loaded {sim_file_name}.sim from job {self.name}')
             if sim.status != sims.Status.FINISHED:
@@ -154,35 +481,126 @@ class JobProcessor(sims.Beet):
         except FileNotFoundError as e:
             raise exceptions.MissingSimulation(f'Failed to find completed {sim_file_name}.sim from job {self.name}')
 
-    def load_sims(self, force_reprocess: bool = False):
+    def _load_sim_result(self, sim_file_name: str) -> SimulationResult:
+        """Load a :class:`Simulation` by its ``file_name`` and return the :class:`SimulationResult` generated from it."""
+        sim = self._load_sim(sim_file_name)
+
+        return self.simulation_result_type(sim, job_processor = self)
+
+    def _iter_sim_result_loaders(self, sim_names: Collection[str], workers: Optional[int] = None) -> Iterable[Tuple[str, Callable[[], SimulationResult]]]:
+        """
+        Yield ``(sim_name, get_result)`` pairs, where calling ``get_result()`` returns the :class:`SimulationResult` for that Simulation or raises the exception encountered while loading it.
+
+        If ``workers`` is greater than one, the Simulations are loaded in a pool of processes and only the :class:`SimulationResult` are sent back to this process.
+        """
+        if workers is None or workers <= 1:
+            for sim_name in sim_names:
+                yield sim_name, functools.partial(self._load_sim_result, sim_name)
+            return
+
+        with multiprocessing.Pool(processes = workers, initializer = _init_load_sims_worker, initargs = (self,)) as pool:
+            async_results = [(sim_name, pool.apply_async(_load_sim_result_in_worker, (sim_name,))) for sim_name in sim_names]
+            for sim_name, async_result in async_results:
+                yield sim_name, async_result.get
+
+    def get_sim_metadata(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Get the metadata of every Simulation in the output directory by reading only the headers of the files (see :func:`simulacra.Simulation.load_metadata`).
+
+        Returns
+        -------
+        :class:`dict`
+            A dictionary mapping Simulation file names to their metadata (``None`` for files written by older versions of Simulacra).
+        """
+        return collections.OrderedDict(
+            (sim_name, self.simulation_type.load_metadata(os.path.join(self.outputs_dir, f'{sim_name}.sim')))
+            for sim_name in self.get_sim_names_from_sims()
+        )
+
+    def load_sims(
+        self,
+        force_reprocess: bool = False,
+        workers: Optional[int] = None,
+        checkpoint_ratio: Optional[float] = 0.5,
+    ):
         """
         Process the job by loading newly-downloaded Simulations and generating SimulationResults from them.
 
+        Each new :class:`SimulationResult` is appended to a journal file next to the saved JobProcessor (and synced to disk) as soon as it is generated.
+        The whole JobProcessor is only re-saved (and the journal emptied) when the journal holds more than ``checkpoint_ratio`` times as many SimulationResults as the last saved JobProcessor, and when loading finishes.
+        :func:`JobProcessor.load` replays the journal, so no processed Simulations are lost if processing is interrupted.
+        The journal records which JobProcessor wrote it, so a journal left behind by a different JobProcessor with the same ``file_name`` is discarded instead of being appended to, and is never replayed.
+
+        The saves therefore get geometrically further apart as the job is processed, so there are only logarithmically many of them,
+        and each :class:`SimulationResult` is re-written only a constant number of times on average (about ``1 + 1 / checkpoint_ratio``), however many Simulations there are.
+
         Parameters
         ----------
         force_reprocess : :class:`bool`
             If ``True``, process all Simulations in the output directory regardless of prior processing status.
+        workers : :class:`int`
+            If greater than one, load the Simulations in a pool of this many processes.
+            Each process sends back only the :class:`SimulationResult`, not the whole :class:`Simulation`.
+        checkpoint_ratio : :class:`float`
+            Re-save the JobProcessor when the journal holds more than this fraction of the number of SimulationResults in the last saved JobProcessor.
+            Smaller values mean shorter journals to replay, at the cost of more frequent saves. ``None`` to only save when loading finishes.
         """
         with utils.BlockTimer() as t:
             logger.info('Loading simulations from job {}'.format(self.name))
 
             if force_reprocess:
-                sim_names = tqdm(copy(self.sim_names), ncols = 80)
+                sim_names = copy(self.sim_names)
+                tqdm_kwargs = dict(ncols = 80)
             else:
-                new_sims = self.unprocessed_sim_names.intersection(self.get_sim_names_from_sims())  # only process newly-downloaded Simulations
-                sim_names = tqdm(new_sims)
+                sim_names = self.unprocessed_sim_names.intersection(self.get_sim_names_from_sims())  # only process newly-downloaded Simulations
+                tqdm_kwargs = dict()
 
-            for sim_name in sim_names:
-                try:
-                    sim = self._load_sim(sim_name)
-                    self.data[sim_name] = self.simulation_result_type(sim, job_processor = self)
-                    self.unprocessed_sim_names.discard(sim_name)
+            journal_path = _journal_path(Path(self.job_dir_path).absolute() / f'{self.file_name}.job')
+            try:
+                with journal_path.open(mode = 'rb') as journal:
+                    owned = _read_journal_owner(journal) == self.uuid
+            except FileNotFoundError:
+                owned = False
+
+            with journal_path.open(mode = 'ab' if owned else 'wb') as journal:  # another JobProcessor's journal is discarded
+                has_header = owned
+                journaled = 0
+                saved = self.sim_count - len(self.unprocessed_sim_names)
+
+                def checkpoint():
+                    nonlocal has_header, journaled, saved
 
                     self.save(target_dir = self.job_dir_path)
-                except exceptions.UnfinishedSimulation as e:
-                    logger.debug(e)
-                except Exception as e:
-                    logger.exception(f'Exception encountered while processing simulation {sim_name}')
+                    journal.seek(0)
+                    journal.truncate()
+
+                    has_header = False
+                    journaled = 0
+                    saved = self.sim_count - len(self.unprocessed_sim_names)
+
+                for sim_name, get_result in tqdm(self._iter_sim_result_loaders(sim_names, workers = workers), total = len(sim_names), **tqdm_kwargs):
+                    try:
+                        sim_result = get_result()
+                        self.data[sim_name] = sim_result
+                        self.unprocessed_sim_names.discard(sim_name)
+
+                        if not has_header:
+                            pickle.dump({'owner': self.uuid}, journal, protocol = -1)
+                            has_header = True
+                        pickle.dump((sim_name, sim_result), journal, protocol = -1)
+                        journal.flush()
+                        os.fsync(journal.fileno())
+                        journaled += 1
+
+                        if checkpoint_ratio is not None and journaled > checkpoint_ratio * saved:
+                            checkpoint()
+                    except exceptions.UnfinishedSimulation as e:
+                        logger.debug(e)
+                    except Exception as e:
+                        logger.exception(f'Exception encountered while processing simulation {sim_name}')
+
+                if journaled > 0:
+                    checkpoint()
 
         logger.info(f'Finished loading simulations from job {self.name}. Failed to find {len(self.unprocessed_sim_names)} / {self.sim_count} simulations. Elapsed time: {t.wall_time_elapsed}')
 
@@ -217,6 +635,9 @@ class JobProcessor(sims.Beet):
         -------
 
         """
+        if isinstance(self.data, SimulationResultTable):
+            return self.data.select(self.data.mask(**kwargs))
+
         out = []
 
         for sim_result in (r for r in self.data.values() if r is not None):
@@ -244,10 +665,13 @@ class JobProcessor(sims.Beet):
             if test_function(sim_result) and sim_result is not None
         ]
 
-    @utils.memoize
+    @utils.bounded_memoize
     def parameter_set(self, parameter: 'Parameter'):
         """Get the set of values of a parameter from the collected data."""
-        return set(getattr(result, parameter) for result in self.data.values())
+        if isinstance(self.data, SimulationResultTable):
+            return set(None if null else _to_builtin(v) for v, null in zip(self.data.column(parameter), self.data.nulls(parameter)))
+
+        return set(getattr(result, parameter) for result in self.data.values() if result is not None)
 
     def make_summary_plots(self):
         """Hook method for making automatic summary plots from collected data."""
@@ -256,6 +680,11 @@ class JobProcessor(sims.Beet):
     def write_time_diagnostics_to_file(self):
         """Write time diagnostic information for the job to a text file in the job directory."""
         path = os.path.join(self.job_dir_path, f'{self.name}_diagnostics.txt')
+
+        init_times = self._result_column('init_time')
+        start_times = self._result_column('start_time')
+        end_times = self._result_column('end_time')
+
         with open(path, mode = 'w') as f:
             f.write('\n'.join((
                 f'Diagnostic Data for {self.name}:',
@@ -267,12 +696,12 @@ class JobProcessor(sims.Beet):
                 f'Combined Runtime: {self.running_time}',
                 f'Speedup Factor: {u.uround(self.running_time / self.elapsed_time)}',
                 '',
-                f'Earliest Sim Init: {min(r.init_time for r in self.data.values() if r is not None)}',
-                f'Latest Sim Init: {max(r.init_time for r in self.data.values() if r is not None)}',
-                f'Earliest Sim Start: {min(r.start_time for r in self.data.values() if r is not None)}',
-                f'Latest Sim Start: {max(r.start_time for r in self.data.values() if r is not None)}',
-                f'Earliest Sim Finish: {min(r.end_time for r in self.data.values() if r is not None)}',
-                f'Latest Sim Finish: {max(r.end_time for r in self.data.values() if r is not None)}',
+                f'Earliest Sim Init: {_to_builtin(init_times.min())}',
+                f'Latest Sim Init: {_to_builtin(init_times.max())}',
+                f'Earliest Sim Start: {_to_builtin(start_times.min())}',
+                f'Latest Sim Start: {_to_builtin(start_times.max())}',
+                f'Earliest Sim Finish: {_to_builtin(end_times.min())}',
+                f'Latest Sim Finish: {_to_builtin(end_times.max())}',
             )))
 
         logger.debug(f'Wrote diagnostic information for job {self.name} to {path}')
@@ -280,8 +709,8 @@ class JobProcessor(sims.Beet):
     def make_time_diagnostics_plot(self):
         """Save a diagnostics plot to the job directory.."""
 
-        sim_numbers = [result.file_name for result in self.data.values() if result is not None]
-        running_time = [result.running_time for result in self.data.values() if result is not None]
+        sim_numbers = self._result_column('file_name')
+        running_time = self._result_column('running_time')
 
         vis.xy_plot(
             f'{self.name}__diagnostics',
@@ -299,7 +728,7 @@ class JobProcessor(sims.Beet):
             fig = fm.fig
             ax = fig.add_subplot(111)
 
-            n, bins, patches = ax.hist([r / u.hour for r in running_time], 50)
+            n, bins, patches = ax.hist(running_time / u.hour, 50)
             ax.set_xlabel('Runtime')
             ax.set_ylabel('Number of Simulations')
 
@@ -308,6 +737,34 @@ class JobProcessor(sims.Beet):
         logger.debug(f'Generated runtime histogram plot for job {self.name}')
 
 
+def _journal_path(job_processor_path: Union[Path, str]) -> Path:
+    """Return the path to the journal file that belongs to a saved :class:`JobProcessor`."""
+    return Path(f'{job_processor_path}.journal')
+
+
+def _read_journal_owner(journal: BinaryIO) -> Optional[uuid.UUID]:
+    """Read the header at the start of a journal file and return the :attr:`simulacra.Beet.uuid` of the :class:`JobProcessor` that wrote it, or ``None`` if the journal is empty or has no header."""
+    try:
+        header = pickle.load(journal)
+    except Exception:  # empty, or cut off by a crash while writing the header
+        return None
+
+    return header.get('owner') if isinstance(header, dict) else None
+
+
+_load_sims_worker_job_processor = None
+
+
+def _init_load_sims_worker(job_processor: JobProcessor):
+    """Store the :class:`JobProcessor` in a :func:`JobProcessor.load_sims` worker process so that it only needs to be sent once."""
+    global _load_sims_worker_job_processor
+    _load_sims_worker_job_processor = job_processor
+
+
+def _load_sim_result_in_worker(sim_file_name: str) -> SimulationResult:
+    return _load_sims_worker_job_processor._load_sim_result(sim_file_name)
+
+
 def combine_job_processors(*job_processors, job_dir_path = None):
     sim_type = job_processors[0].simulation_type
     jp_type = job_processors[0].__class__
@@ -10,5 +10,21 @@ class UnfinishedSimulation(SimulacraException):
 class MissingSimulation(SimulacraException):
     pass
 
+
+class MismatchedSimulation(SimulacraException):
+    pass
+
 class IllegalSphericalHarmonic(SimulacraException):
     pass
+
+
+class RemoteShellClosed(SimulacraException):
+    pass
+
+
+class BulkDownloadFailed(SimulacraException):
+    pass
+
+
+class StalePool(SimulacraException):
+    pass
@@ -0,0 +1,585 @@
+import bz2
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import logging
+import lzma
+import mmap as _mmap  # the name mmap is used for keyword arguments below
+import os
+import pickle
+import struct
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+MAGIC = b'SIMULACRA'
+FORMAT_VERSION = 2
+GZIP_MAGIC = b'\x1f\x8b'
+
+_HEADER_LENGTH = struct.Struct('>I')
+_FRAME_COUNT = struct.Struct('>I')
+_FRAME_INFO = struct.Struct('>BQ')  # flags, length
+
+FRAME_COMPRESSED = 0
+FRAME_RAW = 1  # stored uncompressed and aligned, so that it can be memory-mapped
+
+RAW_FRAME_ALIGNMENT = 64
+CLASS_DEFAULT = object()  # passed as an mmap_threshold to mean "use the default_mmap_threshold of the Beet's class", since None means "compress every buffer"
+
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+OUT_OF_BAND_BUFFERS = PICKLE_PROTOCOL >= 5  # pickle protocol 5 lets large buffers (like numpy arrays) skip the pickle stream
+
+
+class Codec:
+    """
+    A class that represents a compression scheme for saved :class:`simulacra.Beet`.
+
+    Subclasses should set :attr:`Codec.name` and implement :func:`Codec.compress` and :func:`Codec.decompress`.
+    They may be registered by name using :func:`register_codec`.
+    """
+
+    name = None
+
+    def compress(self, data: Union[bytes, memoryview]) -> bytes:
+        """Return the compressed form of ``data``."""
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        """Return the decompressed form of ``data``."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+
+class NoCodec(Codec):
+    """A :class:`Codec` that does no compression at all."""
+
+    name = 'none'
+
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+
+class LeveledCodec(Codec):
+    """A :class:`Codec` whose compression ratio (and speed) is controlled by a compression level."""
+
+    default_level = None
+
+    def __init__(self, level: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        level
+            The compression level. Uses :attr:`LeveledCodec.default_level` if ``None``.
+        """
+        self.level = level if level is not None else self.default_level
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(level = {self.level})'
+
+
+class GzipCodec(LeveledCodec):
+    name = 'gzip'
+    default_level = 6
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel = self.level)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
+
+
+class ZlibCodec(LeveledCodec):
+    name = 'zlib'
+    default_level = 6
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class Bz2Codec(LeveledCodec):
+    name = 'bz2'
+    default_level = 9
+
+    def compress(self, data):
+        return bz2.compress(data, compresslevel = self.level)
+
+    def decompress(self, data):
+        return bz2.decompress(data)
+
+
+class LzmaCodec(LeveledCodec):
+    name = 'lzma'
+    default_level = 6
+
+    def compress(self, data):
+        return lzma.compress(data, preset = self.level)
+
+    def decompress(self, data):
+        return lzma.decompress(data)
+
+
+class ZstdCodec(LeveledCodec):
+    """A :class:`Codec` using `Zstandard <https://facebook.github.io/zstd/>`_. Requires the ``zstandard`` package."""
+
+    name = 'zstd'
+    default_level = 3
+
+    def __init__(self, level: Optional[int] = None):
+        if zstandard is None:
+            raise ImportError('The zstd codec requires the zstandard package')
+
+        super().__init__(level = level)
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level = self.level).compress(data)
+
+    def decompress(self, data):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+class Lz4Codec(LeveledCodec):
+    """A :class:`Codec` using `LZ4 <https://lz4.github.io/lz4/>`_. Requires the ``lz4`` package."""
+
+    name = 'lz4'
+    default_level = 0
+
+    def __init__(self, level: Optional[int] = None):
+        if lz4 is None:
+            raise ImportError('The lz4 codec requires the lz4 package')
+
+        super().__init__(level = level)
+
+    def compress(self, data):
+        return lz4.frame.compress(data, compression_level = self.level)
+
+    def decompress(self, data):
+        return lz4.frame.decompress(data)
+
+
+CODECS: Dict[str, Callable[..., Codec]] = {}
+
+
+def register_codec(name: str, codec_factory: Callable[..., Codec]):
+    """
+    Register a :class:`Codec` so that it can be selected by name.
+
+    Parameters
+    ----------
+    name
+        The name of the codec, which is also what is recorded in file headers.
+    codec_factory
+        A callable (usually a :class:`Codec` subclass) that takes an optional ``level`` keyword argument and returns a :class:`Codec`.
+    """
+    CODECS[name] = codec_factory
+
+
+for _codec_type in (NoCodec, GzipCodec, ZlibCodec, Bz2Codec, LzmaCodec, ZstdCodec, Lz4Codec):
+    register_codec(_codec_type.name, _codec_type)
+
+
+def codec_available(name: str) -> bool:
+    """Return ``True`` if the named codec is registered and its dependencies are installed."""
+    try:
+        get_codec(name)
+        return True
+    except (KeyError, ImportError):
+        return False
+
+
+def get_codec(codec: Union[str, Codec], level: Optional[int] = None) -> Codec:
+    """
+    Return a :class:`Codec` from a name or an existing :class:`Codec`.
+
+    Parameters
+    ----------
+    codec
+        The name of a registered codec, or a :class:`Codec` (which is returned unchanged).
+    level
+        The compression level to use, if the codec supports levels.
+
+    Returns
+    -------
+    codec : :class:`Codec`
+    """
+    if isinstance(codec, Codec):
+        return codec
+
+    try:
+        codec_factory = CODECS[codec]
+    except KeyError:
+        raise KeyError(f'No codec named {codec} is registered. Registered codecs: {", ".join(CODECS)}')
+
+    if level is not None:
+        return codec_factory(level = level)
+    return codec_factory()
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode values that JSON can't represent directly, for use in headers. Unrecognized values are stored as their ``repr``."""
+    if isinstance(obj, datetime.datetime):
+        return {'__datetime__': obj.isoformat()}
+    elif isinstance(obj, datetime.timedelta):
+        return {'__timedelta__': obj.total_seconds()}
+    elif isinstance(obj, uuid.UUID):
+        return {'__uuid__': str(obj)}
+    elif hasattr(obj, 'item') and hasattr(obj, 'dtype') and getattr(obj, 'ndim', None) == 0:  # numpy scalars
+        return obj.item()
+
+    return repr(obj)
+
+
+def _json_object_hook(dct: Dict[str, Any]) -> Any:
+    """Decode the values encoded by :func:`_json_default`."""
+    if len(dct) == 1:
+        (key, value), = dct.items()
+        if key == '__datetime__':
+            return datetime.datetime.fromisoformat(value)
+        elif key == '__timedelta__':
+            return datetime.timedelta(seconds = value)
+        elif key == '__uuid__':
+            return uuid.UUID(value)
+
+    return dct
+
+
+STORE_REFERENCE = 'simulacra-store'  # the tag of persistent ids that refer to values in a ContentStore
+
+
+class ContentStore:
+    """
+    A content-addressed store for large values that are shared between many saved objects, like the same mesh or potential in every :class:`simulacra.Specification` of a parameter sweep.
+
+    When an object is saved with a store (see :func:`dump`), each large value inside it is written to the store once, under the hash of its contents, and the saved object only holds a reference to it.
+    When the object is loaded with the same store, the references are resolved and the values are cached, so objects loaded in the same process share them.
+    Shared numpy arrays are loaded read-only so that changing one object's array can't silently change the others.
+
+    Values are stored as individual files in Simulacra's serialization format, in subdirectories named by the first two characters of their hashes.
+    Writes are atomic, so many processes can write to the same store at once.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, 'os.PathLike'],
+        threshold: int = 2 ** 16,
+        types: Tuple[type, ...] = (),
+        codec: Union[str, Codec] = 'gzip',
+    ):
+        """
+        Parameters
+        ----------
+        path
+            The directory to keep the store in.
+        threshold
+            Only numpy arrays with at least this many bytes, and instances of ``types`` whose pickles have at least this many bytes, are stored.
+        types
+            Instances of these types (e.g., :class:`simulacra.summables.Sum`) are stored if their pickles are large enough.
+            Only numpy arrays are stored by default.
+        codec
+            The :class:`Codec` (or the name of one) to compress stored values with.
+        """
+        self.path = Path(path)
+        self.threshold = threshold
+        self.types = tuple(types)
+        self.codec = codec
+
+        self._cache = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = {}  # don't send loaded values along to other processes
+
+        return state
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(path = {self.path})'
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.path.glob('*/*.value'))
+
+    def _value_path(self, key: str) -> Path:
+        return self.path / key[:2] / f'{key}.value'
+
+    def key(self, obj: Any) -> Optional[str]:
+        """Return the key that ``obj`` would be stored under, or ``None`` if it should not be stored."""
+        if isinstance(obj, np.ndarray) and obj.dtype != object and obj.nbytes >= self.threshold:
+            h = hashlib.blake2b(digest_size = 20)
+            h.update(f'{obj.dtype.str}{obj.shape}'.encode())
+            h.update(memoryview(np.ascontiguousarray(obj)).cast('B'))
+            return h.hexdigest()
+        elif self.types and isinstance(obj, self.types):
+            data = pickle.dumps(obj, protocol = PICKLE_PROTOCOL)
+            if len(data) >= self.threshold:
+                return hashlib.blake2b(data, digest_size = 20).hexdigest()
+
+        return None
+
+    def put(self, obj: Any) -> Optional[str]:
+        """Store ``obj`` if it is large enough and isn't already in the store, and return its key (or ``None`` if it should not be stored)."""
+        key = self.key(obj)
+        if key is None:
+            return None
+
+        path = self._value_path(key)
+        if not path.exists():
+            path.parent.mkdir(parents = True, exist_ok = True)
+            working_path = path.with_name(f'{path.name}.{os.getpid()}.{uuid.uuid4().hex}.working')
+            with working_path.open(mode = 'wb') as file:
+                dump(obj, file, codec = self.codec)
+            os.replace(working_path, path)
+
+            logger.debug(f'Stored {type(obj).__name__} as {key} in {self}')
+
+        return key
+
+    def get(self, key: str) -> Any:
+        """Load the value stored under ``key``, or return it from the cache if it has already been loaded."""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        with self._value_path(key).open(mode = 'rb') as file:
+            value = load(file)
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+        return self._cache.setdefault(key, value)
+
+    def clear_cache(self):
+        """Forget all of the values that have been loaded."""
+        self._cache.clear()
+
+
+_STORES = {}
+
+
+def get_store(path: Union[str, 'os.PathLike']) -> ContentStore:
+    """Return a :class:`ContentStore` for the directory that is shared by every call with the same path, so that values loaded through it are only loaded once per process."""
+    path = Path(path).absolute()
+    try:
+        return _STORES[path]
+    except KeyError:
+        return _STORES.setdefault(path, ContentStore(path))
+
+
+class _StorePickler(pickle.Pickler):
+    """A pickler that replaces large values with references to a :class:`ContentStore`."""
+
+    def __init__(self, file: BinaryIO, store: ContentStore, root: Any, **kwargs):
+        super().__init__(file, **kwargs)
+        self.store = store
+        self.root = root
+
+    def persistent_id(self, obj: Any) -> Optional[Tuple[str, str]]:
+        if obj is self.root:
+            return None
+
+        key = self.store.put(obj)
+        if key is None:
+            return None
+
+        return STORE_REFERENCE, key
+
+
+class _StoreUnpickler(pickle.Unpickler):
+    """An unpickler that resolves references to a :class:`ContentStore`."""
+
+    def __init__(self, file: BinaryIO, store: Optional[ContentStore], **kwargs):
+        super().__init__(file, **kwargs)
+        self.store = store
+
+    def persistent_load(self, pid: Tuple[str, str]) -> Any:
+        tag, key = pid
+        if tag != STORE_REFERENCE:
+            raise pickle.UnpicklingError(f'Unknown persistent id {pid}')
+        if self.store is None:
+            raise pickle.UnpicklingError('This object refers to values in a ContentStore, so it must be loaded with one (pass store = ...)')
+
+        return self.store.get(key)
+
+
+def _padding(position: int) -> int:
+    """Return the number of bytes needed to pad ``position`` up to a multiple of :data:`RAW_FRAME_ALIGNMENT`."""
+    return -position % RAW_FRAME_ALIGNMENT
+
+
+def dump(
+    obj: Any,
+    file: BinaryIO,
+    codec: Union[str, Codec] = 'gzip',
+    header: Optional[Dict[str, Any]] = None,
+    mmap_threshold: Optional[int] = None,
+    store: Optional[ContentStore] = None,
+):
+    """
+    Write an object to a binary file in Simulacra's serialization format.
+
+    The file starts with a small header that records the codec, so that :func:`load` doesn't need to guess how the file was written.
+    The pickle stream and any out-of-band buffers (e.g., the data of large numpy arrays) are then written as separately-compressed frames.
+
+    Parameters
+    ----------
+    obj
+        The object to serialize.
+    file
+        A binary file opened for writing.
+    codec
+        The :class:`Codec` (or the name of one) to compress the frames with.
+    header
+        Additional JSON-serializable entries to store in the header.
+    mmap_threshold
+        Out-of-band buffers of at least this many bytes are stored uncompressed and aligned, so that ``load(file, mmap = True)`` can memory-map them instead of reading them.
+        If the codec is ``'none'``, all out-of-band buffers are stored this way.
+    store
+        If not ``None``, large values inside the object are written to this :class:`ContentStore` instead, and only referred to in the file.
+        The object must then be loaded with the same store.
+    """
+    codec = get_codec(codec)
+    if isinstance(codec, NoCodec):
+        mmap_threshold = 0
+
+    buffers = []
+    pickle_kwargs = dict(protocol = 5, buffer_callback = buffers.append) if OUT_OF_BAND_BUFFERS else dict(protocol = PICKLE_PROTOCOL)
+    if store is None:
+        payload = pickle.dumps(obj, **pickle_kwargs)
+    else:
+        with io.BytesIO() as payload_file:
+            _StorePickler(payload_file, store, root = obj, **pickle_kwargs).dump(obj)
+            payload = payload_file.getvalue()
+
+    header = dict(header or {})
+    header.update(version = FORMAT_VERSION, codec = codec.name)
+    if store is not None:
+        header['store'] = True
+    header_bytes = json.dumps(header, default = _json_default).encode('utf-8')
+
+    file.write(MAGIC)
+    file.write(_HEADER_LENGTH.pack(len(header_bytes)))
+    file.write(header_bytes)
+
+    file.write(_FRAME_COUNT.pack(1 + len(buffers)))
+    _write_frame(file, FRAME_COMPRESSED, codec.compress(payload))
+    for buffer in buffers:
+        buffer = buffer.raw()
+        if mmap_threshold is not None and buffer.nbytes >= mmap_threshold:
+            _write_frame(file, FRAME_RAW, buffer)
+        else:
+            _write_frame(file, FRAME_COMPRESSED, codec.compress(buffer))
+
+
+def _write_frame(file: BinaryIO, flags: int, data: Union[bytes, memoryview]):
+    file.write(_FRAME_INFO.pack(flags, memoryview(data).nbytes))
+    if flags == FRAME_RAW:
+        file.write(bytes(_padding(file.tell())))
+    file.write(data)
+
+
+def read_header(file: BinaryIO) -> Optional[Dict[str, Any]]:
+    """
+    Read the header from a binary file written by :func:`dump`, leaving the file positioned at the start of the frames.
+
+    Returns ``None`` (and rewinds the file) if the file does not start with a header, e.g. because it was written by an older version of Simulacra.
+    """
+    start = file.tell()
+    if file.read(len(MAGIC)) != MAGIC:
+        file.seek(start)
+        return None
+
+    header_length, = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))
+
+    return json.loads(file.read(header_length).decode('utf-8'), object_hook = _json_object_hook)
+
+
+def load(file: BinaryIO, mmap: bool = False, store: Optional[ContentStore] = None) -> Any:
+    """
+    Load an object from a binary file.
+
+    Files written by :func:`dump` are decompressed with the codec named in their header.
+    Files written by older versions of Simulacra (gzipped or plain pickles) are recognized by their leading bytes.
+
+    Parameters
+    ----------
+    file
+        A binary file opened for reading.
+    mmap
+        If ``True``, memory-map the uncompressed out-of-band buffers (see the ``mmap_threshold`` argument of :func:`dump`) instead of reading them.
+        Numpy arrays backed by them are only read from disk when they are accessed.
+        They are copy-on-write: changing them does not change the file.
+    store
+        The :class:`ContentStore` that the object was saved with, if it was saved with one.
+
+    Returns
+    -------
+    obj
+        The deserialized object.
+    """
+    header = read_header(file)
+
+    if header is None:
+        start = file.tell()
+        leading = file.read(len(GZIP_MAGIC))
+        file.seek(start)
+        if leading == GZIP_MAGIC:
+            with gzip.GzipFile(fileobj = file, mode = 'rb') as gzip_file:
+                return pickle.load(gzip_file)
+        return pickle.load(file)
+
+    if header['version'] != FORMAT_VERSION:
+        raise ValueError(f'Unsupported Simulacra file format version {header["version"]} (expected {FORMAT_VERSION})')
+
+    codec = get_codec(header['codec'])
+    mapped = None
+
+    frame_count, = _FRAME_COUNT.unpack(file.read(_FRAME_COUNT.size))
+    frames = []
+    for _ in range(frame_count):
+        flags, frame_length = _FRAME_INFO.unpack(file.read(_FRAME_INFO.size))
+
+        if flags == FRAME_RAW:
+            file.seek(_padding(file.tell()), 1)
+            if mmap:
+                if mapped is None:
+                    mapped = memoryview(_mmap.mmap(file.fileno(), 0, access = _mmap.ACCESS_COPY))
+                frame = mapped[file.tell():file.tell() + frame_length]
+                file.seek(frame_length, 1)
+            else:
+                frame = bytearray(frame_length)
+                file.readinto(frame)
+        else:
+            frame = codec.decompress(file.read(frame_length))
+            if frames:  # out-of-band buffers need to be mutable, or the numpy arrays built on them will be read-only
+                frame = bytearray(frame)
+        frames.append(frame)
+
+    payload, *buffers = frames
+    if header.get('store') or store is not None:
+        return _StoreUnpickler(io.BytesIO(payload), store, buffers = buffers).load()
+    if buffers:
+        return pickle.loads(payload, buffers = buffers)
+    return pickle.loads(payload)
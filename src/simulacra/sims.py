@@ -1,17 +1,15 @@
 import datetime
-import gzip
-import pickle
 import uuid
 from copy import deepcopy
 from pathlib import Path
 import abc
-from typing import Optional, Union, Type
+from typing import Any, BinaryIO, Dict, Optional, Union, Type
 
 import logging
 import os
 from simulacra.info import Info
 
-from . import utils
+from . import utils, serialization
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -27,8 +25,18 @@ class Beet:
     ----------
     uuid
         A `Universally Unique Identifier <https://en.wikipedia.org/wiki/Universally_unique_identifier>`_ for the :class:`Beet`.
+    default_codec
+        A class attribute which determines which :class:`simulacra.serialization.Codec` is used to compress the Beet when it is saved, unless one is passed to :func:`Beet.save`.
+    default_mmap_threshold
+        A class attribute which is the default ``mmap_threshold`` for :func:`Beet.save`.
+        ``None`` (the default) means that every array is compressed.
+        Memory-mapping is opt-in, because uncompressed arrays make files bigger to store and to mirror, and only pay off when loaders use a few of many large arrays.
+        To use it, set this on a :class:`Simulation` class and :attr:`simulacra.cluster.JobProcessor.mmap_sims` on the processor that loads them (or pass ``mmap = True`` to :func:`Beet.load` or :class:`simulacra.bundles.BeetBundle`).
     """
 
+    default_codec: Union[str, serialization.Codec] = 'gzip'
+    default_mmap_threshold: Optional[int] = None
+
     def __init__(self, name: str, file_name: Optional[str] = None):
         """
         Parameters
@@ -91,10 +99,15 @@ class Beet:
         target_dir: Optional[Path] = None,
         file_extension: str = 'beet',
         compressed: bool = True,
+        codec: Optional[Union[str, serialization.Codec]] = None,
+        mmap_threshold: Optional[int] = serialization.CLASS_DEFAULT,
+        store: Optional[serialization.ContentStore] = None,
     ) -> str:
         """
         Atomically pickle the :class:`Beet` to a file.
 
+        The codec is recorded in a small header at the start of the file, so :func:`Beet.load` knows how to read it back.
+
         Parameters
         ----------
         target_dir : :class:`str`
@@ -102,7 +115,16 @@ class Beet:
         file_extension : :class:`str`
             The file extension to name the Beet with (for keeping track of things, no actual effect).
         compressed : :class:`bool`
-            Whether to compress the Beet using gzip.
+            Whether to compress the Beet. Ignored if ``codec`` is given.
+        codec
+            The :class:`simulacra.serialization.Codec`, or the name of a registered codec (e.g., ``'none'``, ``'gzip'``, ``'zstd'``, ``'lz4'``), to compress the Beet with.
+            Defaults to :attr:`Beet.default_codec` if ``compressed`` is ``True``, and ``'none'`` otherwise.
+        mmap_threshold
+            Numpy arrays (and other out-of-band buffers) with at least this many bytes are stored uncompressed, so that ``Beet.load(path, mmap = True)`` can memory-map them lazily instead of reading them.
+            Defaults to :attr:`Beet.default_mmap_threshold`. If ``None``, every array is compressed.
+        store
+            If given, large values (like big numpy arrays) are written to this :class:`simulacra.serialization.ContentStore` instead of the file, so that Beets which share them only store them once.
+            The Beet must then be loaded with the same store.
 
         Returns
         -------
@@ -117,9 +139,8 @@ class Beet:
 
         utils.ensure_parents_exist(working_path)
 
-        op = gzip.open if compressed else open
-        with op(working_path, mode = 'wb') as file:
-            pickle.dump(self, file, protocol = -1)
+        with working_path.open(mode = 'wb') as file:
+            self.dump(file, compressed = compressed, codec = codec, mmap_threshold = mmap_threshold, store = store)
 
         os.replace(working_path, path)
 
@@ -127,8 +148,28 @@ class Beet:
 
         return path
 
+    def dump(
+        self,
+        file: BinaryIO,
+        compressed: bool = True,
+        codec: Optional[Union[str, serialization.Codec]] = None,
+        mmap_threshold: Optional[int] = serialization.CLASS_DEFAULT,
+        store: Optional[serialization.ContentStore] = None,
+    ):
+        """
+        Write the :class:`Beet` to an open binary file, in the same format as :func:`Beet.save`.
+
+        The arguments are the same as for :func:`Beet.save`.
+        """
+        if codec is None:
+            codec = self.default_codec if compressed else 'none'
+        if mmap_threshold is serialization.CLASS_DEFAULT:
+            mmap_threshold = self.default_mmap_threshold
+
+        serialization.dump(self, file, codec = codec, mmap_threshold = mmap_threshold, header = {'metadata': self._metadata()}, store = store)
+
     @classmethod
-    def load(cls, path: str) -> 'Beet':
+    def load(cls, path: str, mmap: bool = False, store: Optional[serialization.ContentStore] = None) -> 'Beet':
         """
         Load a Beet from `file_path`.
 
@@ -136,6 +177,11 @@ class Beet:
         ----------
         path
             The path to load a Beet from.
+        mmap
+            If ``True``, numpy arrays that were saved uncompressed (see the ``mmap_threshold`` argument of :func:`Beet.save`) are memory-mapped from the file instead of being read.
+            Their data is only read from disk when they are accessed.
+        store
+            The :class:`simulacra.serialization.ContentStore` that the Beet was saved with, if any.
 
         Returns
         -------
@@ -143,17 +189,46 @@ class Beet:
             The loaded Beet.
         """
         path = Path(path)
-        try:
-            with gzip.open(path, mode = 'rb') as file:
-                beet = pickle.load(file)
-        except OSError:  # file is not gzipped
-            with path.open(mode = 'rb') as file:
-                beet = pickle.load(file)
+        with path.open(mode = 'rb') as file:
+            beet = serialization.load(file, mmap = mmap, store = store)
 
         logger.debug(f'Loaded {beet} from {path}')
 
         return beet
 
+    def _metadata(self) -> Dict[str, Any]:
+        """Return the metadata that is written to the header of the file when the :class:`Beet` is saved, which can be read back via :func:`Beet.load_metadata`."""
+        return {
+            'type': self.__class__.__name__,
+            'name': self.name,
+            'file_name': self.file_name,
+            'uuid': self.uuid,
+            'initialized_at': self.initialized_at,
+        }
+
+    @classmethod
+    def load_metadata(cls, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the metadata of a saved Beet from the header at `file_path`, without loading the Beet itself.
+
+        Parameters
+        ----------
+        path
+            The path to a saved Beet.
+
+        Returns
+        -------
+        :class:`dict`
+            The metadata, or ``None`` if the file was written by an older version of Simulacra and has no header.
+        """
+        with Path(path).open(mode = 'rb') as file:
+            header = serialization.read_header(file)
+
+        if header is None:
+            return None
+
+        return header.get('metadata')
+
     def __repr__(self):
         return f"{self.__class__.__name__}(name = '{self.name}', file_name = '{self.file_name}', uuid = {self.uuid})"
 
@@ -170,6 +245,22 @@ class Beet:
         return info
 
 
+METADATA_SCALAR_TYPES = (str, int, float, bool, type(None), datetime.datetime, datetime.timedelta, uuid.UUID)
+METADATA_REPR_LENGTH = 200
+
+
+def _metadata_value(value: Any) -> Any:
+    """Return a value that is small and simple enough to store in a file header: scalars are stored directly, and anything else as a (possibly truncated) ``repr``."""
+    if isinstance(value, METADATA_SCALAR_TYPES):
+        return value
+
+    r = repr(value)
+    if len(r) > METADATA_REPR_LENGTH:
+        r = r[:METADATA_REPR_LENGTH - 3] + '...'
+
+    return r
+
+
 class Status(utils.StrEnum):
     UNINITIALIZED = 'uninitialized'
     INITIALIZED = 'initialized'
@@ -270,6 +361,8 @@ class Simulation(Beet, abc.ABC):
         """
         Atomically pickle the :class:`Simulation` to a file.
 
+        If the directory has a :class:`simulacra.utils.SimlibIndex`, the Simulation is recorded in it.
+
         Parameters
         ----------
         target_dir
@@ -282,7 +375,75 @@ class Simulation(Beet, abc.ABC):
         :class:`str`
             The path to the saved Simulation.
         """
-        return super().save(target_dir = target_dir, file_extension = file_extension, **kwargs)
+        path = super().save(target_dir = target_dir, file_extension = file_extension, **kwargs)
+
+        index = utils.SimlibIndex.find(path.parent)
+        if index is not None:
+            index.record(path, self)
+
+        return path
+
+    @property
+    def spec_hash(self) -> Optional[str]:
+        """
+        The content hash of the Simulation's Specification (see :func:`Specification.content_hash`).
+
+        It is computed the first time it is needed and then cached, because the Specification of a Simulation isn't expected to change, and hashing it on every save would be wasteful.
+        The cache isn't saved with the Simulation.
+        """
+        cached = self.__dict__.get('_spec_hash')
+        if cached is None or cached[0] is not self.spec:  # the Specification was replaced (e.g., when a finished Simulation is reused for a new one)
+            cached = self._spec_hash = (self.spec, self.spec.content_hash())
+
+        return cached[1]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_spec_hash', None)  # recomputed after loading, in case the way hashes are computed has changed
+
+        return state
+
+    def _metadata(self) -> Dict[str, Any]:
+        metadata = super()._metadata()
+        metadata.update(
+            status = self.status,
+            runs = self.runs,
+            init_time = self.init_time,
+            start_time = self.start_time,
+            end_time = self.end_time,
+            latest_run_time = self.latest_run_time,
+            elapsed_time = self.elapsed_time,
+            running_time = self.running_time,
+            spec_hash = self.spec_hash,
+            spec_extra_attributes = {k: _metadata_value(getattr(self.spec, k)) for k in getattr(self.spec, '_extra_attr_keys', ())},
+        )
+
+        return metadata
+
+    @classmethod
+    def load_metadata(cls, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the metadata of a saved Simulation from the header at `file_path`, without loading the Simulation itself.
+
+        The metadata includes the ``status`` (as a :class:`Status`), the ``uuid``, ``name``, and ``file_name``, the time diagnostics, and the extra attributes of the Specification (as ``spec_extra_attributes``).
+        Extra attributes that can't be stored as JSON are stored as their ``repr``.
+
+        Parameters
+        ----------
+        path
+            The path to a saved Simulation.
+
+        Returns
+        -------
+        :class:`dict`
+            The metadata, or ``None`` if the file was written by an older version of Simulacra and has no header.
+        """
+        metadata = super().load_metadata(path)
+
+        if metadata is not None and 'status' in metadata:
+            metadata['status'] = Status(metadata['status'])
+
+        return metadata
 
     @abc.abstractmethod
     def run(self):
@@ -367,7 +528,7 @@ class Specification(Beet, abc.ABC):
         file_extension
             The file extension to name the Specification with (for keeping track of things, no actual effect).
         compressed
-            Whether to compress the Beet using gzip.
+            Whether to compress the Specification. See :func:`Beet.save` for more options.
 
         Returns
         -------
@@ -376,10 +537,35 @@ class Specification(Beet, abc.ABC):
         """
         return super().save(target_dir = target_dir, file_extension = file_extension, **kwargs)
 
+    def _metadata(self) -> Dict[str, Any]:
+        metadata = super()._metadata()
+        metadata['extra_attributes'] = {k: _metadata_value(getattr(self, k)) for k in self._extra_attr_keys}
+
+        return metadata
+
     def to_sim(self):
         """Return a :class:`Simulation` of the type associated with the :class:`Specification` type, generated from this instance."""
         return self.simulation_type(self)
 
+    content_hash_exclude = ('name', 'file_name', 'uuid', 'initialized_at', '_extra_attr_keys')
+    """The attributes that identify a :class:`Specification` rather than describing its Simulation, which are left out of :func:`Specification.content_hash`."""
+
+    def content_hash(self) -> Optional[str]:
+        """
+        Return a hash of everything that determines the result of the Specification's Simulation: its type and all of its attributes (including extra attributes, numpy arrays, functions, and nested objects like :class:`simulacra.summables.Sum`), except for the ones in :attr:`Specification.content_hash_exclude`.
+
+        Specifications with the same content hash describe the same Simulation, even if they have different names.
+        The hash is the same in every process and session (see :func:`simulacra.utils.canonical_digest`).
+        Returns ``None`` if some of the contents can't be digested (e.g., a function that refers to a global lock), in which case the Specification is never matched by its contents.
+        """
+        state = {k: v for k, v in self.__dict__.items() if k not in self.content_hash_exclude}
+
+        try:
+            return utils.canonical_digest((type(self), state)).hex()
+        except TypeError as e:
+            logger.debug(f'Could not hash the contents of {self}: {e}')
+            return None
+
     def info(self) -> Info:
         info = super().info()
 
@@ -1,4 +1,5 @@
 import os
+import hashlib
 from pathlib import Path
 import logging
 from typing import Optional, Union, NamedTuple, Callable, Iterable
@@ -22,3 +23,29 @@ def ensure_parents_exist(path: Union[Path, str]):
 def get_file_size(path: Union[Path, str]) -> int:
     """Return the size of the file at the given path."""
     return Path(path).stat().st_size
+
+
+def get_file_hash(path: Union[Path, str], algorithm: str = 'md5', chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the hex digest of the file at the given path, reading it in chunks so that the whole file is never in memory.
+
+    Parameters
+    ----------
+    path
+        The path to the file.
+    algorithm
+        The name of a hash algorithm supported by :mod:`hashlib`.
+    chunk_size
+        The number of bytes to read at a time.
+
+    Returns
+    -------
+    digest
+        The hex digest of the file.
+    """
+    h = hashlib.new(algorithm)
+    with Path(path).open(mode = 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
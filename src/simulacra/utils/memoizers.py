@@ -1,9 +1,31 @@
+import collections
+import copyreg
+import datetime
+import enum
 import functools
+import hashlib
+import inspect
+import itertools
 import logging
-from typing import Optional, Union, NamedTuple, Callable, Iterable
+import os
+import sys
+import threading
+import time
+import types
+import uuid
+import weakref
+from pathlib import Path, PurePath
+from typing import Any, Dict, Hashable, List, Optional, Set, Union, NamedTuple, Callable, Iterable, Tuple
 
 import numpy as np
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+from .. import serialization
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -27,23 +49,109 @@ class cached_property:
         return value
 
 
+def _array_buffer(array: np.ndarray):
+    """Return the contents of the array in C order, as a buffer that can be hashed without copying it if it is already C-contiguous."""
+    array = np.ascontiguousarray(array)
+    try:
+        return memoryview(array).cast('B')
+    except (ValueError, TypeError):  # dtypes that don't support the buffer protocol, like datetime64
+        return array.tobytes()
+
+
+if xxhash is not None and hasattr(xxhash, 'xxh3_128'):
+    def _digest(data) -> bytes:
+        return xxhash.xxh3_128(data).digest()
+else:
+    def _digest(data) -> bytes:
+        return hashlib.blake2b(data, digest_size = 16).digest()
+
+
+def array_digest(array: np.ndarray) -> bytes:
+    """
+    Return a 128-bit digest of the dtype, shape, and contents of a numpy array.
+
+    Equal arrays (with the same dtype and shape) have the same digest, whether they are contiguous or not.
+    Uses :mod:`xxhash` if it is installed, and :func:`hashlib.blake2b` otherwise.
+    Object arrays are digested via the hashes of their elements, which must be hashable.
+    """
+    if array.dtype == object:
+        return _digest(f'{array.shape}{hash(tuple(array.ravel().tolist()))}'.encode())
+
+    return _digest(f'{array.dtype.str}{array.shape}'.encode() + _digest(_array_buffer(array)))
+
+
+_ARRAY_IDENTITIES = {}  # id(array) -> [token, version], for arrays that have been keyed by identity
+_ARRAY_IDENTITIES_LOCK = threading.Lock()
+_ARRAY_TOKENS = itertools.count()
+
+
+def _array_identity(array: np.ndarray) -> Tuple[int, int]:
+    """Return a (token, version) pair that identifies this array object and how many times it has been marked as modified. Tokens are never reused, even if the array's ``id`` is."""
+    with _ARRAY_IDENTITIES_LOCK:
+        identity = _ARRAY_IDENTITIES.get(id(array))
+        if identity is None:
+            identity = _ARRAY_IDENTITIES[id(array)] = [next(_ARRAY_TOKENS), 0]
+            weakref.finalize(array, _ARRAY_IDENTITIES.pop, id(array), None)
+
+        return tuple(identity)
+
+
+def mark_array_modified(array: np.ndarray):
+    """Tell memoized functions that key arrays by identity (``by_identity = True``) that the array has been modified in place, so that their cached values for it are no longer used."""
+    _array_identity(array)
+    with _ARRAY_IDENTITIES_LOCK:
+        _ARRAY_IDENTITIES[id(array)][1] += 1
+
+
+def _array_key(array: np.ndarray, by_identity: bool = False) -> tuple:
+    if by_identity:
+        return np.ndarray, _array_identity(array)
+
+    return np.ndarray, array_digest(array)
+
+
 def hash_args_kwargs(*args, **kwargs):
-    """Return the hash of a tuple containing the args and kwargs."""
+    """
+    Return the hash of a tuple containing the args and kwargs.
+
+    Numpy arrays are hashed by their dtype, shape, and contents (see :func:`array_digest`).
+    """
+    return _hash_args_kwargs(args, kwargs)
+
+
+def hash_args_kwargs_by_identity(*args, **kwargs):
+    """Return the hash of a tuple containing the args and kwargs, like :func:`hash_args_kwargs`, except that numpy arrays are hashed by their identity and the number of times they have been passed to :func:`mark_array_modified`, which is much faster for large arrays."""
+    return _hash_args_kwargs(args, kwargs, by_identity = True)
+
+
+def _hash_args_kwargs(args: tuple, kwargs: dict, by_identity: bool = False) -> int:
     try:
         key = hash(args + tuple(kwargs.items()))
     except TypeError:  # unhashable type, see if we've got numpy arrays
-        key = hash(tuple(tuple(a) if type(a) == np.ndarray else a for a in args) + tuple(kwargs.items()))
+        key = hash(
+            tuple(_array_key(a, by_identity) if isinstance(a, np.ndarray) else a for a in args)
+            + tuple((k, _array_key(v, by_identity) if isinstance(v, np.ndarray) else v) for k, v in kwargs.items())
+        )
 
     return key
 
 
-def memoize(func: Callable):
-    """Memoize a function by storing a dictionary of {inputs: outputs}."""
+def memoize(func: Optional[Callable] = None, by_identity: bool = False):
+    """
+    Memoize a function by storing a dictionary of {inputs: outputs}.
+
+    Numpy array arguments are keyed by their contents (see :func:`hash_args_kwargs`).
+    Use ``@memoize(by_identity = True)`` to key them by identity instead, which avoids hashing large arrays on every call;
+    arrays that are modified in place must then be passed to :func:`mark_array_modified`.
+    """
+    if func is None:
+        return functools.partial(memoize, by_identity = by_identity)
+
     memo = {}
 
     @functools.wraps(func)
     def memoizer(*args, **kwargs):
-        key = hash_args_kwargs(*args, **kwargs)
+        key = _hash_args_kwargs(args, kwargs, by_identity = by_identity)
         try:
             v = memo[key]
         except KeyError:
@@ -54,39 +162,752 @@ def memoize(func: Callable):
     return memoizer
 
 
-def watched_memoize(watcher):
+def _freeze(value: Any, by_identity: bool = False) -> Hashable:
+    """Return a hashable version of ``value`` that compares equal to the frozen version of another value exactly when the values are equal."""
+    if isinstance(value, np.ndarray):
+        return _array_key(value, by_identity)
+
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(v, by_identity) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset, frozenset(_freeze(v, by_identity) for v in value)
+    if isinstance(value, dict):
+        return dict, frozenset((_freeze(k, by_identity), _freeze(v, by_identity)) for k, v in value.items())
+
+    raise TypeError(f'Cannot use an unhashable {type(value).__name__} as an argument of a memoized function')
+
+
+_KWARGS_MARKER = object()
+
+
+def _make_key(args: tuple, kwargs: dict, by_identity: bool = False) -> Hashable:
+    """Return a cache key for the arguments that is compared by equality, not just by hash, so that hash collisions can't return the wrong value (numpy arrays are compared by their 128-bit digests)."""
+    key = tuple(_freeze(a, by_identity) for a in args)
+    if kwargs:
+        key += (_KWARGS_MARKER,) + tuple((k, _freeze(v, by_identity)) for k, v in sorted(kwargs.items()))
+
+    return key
+
+
+def _sizeof(value: Any) -> int:
+    """Estimate the number of bytes used by a cached value."""
+    if isinstance(value, np.ndarray) and not value.flags.owndata:  # getsizeof only counts the data of arrays that own it
+        return sys.getsizeof(value) + value.nbytes
+
+    return sys.getsizeof(value)
+
+
+class CacheInfo(NamedTuple):
+    """Statistics about the cache of a :func:`bounded_memoize` function."""
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    entries: int
+    bytes: int
+
+    def __add__(self, other: 'CacheInfo') -> 'CacheInfo':
+        return CacheInfo(*(a + b for a, b in zip(self, other)))
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of calls that were answered from the cache."""
+        calls = self.hits + self.misses
+        return self.hits / calls if calls > 0 else 0
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'size', 'expires', 'uses')
+
+    def __init__(self, value: Any, size: int, expires: Optional[float]):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.uses = 0
+
+
+_MISSING = object()
+
+
+class _BoundedCache:
+    """A thread-safe cache with a bounded number of entries and bytes, which evicts entries by policy and expires them after a time-to-live."""
+
+    def __init__(
+        self,
+        maxsize: Optional[int],
+        maxbytes: Optional[int],
+        policy: str,
+        ttl: Optional[float],
+        sizeof: Callable[[Any], int],
+    ):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.policy = policy
+        self.ttl = ttl
+        self.sizeof = sizeof
+
+        self.entries = collections.OrderedDict()  # in order of last use for LRU, of insertion for LFU
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.lock = threading.Lock()
+
+    def _remove(self, key: Hashable):
+        self.bytes -= self.entries.pop(key).size
+
+    def get(self, key: Hashable) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+
+            self.hits += 1
+            entry.uses += 1
+            if self.policy == 'lru':
+                self.entries.move_to_end(key)
+
+            return entry.value
+
+    def put(self, key: Hashable, value: Any):
+        size = self.sizeof(value)
+        if self.maxbytes is not None and size > self.maxbytes:
+            return  # it would evict everything else and still not fit
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            if key in self.entries:  # another thread computed it at the same time
+                self._remove(key)
+
+            self.entries[key] = _CacheEntry(value, size, expires)
+            self.bytes += size
+
+            self._make_room()
+
+    def _is_full(self) -> bool:
+        return (self.maxsize is not None and len(self.entries) > self.maxsize) or (self.maxbytes is not None and self.bytes > self.maxbytes)
+
+    def _make_room(self):
+        if not self._is_full():
+            return
+
+        if self.ttl is not None:
+            now = time.monotonic()
+            for key in [k for k, entry in self.entries.items() if entry.expires <= now]:
+                self._remove(key)
+                self.expirations += 1
+
+        while self._is_full():
+            if self.policy == 'lfu':
+                victim = min(self.entries, key = lambda k: self.entries[k].uses)  # the oldest of the least-used, because min returns the first
+            else:
+                victim = next(iter(self.entries))
+            self._remove(victim)
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.expirations, len(self.entries), self.bytes)
+
+
+class BoundedMemoizer:
+    """
+    A function memoized by :func:`bounded_memoize`.
+
+    When it decorates a method, each instance gets its own cache, which is only weakly tied to the instance: the cache does not keep the instance alive, and is discarded along with it.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        maxsize: Optional[int] = 128,
+        maxbytes: Optional[int] = None,
+        policy: str = 'lru',
+        ttl: Optional[float] = None,
+        sizeof: Callable[[Any], int] = _sizeof,
+        by_identity: bool = False,
+    ):
+        if policy not in ('lru', 'lfu'):
+            raise ValueError(f"Unknown eviction policy {policy}, must be 'lru' or 'lfu'")
+
+        self.func = func
+        self.by_identity = by_identity
+        self.make_cache = functools.partial(_BoundedCache, maxsize = maxsize, maxbytes = maxbytes, policy = policy, ttl = ttl, sizeof = sizeof)
+
+        self.cache = self.make_cache()
+        self.instance_caches = weakref.WeakKeyDictionary()
+        self.instance_caches_lock = threading.Lock()
+
+        functools.update_wrapper(self, func)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.func.__qualname__})'
+
+    def _call(self, cache: _BoundedCache, key_args: tuple, args: tuple, kwargs: dict) -> Any:
+        key = _make_key(key_args, kwargs, by_identity = self.by_identity)
+
+        value = cache.get(key)
+        if value is _MISSING:
+            value = self.func(*args, **kwargs)  # not under the lock, so other calls can proceed
+            cache.put(key, value)
+
+        return value
+
+    def __call__(self, *args, **kwargs):
+        return self._call(self.cache, args, args, kwargs)
+
+    def _instance_cache(self, instance: Any) -> Optional[_BoundedCache]:
+        """Return the cache for the instance, or ``None`` if the instance can't be weakly referenced."""
+        with self.instance_caches_lock:
+            try:
+                cache = self.instance_caches.get(instance)
+                if cache is None:
+                    cache = self.instance_caches[instance] = self.make_cache()
+            except TypeError:  # not weakly referenceable or not hashable
+                return None
+
+        return cache
+
+    def __get__(self, instance, cls):
+        if instance is None:
+            return self
+
+        return _BoundMethodMemoizer(self, instance)
+
+    def cache_info(self) -> CacheInfo:
+        """Return the statistics of the cache, summed over the caches of every live instance if this is a method."""
+        with self.instance_caches_lock:
+            caches = [self.cache, *self.instance_caches.values()]
+
+        return sum((cache.info() for cache in caches[1:]), caches[0].info())
+
+    def cache_clear(self):
+        """Empty the cache (and the caches of every instance, if this is a method)."""
+        with self.instance_caches_lock:
+            caches = [self.cache, *self.instance_caches.values()]
+
+        for cache in caches:
+            cache.clear()
+
+
+class _BoundMethodMemoizer:
+    """A :class:`BoundedMemoizer` method bound to an instance, which uses that instance's cache."""
+
+    __slots__ = ('memoizer', 'instance', '__weakref__')
+
+    def __init__(self, memoizer: BoundedMemoizer, instance: Any):
+        self.memoizer = memoizer
+        self.instance = instance
+
+    def __call__(self, *args, **kwargs):
+        cache = self.memoizer._instance_cache(self.instance)
+        if cache is None:  # fall back to the shared cache, keyed by the instance itself
+            return self.memoizer._call(self.memoizer.cache, (self.instance, *args), (self.instance, *args), kwargs)
+
+        return self.memoizer._call(cache, args, (self.instance, *args), kwargs)
+
+    def cache_info(self) -> CacheInfo:
+        """Return the statistics of this instance's cache."""
+        cache = self.memoizer._instance_cache(self.instance)
+        return cache.info() if cache is not None else self.memoizer.cache.info()
+
+    def cache_clear(self):
+        """Empty this instance's cache."""
+        cache = self.memoizer._instance_cache(self.instance)
+        if cache is not None:
+            cache.clear()
+
+
+def bounded_memoize(
+    maxsize: Optional[Union[int, Callable]] = 128,
+    maxbytes: Optional[int] = None,
+    policy: str = 'lru',
+    ttl: Optional[float] = None,
+    sizeof: Callable[[Any], int] = _sizeof,
+    by_identity: bool = False,
+):
+    """
+    A decorator that memoizes a function in a cache with a bounded size, for long-running processes where :func:`memoize` would grow without limit.
+
+    Arguments are compared by equality (numpy arrays by their dtype, shape, and a digest of their contents), so unequal arguments never share a cached value.
+    Methods get a separate cache for each instance, which does not keep the instance alive.
+    The memoized function has ``cache_info()`` and ``cache_clear()`` methods, like :func:`functools.lru_cache`.
+
+    Can be used with or without arguments:
+
+    .. code-block:: python
+
+        @bounded_memoize
+        def f(x): ...
+
+        @bounded_memoize(maxbytes = 2 ** 30, policy = 'lfu', ttl = 600)
+        def g(x): ...
+
+    Parameters
+    ----------
+    maxsize
+        The maximum number of cached values (per instance, for methods). ``None`` means no limit.
+    maxbytes
+        The maximum total size of the cached values, as estimated by ``sizeof``. ``None`` means no limit.
+        Values larger than this are not cached at all.
+    policy
+        Which value to evict when the cache is full: ``'lru'`` for the least recently used, or ``'lfu'`` for the least frequently used.
+    ttl
+        If not ``None``, cached values expire this many seconds after they were computed.
+    sizeof
+        A function that estimates the number of bytes used by a value.
+        The default counts the data of numpy arrays, and uses :func:`sys.getsizeof` for anything else.
+    by_identity
+        If ``True``, key numpy arrays by identity instead of by contents (see :func:`memoize`).
+    """
+    if callable(maxsize):  # used without arguments
+        return BoundedMemoizer(maxsize)
+
+    return functools.partial(BoundedMemoizer, maxsize = maxsize, maxbytes = maxbytes, policy = policy, ttl = ttl, sizeof = sizeof, by_identity = by_identity)
+
+
+def canonical_digest(value: Any) -> bytes:
+    """
+    Return a digest of a value that depends only on its contents, and is the same in every process and session (unlike :func:`hash`, which is randomized for strings).
+
+    Containers are digested by their contents (sets and dicts regardless of order), numpy arrays by their dtype, shape, and contents (see :func:`array_digest`), enums by their class and name, and modules and classes by their qualified names.
+    Functions are digested by their qualified names, their code (including its constants and nested functions), their defaults, the contents of their closures, and the values of the globals their code refers to, recursively,
+    so closures that capture different values and lambdas with different constants have different digests.
+    Other objects are digested by what pickling them would store (see :meth:`object.__reduce_ex__`), recursively.
+
+    Raises :class:`TypeError` if the value contains something that can't be pickled (like a lock), and so can't be digested either.
+    """
+    return _canonical_digest(value, set(), {})
+
+
+_SCALAR_TYPES = (type(None), bool, int, float, complex, str, bytes, datetime.datetime, datetime.date, datetime.timedelta, uuid.UUID, PurePath)
+_EMPTY_CELL = object()
+
+
+def _qualified_name(obj: Any) -> bytes:
+    return f'{getattr(obj, "__module__", None)}.{getattr(obj, "__qualname__", getattr(obj, "__name__", None))}'.encode()
+
+
+def _referenced_names(code: types.CodeType) -> Set[str]:
+    """Return the names (of globals and attributes) used by some code and the code nested inside it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _referenced_names(const)
+
+    return names
+
+
+def _cell_contents(cell) -> Any:
+    try:
+        return cell.cell_contents
+    except ValueError:  # the variable hasn't been assigned yet
+        return _EMPTY_CELL
+
+
+def _canonical_digest(value: Any, active: Set[int], memo: Dict[int, Tuple[Any, bytes]]) -> bytes:
+    if isinstance(value, _SCALAR_TYPES):
+        return _digest(f'{type(value).__name__}:{value!r}'.encode())
+    if isinstance(value, np.generic):
+        return _digest(f'{value.dtype.str}:{value!r}'.encode())
+    if isinstance(value, enum.Enum):
+        return _digest(b'enum' + _qualified_name(type(value)) + value.name.encode())
+    if isinstance(value, type):
+        return _digest(b'named' + _qualified_name(value))
+    if isinstance(value, types.ModuleType):
+        return _digest(b'module' + value.__name__.encode())
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return _digest(b'ndarray' + array_digest(value))
+    if value is _EMPTY_CELL:
+        return _digest(b'empty cell')
+
+    if id(value) in memo:
+        return memo[id(value)][1]
+    if id(value) in active:  # a reference cycle
+        return _digest(b'cycle')
+
+    active.add(id(value))
+    try:
+        digest = _digest_contents(value, functools.partial(_canonical_digest, active = active, memo = memo))
+    finally:
+        active.discard(id(value))
+
+    memo[id(value)] = (value, digest)  # keep the value alive, so that its id isn't reused by a temporary object during this digest
+
+    return digest
+
+
+def _digest_contents(value: Any, recurse: Callable[[Any], bytes]) -> bytes:
+    if isinstance(value, np.ndarray):
+        return _digest(f'objects{value.shape}'.encode() + b''.join(map(recurse, value.ravel().tolist())))
+    if isinstance(value, (list, tuple)):
+        return _digest(type(value).__name__.encode() + b''.join(map(recurse, value)))
+    if isinstance(value, (set, frozenset)):
+        return _digest(b'set' + b''.join(sorted(map(recurse, value))))
+    if isinstance(value, dict):
+        return _digest(b'dict' + b''.join(sorted(recurse(k) + recurse(v) for k, v in value.items())))
+    if isinstance(value, types.CodeType):
+        return _digest(b''.join((
+            b'code',
+            value.co_code,
+            recurse((value.co_argcount, getattr(value, 'co_posonlyargcount', 0), value.co_kwonlyargcount, value.co_flags)),
+            recurse((value.co_names, value.co_varnames, value.co_freevars, value.co_cellvars)),
+            recurse(value.co_consts),
+        )))
+    if isinstance(value, types.FunctionType):
+        referenced_globals = {name: value.__globals__[name] for name in _referenced_names(value.__code__) if name in value.__globals__}
+        return _digest(b''.join((
+            b'function',
+            _qualified_name(value),
+            recurse(value.__code__),
+            recurse(value.__defaults__),
+            recurse(value.__kwdefaults__),
+            recurse(tuple(_cell_contents(cell) for cell in value.__closure__ or ())),
+            recurse(referenced_globals),
+        )))
+    if isinstance(value, (types.MethodType, types.BuiltinMethodType)) and not isinstance(getattr(value, '__self__', None), (types.ModuleType, type(None))):
+        return _digest(b'method' + recurse(getattr(value, '__func__', None)) + _qualified_name(value) + recurse(value.__self__))
+    if isinstance(value, types.BuiltinFunctionType):
+        return _digest(b'named' + _qualified_name(value))
+    if isinstance(value, functools.partial):
+        return _digest(b'partial' + recurse(value.func) + recurse(value.args) + recurse(value.keywords))
+
+    reducer = copyreg.dispatch_table.get(type(value))  # where pickle looks first, too
+    reduced = reducer(value) if reducer is not None else value.__reduce_ex__(4)  # raises TypeError for values that can't be pickled
+    if isinstance(reduced, str):  # pickled by reference, like a ufunc
+        return _digest(b'global' + f'{getattr(value, "__module__", None)}.{reduced}'.encode())
+
+    constructor, args, *rest = reduced
+    state, list_items, dict_items = (rest + [None] * 3)[:3]
+    return _digest(b''.join((
+        b'object',
+        _qualified_name(type(value)),
+        _digest(b'named' + _qualified_name(constructor)),  # pickle stores the constructor by reference, too
+        recurse(args),
+        recurse(state),
+        recurse(None if list_items is None else list(list_items)),
+        recurse(None if dict_items is None else dict(dict_items)),
+    )))
+
+
+def _function_version(func: Callable) -> str:
+    """Return a string that changes when the source code of the function does, or the values it captures in its closure, or the globals it refers to."""
+    try:
+        source = inspect.getsource(func).encode()
+    except (OSError, TypeError):  # defined interactively, or a builtin
+        source = getattr(getattr(func, '__code__', None), 'co_code', b'')
+
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return _digest(source).hex()
+
+    globals_ = getattr(func, '__globals__', {})
+    referenced_globals = {name: globals_[name] for name in _referenced_names(code) if name in globals_}
+    try:
+        captured = canonical_digest((tuple(_cell_contents(cell) for cell in func.__closure__ or ()), referenced_globals))
+    except TypeError as e:
+        raise TypeError(f'Could not digest the values that {func.__qualname__} captures or refers to, so pass disk_memoize an explicit version: {e}') from e
+
+    return _digest(source + captured).hex()
+
+
+class DiskMemoizer:
+    """
+    A function memoized on disk by :func:`disk_memoize`.
+
+    Each result is stored in its own file, named by a digest of the arguments, under a directory named for the function and its version.
+    Results are written atomically, so many processes can share the same cache directory: one process reads what another computed.
+    If two processes compute the same result at the same time, both do the work, and one result replaces the other.
+
+    When it decorates a method, the instance is part of the key, digested by its contents like the other arguments (see :func:`canonical_digest`).
+    """
+
+    eviction_target = .9  # evict down to this fraction of maxbytes, so that a full cache isn't scanned again on every miss
+
+    def __init__(
+        self,
+        func: Callable,
+        directory: Union[str, 'os.PathLike'],
+        version: Optional[str] = None,
+        maxbytes: Optional[int] = None,
+        codec: str = 'gzip',
+    ):
+        self.func = func
+        self.version = str(version) if version is not None else _function_version(func)
+        self.directory = Path(directory) / f'{func.__module__}.{func.__qualname__}'.replace('<', '').replace('>', '') / self.version
+        self.maxbytes = maxbytes
+        self.codec = codec
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._bytes = None  # the size of the cache, counted as results are written, so that the directory is only scanned when it might be too big
+        self._bytes_lock = threading.Lock()
+
+        functools.update_wrapper(self, func)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.func.__qualname__}, directory = {self.directory})'
+
+    def __get__(self, instance, cls):
+        if instance is None:
+            return self
+
+        return types.MethodType(self, instance)
+
+    def _path(self, args: tuple, kwargs: dict) -> Path:
+        key = canonical_digest((args, kwargs)).hex()
+        return self.directory / key[:2] / f'{key}.result'
+
+    def __call__(self, *args, **kwargs):
+        path = self._path(args, kwargs)
+
+        try:
+            with path.open(mode = 'rb') as file:
+                value = serialization.load(file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:  # a corrupt or unreadable result is recomputed
+            logger.warning(f'Discarding unreadable cached result {path}: {e}')
+        else:
+            self.hits += 1
+            try:
+                os.utime(path)  # mark it as recently used, for eviction
+            except FileNotFoundError:  # evicted by another process in the meantime
+                pass
+            return value
+
+        self.misses += 1
+        value = self.func(*args, **kwargs)
+
+        path.parent.mkdir(parents = True, exist_ok = True)
+        working_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.working')
+        with working_path.open(mode = 'wb') as file:
+            serialization.dump(value, file, codec = self.codec)
+            size = file.tell()
+        os.replace(working_path, path)
+
+        if self.maxbytes is not None:
+            with self._bytes_lock:
+                if self._bytes is None:
+                    self._bytes = sum(stat.st_size for _, stat in self._entries())  # including the new result
+                else:
+                    self._bytes += size  # other processes' results are only counted when the directory is scanned
+                if self._bytes > self.maxbytes:
+                    self._evict()
+
+        return value
+
+    def _entries(self) -> List[Tuple[Path, os.stat_result]]:
+        entries = []
+        for path in self.directory.glob('*/*.result'):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                pass
+
+        return entries
+
+    def _evict(self):
+        """Remove the least recently used results until the cache fits in ``maxbytes`` (with some room to spare, see :attr:`DiskMemoizer.eviction_target`)."""
+        entries = self._entries()
+        total = sum(stat.st_size for _, stat in entries)
+
+        if total > self.maxbytes:
+            for path, stat in sorted(entries, key = lambda entry: entry[1].st_mtime):
+                if total <= self.eviction_target * self.maxbytes:
+                    break
+
+                try:
+                    path.unlink()
+                    self.evictions += 1
+                except FileNotFoundError:  # another process evicted it first
+                    pass
+                total -= stat.st_size
+
+        self._bytes = total
+
+    def cache_info(self) -> CacheInfo:
+        """Return the statistics of the cache. Hits, misses, and evictions are counted for this process only; entries and bytes are for the whole cache directory."""
+        entries = self._entries()
+        return CacheInfo(self.hits, self.misses, self.evictions, 0, len(entries), sum(stat.st_size for _, stat in entries))
+
+    def cache_clear(self):
+        """Remove every stored result for this version of the function."""
+        for path, _ in self._entries():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+        with self._bytes_lock:
+            self._bytes = None
+
+
+def disk_memoize(
+    directory: Union[str, 'os.PathLike'],
+    version: Optional[str] = None,
+    maxbytes: Optional[int] = None,
+    codec: str = 'gzip',
+):
+    """
+    A decorator that memoizes a function on disk, so that results are shared between processes and survive between sessions.
+
+    Results are keyed by a digest of the arguments that is stable across processes (see :func:`canonical_digest`), and by the version of the function.
+    They are stored in Simulacra's serialization format (see :func:`simulacra.serialization.dump`), so arguments and results must be picklable.
+
+    .. code-block:: python
+
+        @disk_memoize('cache', maxbytes = 2 ** 30)
+        def expensive_quadrature(a, b): ...
+
+    Parameters
+    ----------
+    directory
+        The directory to store results in. Many functions can share the same directory.
+    version
+        The version of the function. Results stored by other versions are ignored.
+        Defaults to a digest of the function's source code, the contents of its closure, and the globals it refers to (see :func:`canonical_digest`),
+        so that changing the function, or making it again with different captured values, invalidates its cache.
+        Helpers are only followed through the globals the function refers to by name, by their code rather than their source:
+        changes to functions that it reaches through a module (like ``helpers.compute``) or through its arguments do not change the default version, so pass one explicitly if they matter.
+    maxbytes
+        If not ``None``, remove the least recently used results when the cache holds more than this many bytes.
+    codec
+        The :class:`simulacra.serialization.Codec` (or the name of one) to compress results with.
+    """
+    return functools.partial(DiskMemoizer, directory = directory, version = version, maxbytes = maxbytes, codec = codec)
+
+
+class _ComparedByEquality:
+    """Wraps a watched value that can't be frozen (see :func:`_freeze`), so that it can still be a memo key, compared by equality alone."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __hash__(self):
+        return 0  # there are only a few watched values per instance, so looking them up one by one is fine
+
+    def __eq__(self, other):
+        if not isinstance(other, _ComparedByEquality):
+            return NotImplemented
+
+        return _equal(self.value, other.value)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    """Return whether two values are equal, comparing numpy arrays (even inside lists, tuples, and dicts) by their contents."""
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return isinstance(a, np.ndarray) and isinstance(b, np.ndarray) and a.dtype == b.dtype and np.array_equal(a, b)
+    if isinstance(a, (list, tuple)) and type(a) is type(b):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and type(a) is type(b):
+        return a.keys() == b.keys() and all(_equal(v, b[k]) for k, v in a.items())
+
+    try:
+        return bool(np.all(a == b))  # objects that compare like arrays return an array of results
+    except ValueError:  # e.g., arrays of different shapes nested in other objects
+        return False
+
+
+MAX_UNREFERENCEABLE_INSTANCES = 128  # the number of instances that can't be weakly referenced whose memos watched_memoize keeps alive
+
+
+def watched_memoize(watcher: Callable[[Any], Any], states: int = 1):
     """
     A decorator that memoizes the result of a method call until the watcher function returns a different value.
 
     The watcher function is passed the instance that the original method is bound to.
+    Each instance has its own memo, so instances with different watched values don't reset each other's memos, and the memos don't keep the instances alive.
+    The memos are protected by a lock, so the method can be called from many threads at once.
 
     Parameters
     ----------
     watcher
+        A function of the instance that returns the watched value.
+        Watched values are compared by equality (numpy arrays by their contents), even if they are unhashable.
+    states
+        The number of watched values to keep memos for, per instance.
+        Returning to a recently-watched value (e.g., when alternating between two states) reuses its memo instead of starting over.
     """
 
     class Watcher:
-        __slots__ = ('func', 'memo', 'watched_value', '__doc__')
+        __slots__ = ('func', 'memos', 'unreferenceable_memos', 'lock', '__doc__')
 
         def __init__(self, func):
             self.func = func
-            self.memo = {}
-            self.watched_value = object()
+            self.memos = weakref.WeakKeyDictionary()  # instance -> {watched value: {args: result}}, in order of use
+            self.unreferenceable_memos = collections.OrderedDict()  # for instances that can't be weakly referenced, which are kept alive, so only the most recently used are kept
+            self.lock = threading.Lock()
 
             self.__doc__ = func.__doc__
 
-        def __call__(self, *args, **kwargs):
-            check = watcher(args[0])  # args[0] is the instance
-            key = hash_args_kwargs(*args, **kwargs)
+        def _memo(self, instance, watched_value) -> dict:
+            try:
+                memos = self.memos.get(instance)
+                if memos is None:
+                    memos = self.memos[instance] = collections.OrderedDict()
+            except TypeError:
+                memos = self.unreferenceable_memos.get(instance)
+                if memos is None:
+                    memos = self.unreferenceable_memos[instance] = collections.OrderedDict()
+                    while len(self.unreferenceable_memos) > MAX_UNREFERENCEABLE_INSTANCES:
+                        self.unreferenceable_memos.popitem(last = False)
+                else:
+                    self.unreferenceable_memos.move_to_end(instance)
+
+            memo = memos.get(watched_value)
+            if memo is None:
+                memo = memos[watched_value] = {}
+                while len(memos) > states:
+                    memos.popitem(last = False)
+            else:
+                memos.move_to_end(watched_value)
 
-            if self.watched_value != check:
-                self.memo = {}
-                self.watched_value = check
+            return memo
 
+        def __call__(self, instance, *args, **kwargs):
+            watched_value = watcher(instance)
             try:
-                v = self.memo[key]
-            except KeyError:
-                v = self.memo[key] = self.func(*args, **kwargs)
+                watched_value = _freeze(watched_value)
+            except TypeError:
+                watched_value = _ComparedByEquality(watched_value)
+            key = _make_key(args, kwargs)
+
+            with self.lock:
+                memo = self._memo(instance, watched_value)
+                try:
+                    return memo[key]
+                except KeyError:
+                    pass
+
+            v = self.func(instance, *args, **kwargs)  # not under the lock, so other calls can proceed
+
+            with self.lock:
+                memo[key] = v
 
             return v
 
@@ -1,10 +1,26 @@
+import atexit
+import contextlib
+import itertools
 import multiprocessing
+import multiprocessing.pool
+import os
+import pickle
 import subprocess
 import logging
-from typing import Optional, Union, NamedTuple, Callable, Iterable
+import threading
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, Optional, Union, NamedTuple, Callable, Iterable, Iterator, Tuple
 
+import numpy as np
 import psutil
 
+if os.name == 'posix':
+    from multiprocessing import resource_tracker
+from tqdm import tqdm
+
+from .. import exceptions
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -106,24 +122,450 @@ class SuspendProcesses:
         resume_processes(self.processes)
 
 
-def run_in_process(func, args = (), kwargs = None):
+_POOLS = {}  # number of processes -> (pid of the process that started the pool, pool)
+_POOLS_LOCK = threading.Lock()
+
+
+def default_processes() -> int:
+    """Return the number of processes that parallel functions like :func:`multi_map` use by default: one less than half of the number of cores on the computer, but at least one."""
+    return max(int(multiprocessing.cpu_count() / 2) - 1, 1)
+
+
+def _start_pool(processes: int) -> multiprocessing.pool.Pool:
+    if os.name == 'posix':  # start it before the workers, so that they share it and don't report shared memory blocks that they attach to as leaked
+        resource_tracker.ensure_running()
+
+    return multiprocessing.Pool(processes = processes)
+
+
+def get_pool(processes: Optional[int] = None) -> multiprocessing.pool.Pool:
     """
-    Run a function in a separate process.
+    Return a persistent :class:`multiprocessing.pool.Pool` with the given number of processes, starting it if it isn't running yet.
+
+    The pool is reused by every later call with the same number of processes (including the calls made by :func:`multi_map` and :func:`multi_imap` with ``persistent = True``), so that the cost of starting the worker processes and importing modules in them is only paid once.
+    Pools are shut down when the interpreter exits, or by :func:`shutdown_pools`.
+
+    The workers only see the program as it was when the pool started.
+    In particular, functions and classes defined (or redefined) in ``__main__`` afterwards, e.g. in a notebook, are missing (or out of date) in the workers.
+    Call :func:`shutdown_pools` after changing them, so that the next call starts a new pool.
+
+    Parameters
+    ----------
+    processes
+        The number of processes in the pool. Defaults to the half of the number of cores on the computer.
+    """
+    if processes is None:
+        processes = default_processes()
+
+    with _POOLS_LOCK:
+        pid, pool = _POOLS.get(processes, (None, None))
+        if pid != os.getpid():  # not started yet, or inherited from the parent of a forked process
+            pool = _start_pool(processes)
+            _POOLS[processes] = os.getpid(), pool
+
+            logger.debug(f'Started pool of {processes} processes')
+
+    return pool
+
+
+def shutdown_pools(wait: bool = True):
+    """
+    Shut down the persistent pools started by :func:`get_pool`. Later calls will start new pools.
+
+    Parameters
+    ----------
+    wait
+        If ``True``, let the worker processes finish their current work and exit. If ``False``, terminate them immediately.
+    """
+    with _POOLS_LOCK:
+        pools = [pool for pid, pool in _POOLS.values() if pid == os.getpid()]
+        _POOLS.clear()
+
+    for pool in pools:
+        if wait:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+
+    if pools:
+        logger.debug(f'Shut down {len(pools)} pools')
+
+
+atexit.register(shutdown_pools)
+
+
+@contextlib.contextmanager
+def _pool(processes: int, persistent: bool) -> Iterator[multiprocessing.pool.Pool]:
+    """Use the persistent pool (see :func:`get_pool`), or a new pool that is shut down afterwards."""
+    if persistent:
+        yield get_pool(processes)
+        return
+
+    with _start_pool(processes) as pool:
+        yield pool
+
+
+class _PickledCall:
+    """
+    Calls a function on a target, both of which are pickled before they are sent to a worker of a persistent pool and unpickled by the task itself.
+
+    If the worker can't unpickle them (e.g., because they were defined in ``__main__`` after the pool started), the task reports the error instead of the worker dying, which would leave the pool waiting forever.
+    """
+
+    def __init__(self, func: Callable):
+        self.func = pickle.dumps(func, protocol = pickle.HIGHEST_PROTOCOL)
+
+    def __call__(self, target: bytes):
+        try:
+            func = pickle.loads(self.func)
+            target = pickle.loads(target)
+        except Exception as e:
+            raise exceptions.StalePool(
+                f'A worker of the persistent pool could not unpickle its task ({type(e).__name__}: {e}). '
+                f'Functions and classes defined in __main__ after the pool started are not visible to its workers: '
+                f'call simulacra.utils.shutdown_pools() to start a new pool, or leave persistent = False.'
+            ) from None
+
+        return func(target)
+
+
+def _pickle_targets(targets: Iterable) -> Iterator[bytes]:
+    for target in targets:
+        yield pickle.dumps(target, protocol = pickle.HIGHEST_PROTOCOL)
+
+
+def run_in_process(func, args = (), kwargs = None, persistent: bool = False):
+    """
+    Run a function in a separate, fresh process.
 
     :param func: the function to run
     :param args: positional arguments for function
     :param kwargs: keyword arguments for function
+    :param persistent: if ``True``, run it in the persistent pool of one process (see :func:`get_pool`) instead of a fresh process, like :func:`multi_map` does
     """
     if kwargs is None:
         kwargs = {}
 
-    with multiprocessing.Pool(processes = 1) as pool:
-        output = pool.apply(func, args, kwargs)
+    with _pool(1, persistent) as pool:
+        if persistent:
+            return pool.apply(_PickledCall(_call), (pickle.dumps((func, args, kwargs), protocol = pickle.HIGHEST_PROTOCOL),))
+
+        return pool.apply(func, args, kwargs)
+
+
+def _call(func_args_kwargs: Tuple[Callable, tuple, dict]) -> Any:
+    func, args, kwargs = func_args_kwargs
+    return func(*args, **kwargs)
+
+
+def _chunksize(targets: Iterable, processes: int) -> int:
+    """Pick a chunksize like :meth:`multiprocessing.pool.Pool.map` does, which is large enough to amortize the communication overhead but leaves every worker about four chunks to balance the load with."""
+    try:
+        count = len(targets)
+    except TypeError:  # can't know without consuming it
+        return 1
+
+    chunksize, extra = divmod(count, processes * 4)
+
+    return max(chunksize + bool(extra), 1)
+
+
+def multi_imap(
+    func: Callable,
+    targets: Iterable,
+    processes: Optional[int] = None,
+    ordered: bool = False,
+    chunksize: Optional[int] = None,
+    progress: bool = False,
+    persistent: bool = False,
+) -> Iterator:
+    """
+    Map a function over an iterable of inputs using multiprocessing, yielding the outputs as they are produced.
+
+    Parameters
+    ----------
+    func : a callable
+        The function to call on each of the `targets`.
+    targets : an iterable
+        An iterable of arguments to call the function on. It is consumed lazily.
+    processes : :class:`int`
+        The number of processes to use. Defaults to the half of the number of cores on the computer.
+    ordered
+        If ``True``, yield the outputs in the same order as the targets. Otherwise, yield them in whatever order they finish in.
+    chunksize
+        The number of targets to send to a worker at once.
+        Defaults to splitting the targets into about four chunks per worker, if the number of targets is known, and to one otherwise.
+    progress
+        If ``True``, show a progress bar.
+    persistent
+        If ``True``, use the persistent pool (see :func:`get_pool`) instead of starting a new pool, which is shut down when the iterator is exhausted.
+
+    Returns
+    -------
+    iterator
+        The outputs of the function being applied to the targets.
+    """
+    if processes is None:
+        processes = default_processes()
+    if chunksize is None:
+        chunksize = _chunksize(targets, processes)
+    total = len(targets) if hasattr(targets, '__len__') else None
+
+    with _pool(processes, persistent) as pool:
+        if persistent:
+            func, targets = _PickledCall(func), _pickle_targets(targets)
+
+        imap = pool.imap if ordered else pool.imap_unordered
+        outputs = imap(func, targets, chunksize = chunksize)
+
+        if progress:
+            outputs = tqdm(outputs, total = total, ascii = True)
 
-    return output
+        yield from outputs
 
 
-def multi_map(func: Callable, targets: Iterable, processes: Optional[int] = None, **kwargs):
+class SharedArray:
+    """
+    A handle to a numpy array in shared memory (see :mod:`multiprocessing.shared_memory`), which can be sent to other processes without copying the array.
+
+    Create one with :func:`share_array`.
+    Pickling the handle only pickles the name of the shared memory block and the layout of the array; call :meth:`SharedArray.attach` in the other process to get the array back.
+    The process that created the block frees it when the handle is closed or garbage-collected, so it must outlive any use of the array in other processes.
+    """
+
+    def __init__(self, name: str, dtype: np.dtype, shape: Tuple[int, ...], strides: Tuple[int, ...], offset: int = 0):
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.strides = tuple(strides)
+        self.offset = offset
+
+        self._shm = None
+        self._finalizer = None
+
+    @classmethod
+    def create(cls, array: np.ndarray) -> 'SharedArray':
+        """Copy an array into a new block of shared memory, owned by the returned handle."""
+        shm = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+
+        if array.flags.c_contiguous or array.flags.f_contiguous:  # keep the memory layout, so that views of the array can be reconstructed
+            copy = np.ndarray(array.shape, dtype = array.dtype, buffer = shm.buf, strides = array.strides)
+        else:
+            copy = np.ndarray(array.shape, dtype = array.dtype, buffer = shm.buf)
+        np.copyto(copy, array)
+
+        shared = cls(shm.name, array.dtype, array.shape, copy.strides)
+        del copy  # release the buffer, so that the block can be closed
+        shared._shm = shm
+        shared._finalizer = weakref.finalize(shared, _free_shared_memory, shm)
+
+        return shared
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shm'] = state['_finalizer'] = None  # only the creator frees the block
+
+        return state
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(name = {self.name}, dtype = {self.dtype}, shape = {self.shape})'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def view(self, shape: Tuple[int, ...], strides: Tuple[int, ...], offset: int) -> 'SharedArray':
+        """Return a handle to a view into the same block of shared memory, which is freed along with this handle."""
+        return self.__class__(self.name, self.dtype, shape, strides, self.offset + offset)
+
+    def attach(self, writeable: bool = False) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+        """
+        Attach to the block of shared memory and return it, along with the array inside it.
+
+        The block must be closed (via its ``close`` method) after the array is no longer used.
+
+        Parameters
+        ----------
+        writeable
+            If ``False``, the array is read-only.
+        """
+        shm = shared_memory.SharedMemory(name = self.name)
+        array = np.ndarray(self.shape, dtype = self.dtype, buffer = shm.buf, offset = self.offset, strides = self.strides)
+        array.flags.writeable = writeable
+
+        return shm, array
+
+    def close(self):
+        """Free the block of shared memory, if this handle created it."""
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+def _free_shared_memory(shm: shared_memory.SharedMemory):
+    try:
+        shm.unlink()
+    except FileNotFoundError:  # already unlinked
+        pass
+    try:
+        shm.close()
+    except BufferError:  # arrays in this process still use it; the memory is released when they are
+        pass
+
+
+def share_array(array: np.ndarray) -> SharedArray:
+    """Copy an array into shared memory, returning a :class:`SharedArray` handle that can be sent to other processes without copying the array."""
+    return SharedArray.create(array)
+
+
+def _root_array(array: np.ndarray) -> np.ndarray:
+    """Return the array that ``array`` is a view of (possibly through other views)."""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+
+    return array
+
+
+class _ArraySharer:
+    """Replaces numpy arrays with handles to shared memory, sharing each underlying array only once even if many targets are views of it."""
+
+    def __init__(self):
+        self.roots = {}  # id of root array -> (root array, SharedArray)
+        self.copies = []
+
+    def share(self, array: np.ndarray) -> SharedArray:
+        root = _root_array(array)
+        if not (root.flags.c_contiguous or root.flags.f_contiguous):  # views can't be reconstructed from a dense copy of the root, so copy the view instead
+            shared = SharedArray.create(array)
+            self.copies.append(shared)
+            return shared
+
+        shared_root = self._share_root(root)
+        offset = array.__array_interface__['data'][0] - root.__array_interface__['data'][0]
+
+        return shared_root.view(array.shape, array.strides, offset)
+
+    def _share_root(self, root: np.ndarray) -> SharedArray:
+        try:
+            return self.roots[id(root)][1]
+        except KeyError:
+            shared = SharedArray.create(root)
+            self.roots[id(root)] = root, shared  # keep the root alive, so that its id isn't reused
+            return shared
+
+    def convert(self, target: Any) -> Any:
+        if isinstance(target, np.ndarray) and target.dtype != object:
+            return self.share(target)
+        if type(target) is tuple:
+            return tuple(self.convert(t) for t in target)
+
+        return target
+
+    def close(self):
+        for shared in itertools.chain((shared for _, shared in self.roots.values()), self.copies):
+            shared.close()
+        self.roots.clear()
+        self.copies.clear()
+
+
+class _SharedMemoryTask:
+    """Calls the function on a target whose arrays are in shared memory, and writes the output into a shared output array if there is one."""
+
+    def __init__(self, func: Callable, output: Optional[SharedArray]):
+        self.func = func
+        self.output = output
+
+    def __call__(self, index_and_target):
+        index, target = index_and_target
+
+        attached = []
+
+        def resolve(t):
+            if isinstance(t, SharedArray):
+                shm, array = t.attach()
+                attached.append(shm)
+                return array
+            if type(t) is tuple:
+                return tuple(resolve(x) for x in t)
+            return t
+
+        try:
+            result = self.func(resolve(target))
+            if self.output is None:
+                return result
+
+            shm, output = self.output.attach(writeable = True)
+            attached.append(shm)
+            output[index] = result
+            del output
+        finally:
+            del target
+            for shm in attached:
+                try:
+                    shm.close()
+                except BufferError:  # the function kept a reference to the array; it is released when that is
+                    pass
+
+
+def _map(func: Callable, targets: Iterable, processes: Optional[int], progress: bool, persistent: bool, **kwargs) -> tuple:
+    if progress:
+        return tuple(multi_imap(func, targets, processes = processes, ordered = True, progress = True, persistent = persistent, **kwargs))
+
+    if processes is None:
+        processes = default_processes()
+
+    with _pool(processes, persistent) as pool:
+        if persistent:
+            func, targets = _PickledCall(func), _pickle_targets(targets)
+
+        return tuple(pool.map(func, targets, **kwargs))
+
+
+def _multi_map_shared(
+    func: Callable,
+    targets: Iterable,
+    processes: Optional[int],
+    progress: bool,
+    persistent: bool,
+    output_shape: Optional[Tuple[int, ...]],
+    output_dtype,
+    **kwargs,
+):
+    sharer = _ArraySharer()
+    output = None
+    try:
+        tasks = [(index, sharer.convert(target)) for index, target in enumerate(targets)]
+
+        if output_shape is not None:
+            output = SharedArray.create(np.empty((len(tasks), *output_shape), dtype = output_dtype))
+
+        results = _map(_SharedMemoryTask(func, output), tasks, processes = processes, progress = progress, persistent = persistent, **kwargs)
+
+        if output is None:
+            return results
+
+        shm, array = output.attach(writeable = True)
+        weakref.finalize(array, shm.close)  # keep the block mapped for as long as the array is alive
+        return array
+    finally:
+        sharer.close()
+        if output is not None:
+            output.close()  # only unlinks the name; the mapping above stays valid
+
+
+def multi_map(
+    func: Callable,
+    targets: Iterable,
+    processes: Optional[int] = None,
+    progress: bool = False,
+    shared_memory: bool = False,
+    output_shape: Optional[Tuple[int, ...]] = None,
+    output_dtype = float,
+    persistent: bool = False,
+    **kwargs,
+):
     """
     Map a function over a list of inputs using multiprocessing.
 
@@ -137,18 +579,31 @@ def multi_map(func: Callable, targets: Iterable, processes: Optional[int] = None
         An iterable of arguments to call the function on.
     processes : :class:`int`
         The number of processes to use. Defaults to the half of the number of cores on the computer.
+    progress
+        If ``True``, show a progress bar.
+    shared_memory
+        If ``True``, numpy arrays in the targets (either the targets themselves, or elements of tuple targets) are sent to the workers through shared memory instead of being pickled.
+        Targets that are views of the same array (like slices of a large mesh) share a single copy of it.
+        The workers see read-only views of the arrays.
+        The shared memory is freed when ``multi_map`` returns.
+    output_shape
+        If given, the function must return an array of this shape (or anything that can be assigned to one), which the workers write directly into a shared output array instead of pickling it back.
+        Implies ``shared_memory``.
+    output_dtype
+        The dtype of the shared output array.
+    persistent
+        If ``True``, use the persistent pool (see :func:`get_pool`) instead of starting a new pool for this call.
+        This avoids the cost of starting the workers each time, but they don't see functions and classes defined in ``__main__`` after the pool started.
     kwargs
-        Keyword arguments are passed to :func:`multiprocess.pool.map`.
+        Keyword arguments are passed to :func:`multiprocess.pool.map` (or to :func:`multi_imap`, if ``progress`` is ``True``).
 
     Returns
     -------
-    :class:`tuple`
+    :class:`tuple` or :class:`numpy.ndarray`
         The outputs of the function being applied to the targets.
+        If ``output_shape`` is given, they are stacked in an array of shape ``(len(targets), *output_shape)``.
     """
-    if processes is None:
-        processes = max(int(multiprocessing.cpu_count() / 2) - 1, 1)
-
-    with multiprocessing.Pool(processes = processes) as pool:
-        output = pool.map(func, targets, **kwargs)
+    if shared_memory or output_shape is not None:
+        return _multi_map_shared(func, targets, processes = processes, progress = progress, persistent = persistent, output_shape = output_shape, output_dtype = output_dtype, **kwargs)
 
-    return tuple(output)
+    return _map(func, targets, processes = processes, progress = progress, persistent = persistent, **kwargs)
@@ -1,19 +1,212 @@
+import collections
+import contextlib
 import os
 import logging
+import multiprocessing
+import multiprocessing.connection
+import sqlite3
+import time
+import traceback
+import uuid
 from pathlib import Path
-from typing import Optional, Callable, Iterable, Union
+from typing import Any, Dict, List, NamedTuple, Optional, Iterable, Set, Union
 
-from .. import sims
+from tqdm import tqdm
+
+from .. import sims, exceptions
+from .processes import default_processes
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
-def find_or_init_sim_from_spec(spec, search_dir: Optional[Union[Path, str]] = None, file_extension = 'sim'):
+SIMLIB_INDEX = '.simlib_index.sqlite'  # the name of the index file in a simlib directory
+SIMLIB_INDEX_VERSION = 2  # version 2 added spec_hash
+
+
+class SimlibEntry(NamedTuple):
+    """A row of a :class:`SimlibIndex`."""
+
+    file_name: str
+    file_extension: str
+    uuid: str
+    status: str
+    mtime: float
+    path: Path
+    spec_hash: Optional[str]
+
+
+class SimlibIndex:
+    """
+    An index of the Simulations saved in a simlib directory, kept in a small SQLite database in the directory.
+
+    Once a simlib has an index, :func:`simulacra.Simulation.save` records every Simulation saved to the directory in it, so that finding out whether a Simulation exists or is finished doesn't require loading it.
+    :func:`find_or_init_sim_from_spec` and :func:`run_from_simlib` use the index if there is one, and :func:`run_batch_from_simlib` creates one.
+    Many processes can update the same index at once.
+    """
+
+    _found: Dict[Path, 'SimlibIndex'] = {}  # simlib -> index, so that saving to a simlib over and over doesn't check the schema of its index every time
+
+    def __init__(self, simlib: Union[Path, str], create: bool = False):
+        """
+        Parameters
+        ----------
+        simlib
+            The simlib directory.
+        create
+            If ``True``, create the index if it doesn't exist, and fill it in from the headers of any Simulations that are already in the directory (see :meth:`SimlibIndex.rebuild`).
+            Otherwise, raise :class:`FileNotFoundError` if it doesn't exist.
+        """
+        self.simlib = Path(simlib).absolute()
+        self.path = self.simlib / SIMLIB_INDEX
+
+        if not self.path.exists():
+            if not create:
+                raise FileNotFoundError(f'{self.simlib} has no simlib index')
+
+            self.simlib.mkdir(parents = True, exist_ok = True)
+            with self._connect() as connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS sims ('
+                    'name TEXT PRIMARY KEY, file_name TEXT NOT NULL, file_extension TEXT NOT NULL, uuid TEXT, status TEXT, mtime REAL, spec_hash TEXT)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS sims_by_spec_hash ON sims (spec_hash)')
+                connection.execute(f'PRAGMA user_version = {SIMLIB_INDEX_VERSION}')
+            self.rebuild()
+        else:
+            self._migrate()
+
+    def _migrate(self):
+        """Update an index written by an older version of Simulacra."""
+        with self._connect() as connection:
+            version = connection.execute('PRAGMA user_version').fetchone()[0]
+            if version < 2:
+                connection.execute('ALTER TABLE sims ADD COLUMN spec_hash TEXT')  # unknown for existing entries until the index is rebuilt
+                connection.execute('CREATE INDEX IF NOT EXISTS sims_by_spec_hash ON sims (spec_hash)')
+            if version < SIMLIB_INDEX_VERSION:
+                connection.execute(f'PRAGMA user_version = {SIMLIB_INDEX_VERSION}')
+
+    @classmethod
+    def find(cls, simlib: Optional[Union[Path, str]]) -> Optional['SimlibIndex']:
+        """Return the index of the simlib, or ``None`` if it doesn't have one. Indexes are reused for each simlib (as long as their files exist)."""
+        simlib = (Path(simlib) if simlib is not None else Path.cwd()).absolute()
+        if not (simlib / SIMLIB_INDEX).exists():
+            cls._found.pop(simlib, None)
+            return None
+
+        index = cls._found.get(simlib)
+        if index is None:
+            index = cls._found[simlib] = cls(simlib)
+
+        return index
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(simlib = {self.simlib})'
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection for a single transaction. Connections aren't kept open, because they can't be shared with forked processes."""
+        with contextlib.closing(sqlite3.connect(str(self.path), timeout = 60)) as connection:
+            with connection:  # commits, or rolls back on an exception
+                yield connection
+
+    def record(self, path: Union[Path, str], sim: 'sims.Simulation'):
+        """Record a Simulation that has just been saved to ``path`` in the index."""
+        path = Path(path)
+        file_name, _, file_extension = path.name.rpartition('.')
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO sims VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path.name, file_name, file_extension, str(sim.uuid), str(sim.status), path.stat().st_mtime, sim.spec_hash),
+            )
+
+    def remove(self, file_name: str, file_extension: str = 'sim'):
+        """Remove a Simulation from the index (but not from the simlib)."""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM sims WHERE name = ?', (f'{file_name}.{file_extension}',))
+
+    def _entry(self, row: tuple) -> SimlibEntry:
+        name, file_name, file_extension, uuid, status, mtime, spec_hash = row
+        return SimlibEntry(file_name, file_extension, uuid, status, mtime, self.simlib / name, spec_hash)
+
+    def get(self, file_name: str, file_extension: str = 'sim') -> Optional[SimlibEntry]:
+        """Return the entry for a Simulation, or ``None`` if it isn't in the simlib."""
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM sims WHERE name = ?', (f'{file_name}.{file_extension}',)).fetchone()
+
+        return self._entry(row) if row is not None else None
+
+    def find_by_spec_hash(self, spec_hash: str, status: Optional['sims.Status'] = None, file_extension: str = 'sim') -> Optional[SimlibEntry]:
+        """Return the entry for a Simulation whose Specification has the given content hash (see :func:`simulacra.Specification.content_hash`) and status, or ``None`` if there isn't one."""
+        query, args = 'SELECT * FROM sims WHERE spec_hash = ? AND file_extension = ?', [spec_hash, file_extension]
+        if status is not None:
+            query += ' AND status = ?'
+            args.append(str(status))
+
+        with self._connect() as connection:
+            row = connection.execute(query, args).fetchone()
+
+        return self._entry(row) if row is not None else None
+
+    def entries(self, status: Optional['sims.Status'] = None, file_extension: str = 'sim') -> List[SimlibEntry]:
+        """Return the entries for every Simulation in the simlib, or only those with the given status."""
+        query, args = 'SELECT * FROM sims WHERE file_extension = ?', [file_extension]
+        if status is not None:
+            query += ' AND status = ?'
+            args.append(str(status))
+
+        with self._connect() as connection:
+            return [self._entry(row) for row in connection.execute(query, args)]
+
+    def finished(self, file_extension: str = 'sim') -> Set[str]:
+        """Return the file names of every finished Simulation in the simlib, in a single query."""
+        return {entry.file_name for entry in self.entries(status = sims.Status.FINISHED, file_extension = file_extension)}
+
+    def __len__(self) -> int:
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM sims').fetchone()[0]
+
+    def rebuild(self, file_extension: str = 'sim'):
+        """Replace the entries for ``file_extension`` with ones read from the headers of the Simulation files in the directory (without loading the Simulations)."""
+        rows = []
+        for path in self.simlib.glob(f'*.{file_extension}'):
+            metadata = sims.Simulation.load_metadata(path)
+            if metadata is None:  # written by an older version of Simulacra, so the Simulation has to be loaded
+                sim = sims.Simulation.load(path)
+                metadata = {'uuid': sim.uuid, 'status': sim.status, 'spec_hash': sim.spec_hash}
+            rows.append((
+                path.name,
+                path.name[:-len(file_extension) - 1],
+                file_extension,
+                str(metadata['uuid']),
+                str(metadata['status']),
+                path.stat().st_mtime,
+                metadata.get('spec_hash'),  # not in headers written before content hashes existed
+            ))
+
+        with self._connect() as connection:
+            connection.execute('DELETE FROM sims WHERE file_extension = ?', (file_extension,))
+            connection.executemany('INSERT INTO sims VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+        logger.debug(f'Rebuilt {self} from {len(rows)} Simulations')
+
+
+def find_or_init_sim_from_spec(
+    spec,
+    search_dir: Optional[Union[Path, str]] = None,
+    file_extension = 'sim',
+    match_contents: bool = False,
+    replace_mismatched: bool = False,
+):
     """
     Try to load a :class:`simulacra.Simulation` by looking for a pickled :class:`simulacra.core.Simulation` named ``{search_dir}/{spec.file_name}.{file_extension}``.
     If that fails, create a new Simulation from `spec`.
 
+    If the directory has a :class:`SimlibIndex`, it is checked first, and Simulations that aren't in it or in the directory are created without loading anything.
+    Simulations that are in the directory but not in the index (e.g., because they were copied in) are loaded and added to it.
+    If ``match_contents`` is ``True``, the index is also used to find a finished Simulation with a different name whose Specification has the same contents (see :func:`simulacra.Specification.content_hash`).
+    It is returned instead, relabeled with ``spec`` (and a new UUID), so that it can be saved under the new name without being run again.
+
     Parameters
     ----------
     spec
@@ -22,27 +215,294 @@ def find_or_init_sim_from_spec(spec, search_dir: Optional[Union[Path, str]] = No
         The directory to look for the simulation in.
     file_extension
         The simulation file extension.
+    match_contents
+        If ``True``, reuse finished Simulations whose Specifications have the same contents, and check that a Simulation with the same name was made from a Specification with the same contents.
+        If it wasn't (e.g., because the Specification was changed), a new Simulation is created instead of an unfinished one, and :class:`simulacra.exceptions.MismatchedSimulation` is raised for a finished one.
+    replace_mismatched
+        If ``True``, create a new Simulation instead of raising for a finished Simulation with the same name but different contents, so that it is replaced when the new one is saved.
 
     Returns
     -------
     sim
         The simulation, either loaded or initialized.
     """
-    search_dir = Path(search_dir) or Path.cwd()
+    search_dir = Path(search_dir) if search_dir is not None else Path.cwd()
     path = search_dir / f'{spec.file_name}.{file_extension}'
+    spec_hash = spec.content_hash() if match_contents else None
+
+    index = SimlibIndex.find(search_dir)
+    indexed = index is not None and index.get(spec.file_name, file_extension) is not None
+    if index is not None and not indexed and not path.exists():  # files saved without the index (e.g., copied in later) are still checked for
+        if spec_hash is not None:
+            same = index.find_by_spec_hash(spec_hash, status = sims.Status.FINISHED, file_extension = file_extension)
+            if same is not None:
+                try:
+                    sim = sims.Simulation.load(path = same.path)
+                except FileNotFoundError:
+                    index.remove(same.file_name, file_extension)
+                else:
+                    logger.debug(f'Reusing {sim} for {spec}, which has the same contents')
+                    sim.spec, sim.name, sim.file_name, sim.uuid = spec, spec.name, spec.file_name, uuid.uuid4()
+                    return sim
+
+        return spec.to_sim()
+
     try:
         sim = sims.Simulation.load(path = path)
     except FileNotFoundError:
-        sim = spec.to_sim()
+        if indexed:  # the file was removed behind the index's back
+            index.remove(spec.file_name, file_extension)
+        return spec.to_sim()
+
+    if index is not None and not indexed:
+        index.record(path, sim)
+
+    if spec_hash is not None and sim.spec_hash not in (spec_hash, None):
+        if sim.status == sims.Status.FINISHED and not replace_mismatched:
+            raise exceptions.MismatchedSimulation(f'{path} is finished, but was made from a Specification with different contents than {spec} (pass replace_mismatched = True to run it again)')
+
+        logger.warning(f'{path} was made from a Specification with different contents than {spec}, so a new Simulation will replace it')
+        return spec.to_sim()
 
     return sim
 
 
-def run_from_simlib(spec, simlib = None, **kwargs):
-    sim = find_or_init_sim_from_spec(spec, search_dir = simlib)
+def run_from_simlib(spec, simlib = None, match_contents: bool = False, replace_mismatched: bool = False, file_extension: str = 'sim', **kwargs):
+    """
+    Load the Simulation for the Specification from the simlib directory, or create it (see :func:`find_or_init_sim_from_spec`), and run and save it if it isn't finished.
+
+    Parameters
+    ----------
+    spec
+        The Specification to run.
+    simlib
+        The directory to load the Simulation from and save it to.
+    match_contents
+        If ``True``, reuse finished Simulations whose Specifications have the same contents, and don't reuse ones with the same name but different contents (see :func:`find_or_init_sim_from_spec`).
+    replace_mismatched
+        If ``True``, rerun and replace finished Simulations with the same name but different contents instead of raising (see :func:`find_or_init_sim_from_spec`).
+    file_extension
+        The simulation file extension.
+    kwargs
+        Keyword arguments are passed to the ``run`` method of the Simulation.
+
+    Returns
+    -------
+    sim
+        The finished Simulation.
+    """
+    sim = find_or_init_sim_from_spec(spec, search_dir = simlib, file_extension = file_extension, match_contents = match_contents, replace_mismatched = replace_mismatched)
 
     if sim.status != sims.Status.FINISHED:
         sim.run(**kwargs)
-        sim.save(target_dir = simlib)
+        sim.save(target_dir = simlib, file_extension = file_extension)
+    elif match_contents and not (Path(simlib or Path.cwd()) / f'{sim.file_name}.{file_extension}').exists():  # reused from a Simulation with a different name
+        sim.save(target_dir = simlib, file_extension = file_extension)
 
     return sim
+
+
+class BatchReport(NamedTuple):
+    """The outcome of :func:`run_batch_from_simlib`."""
+
+    finished: List[str]  # including ones that reused a finished Simulation with the same contents
+    skipped: List[str]  # already finished under the same name, so never started
+    failed: Dict[str, str]  # file name -> the reason for the last failure
+    retries: int
+    elapsed: float  # seconds
+
+    @property
+    def throughput(self) -> float:
+        """The number of Simulations finished per hour."""
+        return 3600 * len(self.finished) / self.elapsed if self.elapsed > 0 else 0
+
+    def __str__(self):
+        return (
+            f'Ran {len(self.finished)} Simulations in {self.elapsed:.1f} s ({self.throughput:.1f} per hour), '
+            f'skipped {len(self.skipped)} already finished, {len(self.failed)} failed after {self.retries} retries'
+        )
+
+
+def _run_in_child(connection: multiprocessing.connection.Connection, spec, simlib: Path, match_contents: bool, replace_mismatched: bool, file_extension: str, run_kwargs: Dict[str, Any]):
+    try:
+        sim = run_from_simlib(spec, simlib = simlib, match_contents = match_contents, replace_mismatched = replace_mismatched, file_extension = file_extension, **run_kwargs)
+        connection.send((True, str(sim.status)))
+    except BaseException:
+        connection.send((False, traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class _Task:
+    __slots__ = ('spec', 'attempt', 'spec_hash', 'process', 'connection', 'deadline')
+
+    def __init__(self, spec, attempt: int, spec_hash: Optional[str] = None):
+        self.spec = spec
+        self.attempt = attempt
+        self.spec_hash = spec_hash
+
+        self.process = None
+        self.connection = None
+        self.deadline = None
+
+
+def run_batch_from_simlib(
+    specs: Iterable['sims.Specification'],
+    simlib: Union[Path, str],
+    processes: Optional[int] = None,
+    timeout: Optional[float] = None,
+    retries: int = 1,
+    progress: bool = True,
+    file_extension: str = 'sim',
+    match_contents: bool = False,
+    replace_mismatched: bool = False,
+    **kwargs,
+) -> BatchReport:
+    """
+    Run many Specifications in parallel on this computer via :func:`run_from_simlib`, using the simlib directory to resume interrupted batches.
+
+    Specifications whose Simulations are already finished in the simlib under the same name are skipped without being loaded, by querying the simlib's :class:`SimlibIndex` (which is created if it doesn't exist).
+    Unfinished Simulations in the simlib (e.g., ones that were saved partway through by their ``run`` method) are resumed, and every Simulation is saved to the simlib when its run ends.
+
+    Each Simulation runs in its own process, so that one that hangs can be stopped and one that crashes (even if it takes its process down with it) doesn't affect the others.
+
+    Parameters
+    ----------
+    specs
+        The Specifications to run.
+    simlib
+        The directory to load unfinished Simulations from and save them to.
+    processes
+        The number of Simulations to run at once. Defaults to the half of the number of cores on the computer.
+    timeout
+        If not ``None``, stop any Simulation that runs for longer than this many seconds, and count it as failed.
+    retries
+        The number of times to retry a Simulation that failed (by raising an exception, crashing, or timing out).
+    progress
+        If ``True``, show a progress bar.
+    file_extension
+        The simulation file extension.
+    match_contents
+        If ``True``, Specifications that have the same contents as a finished Simulation with a different name reuse it instead of running again (see :func:`find_or_init_sim_from_spec`).
+        They still get a process, which copies the finished Simulation to the new name, and are reported as finished rather than skipped.
+        Specifications in the batch with the same contents as each other only run once.
+        Ones whose finished Simulation was made from a Specification with different contents are reported as failed.
+    replace_mismatched
+        If ``True`` (and ``match_contents`` is ``True``), rerun and replace finished Simulations that were made from Specifications with different contents instead.
+    kwargs
+        Keyword arguments are passed to the ``run`` method of each Simulation.
+
+    Returns
+    -------
+    report : :class:`BatchReport`
+        Which Simulations finished, were skipped, and failed, and the throughput.
+    """
+    simlib = Path(simlib)
+    finished_entries = SimlibIndex(simlib, create = True).entries(status = sims.Status.FINISHED, file_extension = file_extension)
+    finished_hashes = {entry.file_name: entry.spec_hash for entry in finished_entries}
+
+    if processes is None:
+        processes = default_processes()
+
+    start_time = time.monotonic()
+
+    finished, skipped, failed = [], [], {}
+    retry_count = 0
+
+    pending = collections.deque()
+    held = collections.defaultdict(list)  # spec hash -> tasks waiting for another task with the same contents to finish, so that they can reuse its Simulation
+    for spec in specs:
+        spec_hash = spec.content_hash() if match_contents else None
+        if spec.file_name in finished_hashes and (spec_hash is None or finished_hashes[spec.file_name] in (spec_hash, None)):
+            skipped.append(spec.file_name)
+        elif spec.file_name in finished_hashes and not replace_mismatched:
+            failed[spec.file_name] = 'the finished Simulation was made from a Specification with different contents (pass replace_mismatched = True to run it again)'
+        elif spec_hash is not None and spec_hash in held:
+            held[spec_hash].append(_Task(spec, attempt = 0, spec_hash = spec_hash))
+        else:
+            pending.append(_Task(spec, attempt = 0, spec_hash = spec_hash))
+            if spec_hash is not None:
+                held[spec_hash] = []
+    total = len(pending) + sum(len(tasks) for tasks in held.values())
+
+    logger.info(f'Running {total} Simulations in {processes} processes, skipping {len(skipped)} that are already finished')
+
+    context = multiprocessing.get_context()
+    running = []
+    bar = tqdm(total = total, ascii = True, disable = not progress)
+
+    def start(task: _Task):
+        task.connection, child_connection = context.Pipe(duplex = False)
+        task.process = context.Process(
+            target = _run_in_child,
+            args = (child_connection, task.spec, simlib, match_contents, replace_mismatched, file_extension, kwargs),
+            name = f'simulacra-{task.spec.file_name}',
+            daemon = True,
+        )
+        task.process.start()
+        child_connection.close()  # so that reading raises EOFError if the child dies without sending anything
+        task.deadline = time.monotonic() + timeout if timeout is not None else None
+        running.append(task)
+
+    def end(task: _Task, ok: bool, reason: str):
+        nonlocal retry_count
+
+        task.process.join()
+        task.connection.close()
+        running.remove(task)
+
+        name = task.spec.file_name
+        if ok:
+            finished.append(name)
+            failed.pop(name, None)
+            bar.update()
+        elif task.attempt < retries:
+            logger.warning(f'{task.spec} failed on attempt {task.attempt + 1}, retrying: {reason}')
+            retry_count += 1
+            failed[name] = reason
+            pending.append(_Task(task.spec, attempt = task.attempt + 1, spec_hash = task.spec_hash))
+            return
+        else:
+            logger.error(f'{task.spec} failed on attempt {task.attempt + 1}, giving up: {reason}')
+            failed[name] = reason
+            bar.update()
+
+        if task.spec_hash is not None:  # the Simulations with the same contents can reuse this one now (or try again themselves, if it failed)
+            pending.extend(held.pop(task.spec_hash, ()))
+
+    try:
+        while pending or running:
+            while pending and len(running) < processes:
+                start(pending.popleft())
+
+            deadlines = [task.deadline for task in running if task.deadline is not None]
+            wait_time = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+            ready = multiprocessing.connection.wait([task.connection for task in running], timeout = wait_time)
+
+            for task in list(running):
+                if task.connection in ready:
+                    try:
+                        ok, message = task.connection.recv()
+                    except EOFError:
+                        task.process.join()
+                        ok, message = False, f'process exited with code {task.process.exitcode}'
+                    end(task, ok, message if not ok else '')
+                elif task.deadline is not None and time.monotonic() >= task.deadline:
+                    task.process.terminate()
+                    end(task, False, f'timed out after {timeout} s')
+    finally:
+        for task in running:
+            task.process.terminate()
+            task.process.join()
+        bar.close()
+
+    report = BatchReport(
+        finished = finished,
+        skipped = skipped,
+        failed = failed,
+        retries = retry_count,
+        elapsed = time.monotonic() - start_time,
+    )
+    logger.info(str(report))
+
+    return report
@@ -0,0 +1,222 @@
+import asyncio
+import io
+import posixpath
+import stat
+import threading
+import time
+
+import pytest
+
+import paramiko
+
+import simulacra as si
+import simulacra.cluster as clu
+
+TREE = {
+    '/home': ['a', 'b', '.hidden', 'logs', 'top.txt'],
+    '/home/a': ['1.sim', '2.sim', 'ignored.bin', 'c'],
+    '/home/a/c': ['3.spec'],
+    '/home/b': ['4.txt'],
+    '/home/.hidden': ['5.txt'],
+    '/home/logs': ['6.txt'],
+}
+
+
+class Tracker:
+    """Keeps track of how many operations are in progress at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self.lock:
+            self.active -= 1
+
+
+class FakeSFTP:
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def listdir_attr(self, path):
+        out = []
+        for name in TREE[path]:
+            attr = paramiko.SFTPAttributes()
+            attr.filename = name
+            attr.st_mode = stat.S_IFDIR if posixpath.join(path, name) in TREE else stat.S_IFREG
+            attr.st_size = 10
+            attr.st_mtime = 1000
+            attr.st_atime = 1000
+            out.append(attr)
+        return out
+
+    def get(self, remote_path, local_path):
+        with self.tracker:
+            time.sleep(.05)
+            with open(local_path, mode = 'wb') as f:
+                f.write(b'0123456789')
+
+    def lstat(self, path):
+        attr = paramiko.SFTPAttributes()
+        attr.st_size = 10
+        attr.st_mtime = 1000
+        attr.st_atime = 1000
+        return attr
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope = 'function')
+def tracker():
+    return Tracker()
+
+
+def make_interface(mocker, tracker, max_workers = 3):
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: FakeSFTP(tracker))
+
+    ci = clu.AsyncClusterInterface('host', 'user', 'key', max_workers = max_workers)
+    ci.interface.ftp = FakeSFTP(tracker)
+    ci._open_executor()  # instead of connecting
+
+    return ci
+
+
+@pytest.fixture(scope = 'function')
+def interface(mocker, tracker):
+    ci = make_interface(mocker, tracker)
+    yield ci
+    ci._executor.shutdown()
+
+
+def test_walk_matches_sync_walk(interface):
+    dirs, files = [], []
+
+    count = asyncio.run(interface.walk_remote_path(
+        '/home',
+        func_on_dirs = lambda path, _: dirs.append(path),
+        func_on_files = lambda path, _: files.append(path),
+        blacklist_dir_names = ('logs',),
+        whitelist_file_ext = ('.txt', '.sim', '.spec'),
+    ))
+
+    assert count == 11
+    assert sorted(dirs) == ['/home/a', '/home/a/c', '/home/b']
+    assert sorted(files) == ['/home/a/1.sim', '/home/a/2.sim', '/home/a/c/3.spec', '/home/b/4.txt', '/home/top.txt']
+
+
+def test_walk_awaits_coroutine_callbacks(interface):
+    files = []
+
+    async def on_file(path, _):
+        await asyncio.sleep(0)
+        files.append(path)
+
+    asyncio.run(interface.walk_remote_path('/home', func_on_files = on_file, whitelist_file_ext = ('.sim',)))
+
+    assert sorted(files) == ['/home/a/1.sim', '/home/a/2.sim']
+
+
+def test_transfers_are_bounded_by_max_workers(interface, tracker, tmp_path):
+    async def get_all():
+        await asyncio.gather(*(interface.get_file(f'/home/{n}.txt', str(tmp_path / f'{n}.txt')) for n in range(10)))
+
+    asyncio.run(get_all())
+
+    assert tracker.max_active == 3
+    assert len(list(tmp_path.iterdir())) == 10
+
+
+def test_many_hosts_from_one_event_loop(mocker, tracker, tmp_path):
+    interfaces = [make_interface(mocker, tracker, max_workers = 2) for _ in range(3)]
+
+    async def get_all():
+        await asyncio.gather(*(
+            ci.get_file(f'/home/{n}.txt', str(tmp_path / str(i) / f'{n}.txt'))
+            for i, ci in enumerate(interfaces)
+            for n in range(4)
+        ))
+
+    asyncio.run(get_all())
+
+    assert tracker.max_active == 6
+    for ci in interfaces:
+        ci._executor.shutdown()
+
+
+def test_mirror_dir(interface, tmp_path, mocker):
+    verify_files = mocker.patch.object(interface.interface, 'verify_files', return_value = [])
+
+    asyncio.run(interface.mirror_dir('/home', local_root = str(tmp_path), integrity_check_batch_size = 2))
+
+    mirrored = sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob('*') if p.is_file())
+    assert mirrored == ['home/a/1.sim', 'home/a/2.sim', 'home/a/c/3.spec', 'home/b/4.txt', 'home/top.txt']
+
+    verified = sorted(f[0] for call in verify_files.call_args_list for f in call[0][0])
+    assert verified == ['/home/a/1.sim', '/home/a/2.sim', '/home/a/c/3.spec', '/home/b/4.txt', '/home/top.txt']
+    assert all(len(call[0][0]) <= 2 for call in verify_files.call_args_list)
+
+
+def test_mirror_dir_skips_synced_files(interface, tmp_path, mocker):
+    mocker.patch.object(interface.interface, 'verify_files', return_value = [])
+    asyncio.run(interface.mirror_dir('/home', local_root = str(tmp_path)))
+
+    get = mocker.spy(FakeSFTP, 'get')
+    asyncio.run(interface.mirror_dir('/home', local_root = str(tmp_path)))
+
+    assert get.call_count == 0
+
+
+def test_cmd_reads_exec_channel_output(mocker, tracker):
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: FakeSFTP(tracker))
+    ci = clu.AsyncClusterInterface('host', 'user', 'key')  # no persistent shell by default, like ClusterInterface
+    ci._open_executor()
+
+    assert ci.interface.shell is None
+
+    stdout = io.BytesIO(b'out\n')
+    stdout.channel = mocker.Mock(recv_exit_status = mocker.Mock(return_value = 0))
+    mocker.patch.object(ci.interface.ssh, 'exec_command', return_value = (None, stdout, io.BytesIO(b'')))
+
+    output = asyncio.run(ci.cmd('echo out'))
+
+    assert output.stdout.read() == b'out\n'
+    assert output.exit_status == 0
+    ci._executor.shutdown()
+
+
+def test_not_connected(tracker):
+    ci = clu.AsyncClusterInterface('host', 'user', 'key')
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(ci.cmd('pwd'))
+
+
+def test_walk_bounds_pending_file_operations(interface):
+    active, max_active = 0, 0
+
+    async def on_file(path, _):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(.01)
+        active -= 1
+
+    count = asyncio.run(interface.walk_remote_path('/home', func_on_files = on_file, whitelist_file_ext = ('.txt', '.sim', '.spec'), max_pending = 2))
+
+    assert count == 12
+    assert max_active <= 2
+
+
+def test_walk_propagates_errors(interface):
+    async def on_file(path, _):
+        raise ValueError(path)
+
+    with pytest.raises(ValueError):
+        asyncio.run(interface.walk_remote_path('/home', func_on_files = on_file, whitelist_file_ext = ('.txt',)))
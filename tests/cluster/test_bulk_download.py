@@ -0,0 +1,221 @@
+import io
+import os
+import stat
+import tarfile
+import threading
+
+import pytest
+
+import paramiko
+
+import simulacra as si
+import simulacra.cluster as clu
+
+
+class FakeChannel:
+    def __init__(self, exit_status = 0):
+        self.exit_status = exit_status
+        self.write_shut_down = False
+
+    def shutdown_write(self):
+        self.write_shut_down = True
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+
+class FakeStdin(io.BytesIO):
+    def __init__(self, channel):
+        super().__init__()
+        self.channel = channel
+
+
+class FakeStdout(io.BytesIO):
+    def __init__(self, data, channel):
+        super().__init__(data)
+        self.channel = channel
+
+
+class FakeStderr(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.drained = threading.Event()
+
+    def read(self, *args):
+        self.drained.set()
+        return super().read(*args)
+
+
+class WindowedStdout(FakeStdout):
+    """Like a channel whose window is full of unread stderr: stdout stalls until stderr is read."""
+
+    def __init__(self, data, channel, stderr):
+        super().__init__(data, channel)
+        self.stderr = stderr
+
+    def read(self, *args):
+        if not self.stderr.drained.wait(timeout = 5):
+            raise TimeoutError('stdout stalled because stderr was never read')
+        return super().read(*args)
+
+
+class FakeSSH:
+    def __init__(self, contents, mode = 'w', stderr = b'', exit_status = 0, windowed = False, truncate = False):
+        self.contents = contents
+        self.mode = mode
+        self.stderr = stderr
+        self.exit_status = exit_status
+        self.windowed = windowed
+        self.truncate = truncate
+        self.commands = []
+        self.stdins = []
+
+    def exec_command(self, command):
+        self.commands.append(command)
+
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj = buffer, mode = self.mode) as archive:
+            for remote_path, (data, mtime) in self.contents.items():
+                info = tarfile.TarInfo(remote_path.lstrip('/'))
+                info.size = len(data)
+                info.mtime = mtime
+                archive.addfile(info, io.BytesIO(data))
+
+        data = buffer.getvalue()
+        if self.truncate:
+            data = data[:700]  # partway through the second member
+
+        channel = FakeChannel(self.exit_status)
+        stdin = FakeStdin(channel)
+        self.stdins.append(stdin)
+
+        stderr = FakeStderr(self.stderr)
+        stdout = WindowedStdout(data, channel, stderr) if self.windowed else FakeStdout(data, channel)
+
+        return stdin, stdout, stderr
+
+
+def remote_stat(size, mtime):
+    attr = paramiko.SFTPAttributes()
+    attr.st_mode = stat.S_IFREG
+    attr.st_size = size
+    attr.st_mtime = mtime
+
+    return attr
+
+
+@pytest.fixture(scope = 'function')
+def contents():
+    return {
+        '/home/a/1.sim': (b'first', 1000),
+        '/home/a/b/2.sim': (b'second file', 2000),
+    }
+
+
+@pytest.fixture(scope = 'function')
+def interface(contents):
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ssh = FakeSSH(contents)
+
+    return ci
+
+
+def files(contents):
+    return [(path, remote_stat(len(data), mtime)) for path, (data, mtime) in contents.items()]
+
+
+def test_bulk_download_unpacks_files(interface, contents, tmp_path):
+    downloaded = interface.download_files_in_bulk(files(contents), tmp_path)
+
+    assert [d[0] for d in downloaded] == list(contents)
+    for remote_path, remote_stat, local_path in downloaded:
+        with open(local_path, mode = 'rb') as f:
+            assert f.read() == contents[remote_path][0]
+
+
+def test_bulk_download_sends_file_names(interface, contents, tmp_path):
+    interface.download_files_in_bulk(files(contents), tmp_path)
+
+    stdin = interface.ssh.stdins[0]
+    assert stdin.getvalue() == b'home/a/1.sim\0home/a/b/2.sim\0'
+    assert stdin.channel.write_shut_down
+
+
+def test_bulk_download_preserves_mtimes(interface, contents, tmp_path):
+    downloaded = interface.download_files_in_bulk(files(contents), tmp_path)
+
+    for remote_path, remote_stat, local_path in downloaded:
+        assert interface.is_file_synced(remote_stat, local_path)
+
+
+def test_bulk_download_skips_unrequested_members(interface, contents, tmp_path):
+    requested = files(contents)[:1]
+    downloaded = interface.download_files_in_bulk(requested, tmp_path)
+
+    assert [d[0] for d in downloaded] == ['/home/a/1.sim']
+    assert not os.path.exists(interface.remote_path_to_local_path('/home/a/b/2.sim', tmp_path))
+
+
+def test_bulk_download_with_compression(contents, tmp_path):
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ssh = FakeSSH(contents, mode = 'w:gz')
+
+    downloaded = ci.download_files_in_bulk(files(contents), tmp_path, compression = 'gzip')
+
+    assert len(downloaded) == 2
+    assert ci.ssh.commands == ['tar -C / -czf - --null -T -']
+
+
+def test_bulk_download_with_no_files_does_nothing(interface, tmp_path):
+    assert interface.download_files_in_bulk([], tmp_path) == []
+    assert interface.ssh.commands == []
+
+
+def test_mirror_dir_bulk_only_downloads_out_of_date_files(interface, contents, tmp_path, mocker):
+    synced_local_path = interface.remote_path_to_local_path('/home/a/1.sim', tmp_path)
+    si.utils.ensure_parents_exist(synced_local_path)
+    with open(synced_local_path, mode = 'wb') as f:
+        f.write(b'first')
+    os.utime(synced_local_path, (1000, 1000))
+
+    def walk_remote_path(remote_path, func_on_files, **kwargs):
+        for path, stat in files(contents):
+            func_on_files(path, stat)
+
+    mocker.patch.object(interface, 'walk_remote_path', side_effect = walk_remote_path)
+    get_file = mocker.patch.object(interface, 'get_file')
+    verify_files = mocker.patch.object(interface, 'verify_files')
+
+    interface.mirror_dir('/home', local_root = tmp_path, bulk = True)
+
+    assert interface.ssh.stdins[0].getvalue() == b'home/a/b/2.sim\0'
+    assert get_file.call_count == 0
+    assert [f[0] for f in verify_files.call_args[0][0]] == ['/home/a/b/2.sim']
+
+
+def test_bulk_download_drains_stderr_while_streaming(contents, tmp_path):
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ssh = FakeSSH(contents, stderr = b'tar: warning\n' * 10000, windowed = True)
+
+    downloaded = ci.download_files_in_bulk(files(contents), tmp_path)
+
+    assert len(downloaded) == 2
+
+
+def test_bulk_download_logs_tar_errors(contents, tmp_path, mocker):
+    logger = mocker.patch('simulacra.cluster.interface.logger')
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ssh = FakeSSH(contents, stderr = b'tar: home/a/3.sim: Cannot stat', exit_status = 2)
+
+    downloaded = ci.download_files_in_bulk(files(contents), tmp_path)
+
+    assert len(downloaded) == 2
+    assert 'Cannot stat' in logger.warning.call_args[0][0]
+
+
+def test_bulk_download_raises_if_stream_is_cut_off(contents, tmp_path):
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ssh = FakeSSH(contents, stderr = b'tar: killed', exit_status = 2, truncate = True)
+
+    with pytest.raises(si.exceptions.BulkDownloadFailed, match = 'killed'):
+        ci.download_files_in_bulk(files(contents), tmp_path)
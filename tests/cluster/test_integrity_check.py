@@ -0,0 +1,96 @@
+import hashlib
+import io
+import shlex
+
+import pytest
+
+import simulacra as si
+import simulacra.cluster as clu
+from simulacra.cluster.interface import _parse_hash_line
+
+
+@pytest.mark.parametrize(
+    'line, expected',
+    [
+        ('d41d8cd98f00b204e9800998ecf8427e  /home/a b.txt', ('/home/a b.txt', 'd41d8cd98f00b204e9800998ecf8427e')),
+        ('d41d8cd98f00b204e9800998ecf8427e */home/bin.sim', ('/home/bin.sim', 'd41d8cd98f00b204e9800998ecf8427e')),
+        ('\\d41d8cd98f00b204e9800998ecf8427e  /home/new\\nline\\\\n.txt', ('/home/new\nline\\n.txt', 'd41d8cd98f00b204e9800998ecf8427e')),
+        ('md5sum: /home/missing: No such file or directory', None),
+    ]
+)
+def test_parse_hash_line(line, expected):
+    assert _parse_hash_line(line) == expected
+
+
+@pytest.fixture(scope = 'function')
+def interface(mocker, tmp_path):
+    remote_contents = {f'/home/{n}.txt': f'file {n}'.encode() for n in range(10)}
+
+    ci = clu.ClusterInterface('host', 'user', 'key')
+
+    def cmd(command):
+        paths = shlex.split(command)[2:]
+        lines = [f'{hashlib.md5(remote_contents[p]).hexdigest()}  {p}' for p in paths if p in remote_contents]
+        return clu.CmdOutput(None, io.BytesIO('\n'.join(lines).encode()), io.BytesIO())
+
+    def get_file(remote_path, local_path, **kwargs):
+        with open(local_path, mode = 'wb') as f:
+            f.write(remote_contents[remote_path])
+
+    mocker.patch.object(ci, 'cmd', side_effect = cmd)
+    mocker.patch.object(ci, 'get_file', side_effect = get_file)
+
+    files = []
+    for remote_path, contents in remote_contents.items():
+        local_path = tmp_path / remote_path.split('/')[-1]
+        local_path.write_bytes(contents)
+        files.append((remote_path, None, str(local_path)))
+
+    return ci, files
+
+
+def test_remote_hashes_are_batched(interface):
+    ci, files = interface
+
+    hashes = ci.remote_file_hashes((f[0] for f in files), batch_size = 4)
+
+    assert len(hashes) == 10
+    assert ci.cmd.call_count == 3
+
+
+def test_verify_files_passes_for_matching_files(interface):
+    ci, files = interface
+
+    assert ci.verify_files(files) == []
+    assert ci.cmd.call_count == 1
+    assert ci.get_file.call_count == 0
+
+
+def test_verify_files_redownloads_mismatched_files(interface):
+    ci, files = interface
+
+    remote_path, _, local_path = files[3]
+    with open(local_path, mode = 'wb') as f:
+        f.write(b'corrupted')
+
+    assert ci.verify_files(files) == []
+    assert ci.get_file.call_count == 1
+    assert ci.get_file.call_args[0][0] == remote_path
+
+
+def test_local_hash_is_cached(interface, mocker):
+    ci, files = interface
+    spy = mocker.spy(si.utils, 'get_file_hash')
+
+    ci.verify_files(files)
+    ci.verify_files(files)
+
+    assert spy.call_count == 10
+
+
+def test_get_file_hash(tmp_path):
+    path = tmp_path / 'file'
+    path.write_bytes(b'x' * 10000)
+
+    assert si.utils.get_file_hash(path, chunk_size = 7) == hashlib.md5(b'x' * 10000).hexdigest()
+    assert si.utils.get_file_hash(path, algorithm = 'sha256') == hashlib.sha256(b'x' * 10000).hexdigest()
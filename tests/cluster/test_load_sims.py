@@ -0,0 +1,256 @@
+import mmap
+import os
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+import simulacra.cluster as clu
+
+
+class DummySimulation(si.Simulation):
+    def run(self):
+        self.status = si.Status.RUNNING
+        self.status = si.Status.FINISHED
+
+
+class DummySpecification(si.Specification):
+    simulation_type = DummySimulation
+
+
+@pytest.fixture(scope = 'function')
+def job_dir(tmp_path):
+    inputs = tmp_path / 'inputs'
+    outputs = tmp_path / 'outputs'
+
+    for n in range(6):
+        spec = DummySpecification(f'sim_{n}', file_name = str(n))
+        spec.save(target_dir = inputs)
+
+        sim = spec.to_sim()
+        if n != 3:  # sim 3 is left unfinished
+            sim.run()
+        if n != 5:  # sim 5 is missing
+            sim.save(target_dir = outputs)
+
+    (outputs / '4.sim').write_bytes(b'not a simulation')
+
+    return tmp_path
+
+
+@pytest.mark.parametrize('workers', [None, 1, 2])
+def test_load_sims_finds_finished_sims(job_dir, workers):
+    jp = clu.JobProcessor('job', str(job_dir))
+    jp.load_sims(workers = workers)
+
+    assert jp.unprocessed_sim_names == {'3', '4', '5'}
+    assert sorted(r.file_name for r in jp.data.values() if r is not None) == [0, 1, 2]
+
+
+def test_load_sims_reports_errors_per_sim(job_dir, mocker):
+    logger = mocker.patch('simulacra.cluster.processing.logger')
+
+    jp = clu.JobProcessor('job', str(job_dir))
+    jp.load_sims(workers = 2)
+
+    assert any(isinstance(call[0][0], si.exceptions.UnfinishedSimulation) for call in logger.debug.call_args_list)
+    assert [call[0][0] for call in logger.exception.call_args_list] == ['Exception encountered while processing simulation 4']
+
+
+def test_parallel_load_sims_matches_serial(job_dir):
+    serial = clu.JobProcessor('job', str(job_dir))
+    serial.load_sims()
+
+    parallel = clu.JobProcessor('job', str(job_dir))
+    parallel.load_sims(workers = 2)
+
+    assert [None if r is None else vars(r) for r in parallel.data.values()] == [None if r is None else vars(r) for r in serial.data.values()]
+
+
+def test_load_sims_saves_processor_and_empties_journal(job_dir):
+    jp = clu.JobProcessor('job', str(job_dir))
+    jp.load_sims()
+
+    loaded = clu.JobProcessor.load(job_dir / 'job.job')
+
+    assert loaded.unprocessed_sim_names == {'3', '4', '5'}
+    assert (job_dir / 'job.job.journal').stat().st_size == 0
+
+
+def test_load_sims_without_checkpoints_saves_once(job_dir, mocker):
+    save = mocker.patch.object(clu.JobProcessor, 'save')
+
+    jp = clu.JobProcessor('job', str(job_dir))
+    jp.load_sims(checkpoint_ratio = None)
+
+    assert save.call_count == 1  # only at the end
+
+
+@pytest.fixture(scope = 'function')
+def large_job_dir(tmp_path):
+    for n in range(200):
+        spec = DummySpecification(f'sim_{n}', file_name = str(n))
+        spec.save(target_dir = tmp_path / 'inputs')
+
+        sim = spec.to_sim()
+        sim.run()
+        sim.save(target_dir = tmp_path / 'outputs')
+
+    return tmp_path
+
+
+def test_load_sims_checkpoint_cost_is_amortized(large_job_dir, mocker):
+    saved_sizes = []
+    save = clu.JobProcessor.save
+
+    def record_size(self, **kwargs):
+        path = save(self, **kwargs)
+        saved_sizes.append(os.path.getsize(path))
+        return path
+
+    mocker.patch.object(clu.JobProcessor, 'save', autospec = True, side_effect = record_size)
+
+    jp = clu.JobProcessor('job', str(large_job_dir))
+    jp.save(target_dir = large_job_dir)
+    jp.load_sims(checkpoint_ratio = .5)
+
+    # saves get geometrically further apart, so the total written is a constant multiple of the final size, not quadratic in the number of sims
+    assert len(saved_sizes) < 20
+    assert sum(saved_sizes) < 8 * saved_sizes[-1]
+
+
+def interrupt_load_sims(jp, mocker):
+    mocker.patch.object(clu.JobProcessor, 'save', side_effect = RuntimeError)
+    with pytest.raises(RuntimeError):
+        jp.load_sims(checkpoint_ratio = None)
+    mocker.stopall()
+
+
+def test_journal_of_a_different_processor_is_not_replayed(job_dir, mocker):
+    saved = clu.JobProcessor('job', str(job_dir))
+    saved.save(target_dir = job_dir)
+
+    interrupt_load_sims(clu.JobProcessor('job', str(job_dir)), mocker)  # a different, unsaved run with the same file name
+
+    loaded = clu.JobProcessor.load(job_dir / 'job.job')
+
+    assert loaded.unprocessed_sim_names == set(loaded.sim_names)
+
+
+def test_journal_of_a_different_processor_is_replaced(job_dir, mocker):
+    interrupt_load_sims(clu.JobProcessor('job', str(job_dir)), mocker)  # leaves a journal behind
+
+    jp = clu.JobProcessor('job', str(job_dir))
+    jp.save(target_dir = job_dir)
+    interrupt_load_sims(jp, mocker)
+
+    loaded = clu.JobProcessor.load(job_dir / 'job.job')
+    assert sorted(r.file_name for r in loaded.data.values() if r is not None) == [0, 1, 2]
+
+
+def test_journal_is_replayed_after_interrupted_processing(job_dir, mocker):
+    jp = clu.JobProcessor('job', str(job_dir))
+    jp.save(target_dir = job_dir)
+    interrupt_load_sims(jp, mocker)
+
+    with (job_dir / 'job.job.journal').open(mode = 'ab') as f:
+        f.write(b'\x80\x04incomplete')  # a record that was cut off mid-write
+
+    loaded = clu.JobProcessor.load(job_dir / 'job.job')
+
+    assert loaded.unprocessed_sim_names == {'3', '4', '5'}
+    assert sorted(r.file_name for r in loaded.data.values() if r is not None) == [0, 1, 2]
+
+
+class PathOnlyLoadSimulation(DummySimulation):
+    @classmethod
+    def load(cls, path):
+        return super().load(path)
+
+
+class PathOnlyLoadJobProcessor(clu.JobProcessor):
+    simulation_type = PathOnlyLoadSimulation
+
+
+def test_load_sims_with_load_that_only_takes_a_path(job_dir):
+    jp = PathOnlyLoadJobProcessor('job', str(job_dir))
+    jp.load_sims()
+
+    assert sorted(r.file_name for r in jp.data.values() if r is not None) == [0, 1, 2]
+
+
+def test_mmap_sims(job_dir, mocker):
+    load = mocker.spy(si.Simulation, 'load')
+    mocker.patch.object(clu.JobProcessor, 'mmap_sims', True)
+
+    jp = clu.JobProcessor('job', str(job_dir))
+    jp._load_sim('0')
+
+    assert load.call_args[1]['mmap'] is True
+
+
+class ArraySimulation(si.Simulation):
+    default_mmap_threshold = 1024
+
+    def run(self):
+        self.array = np.arange(10_000, dtype = float)
+        self.status = si.Status.RUNNING
+        self.status = si.Status.FINISHED
+
+
+class ArraySpecification(si.Specification):
+    simulation_type = ArraySimulation
+
+
+def is_memory_mapped(array):
+    while isinstance(array, np.ndarray):
+        array = array.base
+
+    return isinstance(array, memoryview) and isinstance(array.obj, mmap.mmap)
+
+
+class MappedArrayResult(clu.SimulationResult):
+    def __init__(self, sim, job_processor):
+        super().__init__(sim, job_processor)
+        self.array_is_mapped = is_memory_mapped(sim.array)
+
+
+class MappingJobProcessor(clu.JobProcessor):
+    simulation_type = ArraySimulation
+    simulation_result_type = MappedArrayResult
+    mmap_sims = True
+
+
+def test_load_sims_memory_maps_arrays_when_both_sides_opt_in(tmp_path):
+    for n in range(2):
+        spec = ArraySpecification(f'sim_{n}', file_name = str(n))
+        spec.save(target_dir = tmp_path / 'inputs')
+        sim = spec.to_sim()
+        sim.run()
+        sim.save(target_dir = tmp_path / 'outputs')
+
+    jp = MappingJobProcessor('job', str(tmp_path))
+    jp.load_sims()
+
+    assert [r.array_is_mapped for r in jp.data.values()] == [True, True]
+
+
+def test_unfinished_sims_are_detected_without_loading(job_dir, mocker):
+    load = mocker.spy(si.Simulation, 'load')
+
+    jp = clu.JobProcessor('job', str(job_dir))
+    with pytest.raises(si.exceptions.UnfinishedSimulation):
+        jp._load_sim('3')
+
+    assert load.call_count == 0
+
+
+def test_get_sim_metadata(job_dir):
+    jp = clu.JobProcessor('job', str(job_dir))
+    metadata = jp.get_sim_metadata()
+
+    assert list(metadata) == ['0', '1', '2', '3', '4']
+    assert metadata['3']['status'] == si.Status.INITIALIZED
+    assert metadata['0']['status'] == si.Status.FINISHED
+    assert metadata['4'] is None  # not a Simulacra file
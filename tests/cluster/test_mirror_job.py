@@ -0,0 +1,159 @@
+import asyncio
+import os
+import shutil
+
+import pytest
+
+import numpy as np
+
+import paramiko
+
+import simulacra as si
+import simulacra.cluster as clu
+
+
+class DummySimulation(si.Simulation):
+    def run(self):
+        pass
+
+
+class DummySpecification(si.Specification):
+    simulation_type = DummySimulation
+
+
+SHARED = np.linspace(0, 1, 10_000)
+
+
+def make_specification(number, parameters):
+    return DummySpecification(f'spec_{number}', file_name = str(number), mesh = SHARED, **parameters)
+
+
+class LocalSFTP:
+    """Serves a local directory as if it were the remote machine."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def local(self, remote_path):
+        return os.path.join(self.root, remote_path.lstrip('/'))
+
+    def listdir_attr(self, path):
+        out = []
+        for name in sorted(os.listdir(self.local(path))):
+            attr = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(self.local(path), name)))
+            attr.filename = name
+            out.append(attr)
+        return out
+
+    def get(self, remote_path, local_path):
+        shutil.copyfile(self.local(remote_path), local_path)
+
+    def lstat(self, path):
+        return paramiko.SFTPAttributes.from_stat(os.stat(self.local(path)))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope = 'function')
+def remote_root(tmp_path):
+    return tmp_path / 'remote'
+
+
+@pytest.fixture(scope = 'function')
+def interface(mocker, remote_root):
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: LocalSFTP(str(remote_root)))
+
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ftp = LocalSFTP(str(remote_root))
+    mocker.patch.object(ci, 'verify_files', return_value = [])
+
+    return ci
+
+
+def create_job(job_dir, **kwargs):
+    job_dir.mkdir(parents = True, exist_ok = True)
+    parameters = clu.iter_parameters([clu.Parameter('a', [0, 1, 2], expandable = True)])
+    clu.create_specifications(make_specification, parameters, job_dir, **kwargs)
+
+
+def test_mirror_dir_includes_spec_bundle(interface, remote_root, tmp_path):
+    create_job(remote_root / 'job', bundle = True)
+
+    interface.mirror_dir('/job', local_root = str(tmp_path / 'local'))
+
+    local_job = tmp_path / 'local' / 'job'
+    assert (local_job / 'inputs' / clu.SPECIFICATIONS_BUNDLE).exists()
+    assert [clu.load_specification(local_job, n).a for n in range(3)] == [0, 1, 2]
+
+
+@pytest.mark.parametrize('bundle', [False, True])
+def test_mirror_dir_includes_content_store(interface, remote_root, tmp_path, bundle):
+    job_dir = remote_root / 'job'
+    create_job(job_dir, bundle = bundle, store = clu.job_store(job_dir))
+
+    interface.mirror_dir('/job', local_root = str(tmp_path / 'local'))
+
+    local_job = tmp_path / 'local' / 'job'
+    assert len(clu.job_store(local_job)) == 1
+    assert np.all(clu.load_specification(local_job, 2).mesh == SHARED)
+
+
+def local_dir_mtimes(remote_root):
+    def remote_dir_mtimes(remote_dir, **kwargs):
+        return {
+            '/' + os.path.relpath(d, remote_root) if d != str(remote_root) else '/': str(os.stat(d).st_mtime)
+            for d, _, _ in os.walk(os.path.join(str(remote_root), remote_dir.lstrip('/')))
+        }
+
+    return remote_dir_mtimes
+
+
+@pytest.mark.parametrize('bulk', [False, True])
+def test_manifest_forgets_dirs_with_files_that_were_not_mirrored(interface, remote_root, tmp_path, mocker, bulk):
+    create_job(remote_root / 'job', bundle = True)
+    mocker.patch.object(interface, 'remote_dir_mtimes', side_effect = local_dir_mtimes(remote_root))
+    bundle = f'/job/inputs/{clu.SPECIFICATIONS_BUNDLE}'
+    if bulk:  # the bundle is not delivered
+        mocker.patch.object(
+            interface,
+            'download_files_in_bulk',
+            side_effect = lambda files, local_root, **kwargs: [(remote_path, remote_stat, None) for remote_path, remote_stat in files if remote_path != bundle],
+        )
+    else:  # the bundle fails its integrity check
+        interface.verify_files.side_effect = lambda files, **kwargs: [remote_path for remote_path, _, _ in files if remote_path == bundle]
+
+    interface.mirror_dir('/job', local_root = str(tmp_path / 'local'), use_manifest = True, bulk = bulk)
+
+    manifest = clu.MirrorManifest.load(tmp_path / 'local' / '.user@host.manifest.json')
+    assert '/job' in manifest.dirs
+    assert '/job/inputs' not in manifest.dirs
+
+
+def async_mirror(mocker, remote_root, local_root, failed = ()):
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: LocalSFTP(str(remote_root)))
+    ci = clu.AsyncClusterInterface('host', 'user', 'key')
+    ci.interface.ftp = LocalSFTP(str(remote_root))
+    mocker.patch.object(ci.interface, 'verify_files', side_effect = lambda files, **kwargs: [remote_path for remote_path, _, _ in files if remote_path in failed])
+    ci._open_executor()  # instead of connecting
+
+    try:
+        asyncio.run(ci.mirror_dir('/job', local_root = str(local_root)))
+    finally:
+        ci._executor.shutdown()
+
+
+def test_async_mirror_dir_includes_spec_bundle(mocker, remote_root, tmp_path):
+    create_job(remote_root / 'job', bundle = True)
+
+    async_mirror(mocker, remote_root, tmp_path / 'local')
+
+    assert (tmp_path / 'local' / 'job' / 'inputs' / clu.SPECIFICATIONS_BUNDLE).exists()
+
+
+def test_async_mirror_dir_reports_files_that_failed_verification(mocker, remote_root, tmp_path, caplog):
+    create_job(remote_root / 'job', bundle = True)
+
+    async_mirror(mocker, remote_root, tmp_path / 'local', failed = (f'/job/inputs/{clu.SPECIFICATIONS_BUNDLE}',))
+
+    assert '1 files were not mirrored correctly' in caplog.text
@@ -0,0 +1,162 @@
+import io
+import posixpath
+import stat
+
+import pytest
+
+import paramiko
+
+import simulacra as si
+import simulacra.cluster as clu
+
+
+class FakeRemote:
+    def __init__(self):
+        self.tree = {
+            '/home': ['a', 'b', '.hidden', 'logs', 'top.txt'],
+            '/home/a': ['1.sim', '2.sim', 'c'],
+            '/home/a/c': ['3.spec'],
+            '/home/b': ['4.txt'],
+            '/home/.hidden': ['5.txt'],
+            '/home/logs': ['6.txt'],
+        }
+        self.dir_mtimes = {d: 100 for d in self.tree}
+        self.listed = []
+        self.find_commands = []
+
+    def listdir_attr(self, path):
+        self.listed.append(path)
+        out = []
+        for name in self.tree[path]:
+            attr = paramiko.SFTPAttributes()
+            attr.filename = name
+            attr.st_mode = stat.S_IFDIR if posixpath.join(path, name) in self.tree else stat.S_IFREG
+            attr.st_size = 10
+            attr.st_mtime = 1000
+            out.append(attr)
+        return out
+
+    def find(self, command):
+        self.find_commands.append(command)
+        lines = [f'{mtime} {d}' for d, mtime in self.dir_mtimes.items()]
+        return clu.CmdOutput(None, io.BytesIO('\n'.join(lines).encode()), io.BytesIO())
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope = 'function')
+def remote():
+    return FakeRemote()
+
+
+@pytest.fixture(scope = 'function')
+def interface(mocker, remote):
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: remote)
+
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ftp = remote
+    mocker.patch.object(ci, 'cmd', side_effect = remote.find)
+
+    return ci
+
+
+def walk(interface, manifest, workers = 1, include_unchanged = False, whitelist_file_ext = ('.txt', '.sim', '.spec')):
+    files = []
+    interface.walk_remote_path_with_manifest(
+        '/home',
+        manifest,
+        func_on_files = lambda path, remote_stat: files.append((path, remote_stat.st_size, remote_stat.st_mtime)),
+        blacklist_dir_names = ('logs',),
+        whitelist_file_ext = whitelist_file_ext,
+        workers = workers,
+        include_unchanged = include_unchanged,
+    )
+
+    return sorted(files)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_first_walk_lists_all_walkable_dirs(interface, remote, tmp_path, workers):
+    files = walk(interface, clu.MirrorManifest(tmp_path / 'manifest.json'), workers = workers)
+
+    assert sorted(remote.listed) == ['/home', '/home/a', '/home/a/c', '/home/b']
+    assert [f[0] for f in files] == ['/home/a/1.sim', '/home/a/2.sim', '/home/a/c/3.spec', '/home/b/4.txt', '/home/top.txt']
+
+
+def test_second_walk_only_lists_changed_dirs(interface, remote, tmp_path):
+    manifest = clu.MirrorManifest(tmp_path / 'manifest.json')
+    walk(interface, manifest)
+
+    remote.listed.clear()
+    remote.tree['/home/b'].append('7.txt')
+    remote.dir_mtimes['/home/b'] = 200
+    second = walk(interface, manifest)
+
+    assert remote.listed == ['/home/b']
+    assert second == [('/home/b/4.txt', 10, 1000), ('/home/b/7.txt', 10, 1000)]  # files in unchanged dirs are skipped
+
+
+def test_walk_can_include_unchanged_dirs(interface, remote, tmp_path):
+    manifest = clu.MirrorManifest(tmp_path / 'manifest.json')
+    first = walk(interface, manifest)
+
+    remote.listed.clear()
+    remote.tree['/home/b'].append('7.txt')
+    remote.dir_mtimes['/home/b'] = 200
+    second = walk(interface, manifest, include_unchanged = True)
+
+    assert remote.listed == ['/home/b']
+    assert second == sorted(first + [('/home/b/7.txt', 10, 1000)])
+
+
+def test_removed_dirs_are_dropped_from_manifest(interface, remote, tmp_path):
+    manifest = clu.MirrorManifest(tmp_path / 'manifest.json')
+    walk(interface, manifest)
+
+    del remote.tree['/home/a/c']
+    del remote.dir_mtimes['/home/a/c']
+    remote.tree['/home/a'].remove('c')
+    remote.dir_mtimes['/home/a'] = 200
+    files = walk(interface, manifest)
+
+    assert '/home/a/c' not in manifest.dirs
+    assert '/home/a/c/3.spec' not in [f[0] for f in files]
+
+
+def test_find_prunes_hidden_and_blacklisted_dirs(interface, remote, tmp_path):
+    walk(interface, clu.MirrorManifest(tmp_path / 'manifest.json'))
+
+    command, = remote.find_commands
+    assert "\\( -name '.*' -o -name logs \\) -prune" in command
+
+
+def test_changing_the_filter_lists_every_dir_again(interface, remote, tmp_path):
+    manifest = clu.MirrorManifest(tmp_path / 'manifest.json')
+    walk(interface, manifest, whitelist_file_ext = ('.sim',))
+
+    remote.listed.clear()
+    files = walk(interface, manifest)
+
+    assert sorted(remote.listed) == ['/home', '/home/a', '/home/a/c', '/home/b']
+    assert [f[0] for f in files] == ['/home/a/1.sim', '/home/a/2.sim', '/home/a/c/3.spec', '/home/b/4.txt', '/home/top.txt']
+
+
+def test_manifest_roundtrip(interface, tmp_path):
+    manifest = clu.MirrorManifest(tmp_path / 'manifest.json')
+    walk(interface, manifest)
+    manifest.hashes[('local/path', 'md5')] = (10, 1000.0, 'abc')
+    manifest.save()
+
+    loaded = clu.MirrorManifest.load(tmp_path / 'manifest.json')
+
+    assert loaded.dirs == manifest.dirs
+    assert loaded.filter == manifest.filter
+    assert loaded.hashes == manifest.hashes
+
+
+def test_missing_manifest_is_empty(tmp_path):
+    manifest = clu.MirrorManifest.load(tmp_path / 'nope.json')
+
+    assert manifest.dirs == {}
+    assert manifest.hashes == {}
@@ -57,3 +57,78 @@ def test_expandable_parameters_with_iterator():
         {'a': 1, 'b': True},
         {'a': 1, 'b': False},
     ]
+
+
+@pytest.fixture(scope = 'function')
+def sweep():
+    return [
+        clu.Parameter('a', [0, 1, 2], expandable = True),
+        clu.Parameter('fixed', [True, False]),
+        clu.Parameter('b', 'xy', expandable = False),
+        clu.Parameter('c', range(4), expandable = True),
+        clu.Parameter('d', {'p', 'q'}, expandable = True),
+    ]
+
+
+def test_iter_parameters_matches_expand_parameters(sweep):
+    assert list(clu.iter_parameters(sweep)) == clu.expand_parameters(sweep)
+
+
+def test_iter_parameters_len(sweep):
+    assert len(clu.iter_parameters(sweep)) == 3 * 4 * 2
+
+
+def test_iter_parameters_random_access(sweep):
+    combinations = clu.iter_parameters(sweep)
+    expected = list(combinations)
+
+    assert [combinations[i] for i in range(len(combinations))] == expected
+    assert combinations[-1] == expected[-1]
+    assert combinations[3:10:2] == expected[3:10:2]
+
+
+def test_iter_parameters_index_out_of_range(sweep):
+    combinations = clu.iter_parameters(sweep)
+
+    with pytest.raises(IndexError):
+        combinations[len(combinations)]
+
+
+def test_iter_parameters_does_not_copy_values():
+    value = [1, 2, 3]
+    combinations = clu.iter_parameters([clu.Parameter('a', range(2), expandable = True), clu.Parameter('v', value)])
+
+    assert all(d['v'] is value for d in combinations)
+
+
+def test_iter_parameters_with_empty_expandable_parameter():
+    combinations = clu.iter_parameters([clu.Parameter('a', [], expandable = True), clu.Parameter('b', [1, 2], expandable = True)])
+
+    assert len(combinations) == 0
+    assert list(combinations) == []
+
+
+def test_iter_parameters_with_no_expandable_parameters():
+    combinations = clu.iter_parameters([clu.Parameter('a', 1)])
+
+    assert len(combinations) == 1
+    assert combinations[0] == {'a': 1}
+
+
+def test_expand_parameters_copies_values_before_expandable_parameters():
+    value = [1, 2]
+    parameters = [
+        clu.Parameter('v', value),
+        clu.Parameter('a', [0, 1], expandable = True),
+        clu.Parameter('after', value),
+    ]
+
+    d = clu.expand_parameters(parameters)
+
+    assert d[0]['v'] == d[1]['v'] == value
+    assert d[0]['v'] is not d[1]['v']
+    assert d[0]['v'] is not value
+
+    d[0]['v'].append(3)
+    assert d[1]['v'] == [1, 2]
+    assert value == [1, 2]
@@ -0,0 +1,158 @@
+import os
+import subprocess
+
+import pytest
+
+import simulacra as si
+import simulacra.cluster as clu
+
+
+class LocalChannel:
+    """Stands in for a paramiko Channel by running the command in a local process."""
+
+    def __init__(self, home):
+        self.home = home
+        self.closed = False
+        self.process = None
+
+    def set_combine_stderr(self, combine):
+        pass
+
+    def settimeout(self, timeout):
+        pass
+
+    def exec_command(self, command):
+        self.process = subprocess.Popen(
+            command,
+            shell = True,
+            stdin = subprocess.PIPE,
+            stdout = subprocess.PIPE,
+            stderr = subprocess.STDOUT,
+            env = {'HOME': str(self.home), 'PATH': os.environ['PATH']},
+            cwd = str(self.home),
+        )
+
+    def sendall(self, data):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def recv(self, n):
+        return os.read(self.process.stdout.fileno(), n)
+
+    def close(self):
+        self.closed = True
+        self.process.kill()
+        self.process.wait()
+
+
+class LocalSSH:
+    def __init__(self, home):
+        self.home = home
+        self.channels = []
+
+    def get_transport(self):
+        return self
+
+    def open_session(self):
+        channel = LocalChannel(self.home)
+        self.channels.append(channel)
+        return channel
+
+
+@pytest.fixture(scope = 'function')
+def ssh(tmp_path):
+    (tmp_path / '.profile').write_text('echo noisy profile\nexport FROM_PROFILE=yes\n')
+    return LocalSSH(tmp_path)
+
+
+@pytest.fixture(scope = 'function')
+def shell(ssh):
+    shell = clu.RemoteShell(ssh, chunk_size = 7)  # small chunks exercise sentinels split across reads
+    yield shell
+    shell.close()
+
+
+def test_run_returns_stdout_stderr_and_status(shell):
+    output = shell.run('echo out; echo err >&2; exit 3')
+
+    assert output.stdout.read() == b'out\n'
+    assert output.stderr.read() == b'err\n'
+    assert output.exit_status == 3
+
+
+def test_profile_is_run_once_and_its_output_discarded(shell, ssh):
+    first = shell.run('echo $FROM_PROFILE')
+    second = shell.run('pwd')
+
+    assert first.stdout.read() == b'yes\n'
+    assert second.stdout.read().decode().strip() == str(ssh.home)
+    assert len(ssh.channels) == 1
+
+
+def test_output_without_trailing_newline(shell):
+    assert shell.run('printf abc').stdout.read() == b'abc'
+
+
+def test_commands_do_not_leak_state(shell):
+    shell.run('cd /; export LEAK=1')
+
+    assert shell.run('echo "$LEAK"').stdout.read() == b'\n'
+
+
+def test_command_cannot_read_the_command_stream(shell):
+    output = shell.run('cat')
+
+    assert output.stdout.read() == b''
+    assert shell.run('echo still here').stdout.read() == b'still here\n'
+
+
+def test_syntax_error_does_not_break_shell(shell):
+    output = shell.run('echo "unbalanced')
+
+    assert output.exit_status != 0
+    assert len(output.stderr.read()) > 0
+    assert shell.run('echo ok').stdout.read() == b'ok\n'
+
+
+def test_run_batch_demultiplexes_outputs(shell):
+    outputs = shell.run_batch([f'echo {n}; echo e{n} >&2' for n in range(20)])
+
+    assert [o.stdout.read() for o in outputs] == [f'{n}\n'.encode() for n in range(20)]
+    assert [o.stderr.read() for o in outputs] == [f'e{n}\n'.encode() for n in range(20)]
+
+
+def test_large_output(shell):
+    output = shell.run('head -c 300000 /dev/zero')
+
+    assert output.stdout.read() == bytes(300000)
+
+
+def test_shell_is_reopened_after_it_dies(shell, ssh):
+    with pytest.raises(si.exceptions.RemoteShellClosed):
+        shell.run('kill -9 $$')
+
+    assert shell.run('echo back').stdout.read() == b'back\n'
+    assert len(ssh.channels) == 2
+
+
+def test_cluster_interface_uses_persistent_shell(ssh):
+    ci = clu.ClusterInterface('host', 'user', 'key', persistent_shell = True)
+    ci.ssh = ci.shell.ssh = ssh
+
+    assert ci.remote_home_dir == str(ssh.home)
+    assert [o.stdout.read() for o in ci.cmd_batch(['echo a', 'echo b'])] == [b'a\n', b'b\n']
+    assert len(ssh.channels) == 1
+
+    ci.shell.close()
+
+
+def test_cluster_interface_runs_fresh_shells_by_default(mocker):
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    stdout = mocker.Mock()
+    exec_command = mocker.patch.object(ci.ssh, 'exec_command', return_value = (None, stdout, None))
+
+    output = ci.cmd('pwd')
+
+    assert ci.shell is None
+    assert output.stdout is stdout  # paramiko's own channel file, as before
+    assert exec_command.call_args[0][0] == '. ~/.profile;. ~/.bash_profile;pwd'
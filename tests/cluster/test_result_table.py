@@ -0,0 +1,219 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+import simulacra.cluster as clu
+
+T0 = datetime.datetime(2017, 1, 1)
+
+
+def fake_sim(number):
+    return SimpleNamespace(
+        name = f'sim_{number}',
+        file_name = str(number),
+        init_time = T0 + datetime.timedelta(minutes = number),
+        start_time = T0 + datetime.timedelta(minutes = number + 1),
+        end_time = T0 + datetime.timedelta(minutes = number + 10),
+        elapsed_time = datetime.timedelta(minutes = 10),
+        running_time = datetime.timedelta(minutes = number),
+    )
+
+
+class FakeJobProcessor:
+    plots_dir = 'plots'
+
+
+def make_result(number):
+    return clu.SimulationResult(fake_sim(number), FakeJobProcessor())
+
+
+@pytest.fixture(scope = 'function')
+def table():
+    names = [str(n) for n in range(5)]
+    table = clu.SimulationResultTable(names)
+
+    for n in (0, 2, 3):
+        table[str(n)] = make_result(n)
+
+    return table
+
+
+def test_unprocessed_rows_are_none(table):
+    assert table['1'] is None
+    assert table['4'] is None
+
+
+def test_roundtrip_result(table):
+    result = table['2']
+    expected = make_result(2)
+
+    assert isinstance(result, clu.SimulationResult)
+    assert vars(result) == vars(expected)
+    assert isinstance(result.init_time, datetime.datetime)
+    assert isinstance(result.file_name, int)
+
+
+def test_columns_are_typed(table):
+    assert table.column('init_time').dtype.kind == 'M'
+    assert table.column('running_time').dtype == np.float64
+    assert table.column('file_name').dtype == np.int64
+
+
+def test_column_only_includes_processed_rows(table):
+    assert list(table.column('file_name')) == [0, 2, 3]
+
+
+def test_mask_and_select(table):
+    selected = table.select(table.mask(file_name = 2))
+
+    assert [r.file_name for r in selected] == [2]
+
+
+def test_mask_on_object_column(table):
+    selected = table.select(table.mask(name = 'sim_3'))
+
+    assert [r.file_name for r in selected] == [3]
+
+
+def test_none_values_roundtrip():
+    table = clu.SimulationResultTable(['0', '1'])
+
+    a = make_result(0)
+    a.start_time = None
+    table['0'] = a
+    table['1'] = make_result(1)
+
+    assert table['0'].start_time is None
+    assert table['1'].start_time == make_result(1).start_time
+
+
+def test_incompatible_value_upcasts_column():
+    table = clu.SimulationResultTable(['0', '1'])
+
+    table['0'] = make_result(0)
+    b = make_result(1)
+    b.running_time = 'not a number'
+    table['1'] = b
+
+    assert table['0'].running_time == 0.0
+    assert table['1'].running_time == 'not a number'
+
+
+def test_mapping_interface(table):
+    assert list(table) == ['0', '1', '2', '3', '4']
+    assert len(table) == 5
+    assert sum(r is not None for r in table.values()) == 3
+
+
+@pytest.fixture(scope = 'function')
+def job_processors(tmp_path):
+    inputs = tmp_path / 'inputs'
+    inputs.mkdir()
+    for n in range(5):
+        (inputs / f'{n}.spec').touch()
+
+    class ColumnarJobProcessor(clu.JobProcessor):
+        columnar_data = True
+
+    jps = clu.JobProcessor('job', str(tmp_path)), ColumnarJobProcessor('job', str(tmp_path))
+    for jp in jps:
+        for n in (0, 2, 3):
+            jp.data[str(n)] = make_result(n)
+
+    return jps
+
+
+def test_columnar_job_processor_uses_table(job_processors):
+    default, columnar = job_processors
+
+    assert isinstance(default.data, dict)
+    assert isinstance(columnar.data, clu.SimulationResultTable)
+
+
+def test_columnar_summaries_match_default(job_processors):
+    default, columnar = job_processors
+
+    assert columnar.running_time == default.running_time
+    assert columnar.elapsed_time == default.elapsed_time
+    assert isinstance(columnar.elapsed_time, datetime.timedelta)
+
+
+def test_columnar_select_by_kwargs_matches_default(job_processors):
+    default, columnar = job_processors
+
+    assert [vars(r) for r in columnar.select_by_kwargs(file_name = 3)] == [vars(r) for r in default.select_by_kwargs(file_name = 3)]
+
+
+def test_columnar_diagnostics_file_matches_default(job_processors, tmp_path):
+    default, columnar = job_processors
+
+    default.write_time_diagnostics_to_file()
+    default_text = (tmp_path / 'job_diagnostics.txt').read_text()
+    columnar.write_time_diagnostics_to_file()
+    columnar_text = (tmp_path / 'job_diagnostics.txt').read_text()
+
+    assert columnar_text == default_text
+
+
+def test_attribute_that_is_always_none_still_roundtrips():
+    table = clu.SimulationResultTable(['0'])
+
+    a = make_result(0)
+    a.start_time = None
+    table['0'] = a
+
+    assert table['0'].start_time is None
+
+
+def test_attribute_that_is_always_none_can_be_selected(job_processors):
+    default, columnar = job_processors
+    for jp in job_processors:
+        for n in (0, 2, 3):
+            result = make_result(n)
+            result.extra = None
+            jp.data[str(n)] = result
+
+    assert [vars(r) for r in columnar.select_by_kwargs(extra = None)] == [vars(r) for r in default.select_by_kwargs(extra = None)]
+    assert len(columnar.select_by_kwargs(extra = None)) == 3
+    assert columnar.data.column('extra').tolist() == [None, None, None]
+    assert columnar.parameter_set('extra') == {None}
+
+
+def test_attribute_that_was_none_gets_typed_column():
+    table = clu.SimulationResultTable(['0', '1'])
+
+    a = make_result(0)
+    a.start_time = None
+    table['0'] = a
+    table['1'] = make_result(1)
+
+    assert table.column('start_time').dtype.kind == 'M'
+    assert table['0'].start_time is None
+    assert table['1'].start_time == make_result(1).start_time
+
+
+def test_columnar_parameter_set_matches_default_when_values_are_missing(job_processors):
+    default, columnar = job_processors
+    for jp in job_processors:
+        result = make_result(4)
+        result.file_name = None
+        result.running_time = None
+        jp.data['4'] = result
+
+    for attr in ('file_name', 'running_time'):
+        assert columnar.parameter_set(attr) == default.parameter_set(attr)
+    assert columnar.parameter_set('file_name') == {0, 2, 3, None}
+
+
+def test_mask_on_object_column_holding_arrays():
+    table = clu.SimulationResultTable(['0', '1', '2'])
+    for n in range(3):
+        result = make_result(n)
+        result.mesh = np.arange(n + 1)
+        table[str(n)] = result
+
+    assert [r.file_name for r in table.select(table.mask(mesh = np.arange(2)))] == [1]
@@ -0,0 +1,160 @@
+import pytest
+
+import numpy as np
+
+import simulacra as si
+import simulacra.cluster as clu
+
+
+class DummySimulation(si.Simulation):
+    def run(self):
+        pass
+
+
+class DummySpecification(si.Specification):
+    simulation_type = DummySimulation
+
+
+def make_specification(number, parameters):
+    return DummySpecification(f'spec_{number}', file_name = str(number), **parameters)
+
+
+@pytest.fixture(scope = 'function')
+def parameters():
+    return clu.iter_parameters([
+        clu.Parameter('a', [0, 1, 2], expandable = True),
+        clu.Parameter('b', ['x', 'y'], expandable = True),
+    ])
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_save_specifications(tmp_path, parameters, workers):
+    specs = [make_specification(n, p) for n, p in enumerate(parameters)]
+
+    clu.save_specifications(specs, tmp_path, workers = workers)
+
+    assert sorted(p.name for p in (tmp_path / 'inputs').iterdir()) == sorted(f'{n}.spec' for n in range(6))
+    assert DummySpecification.load(tmp_path / 'inputs' / '4.spec').b == 'x'
+
+
+def test_write_specifications_info_to_file_is_unchanged(tmp_path, parameters):
+    specs = [make_specification(n, p) for n, p in enumerate(parameters)]
+
+    path = clu.write_specifications_info_to_file(iter(specs), tmp_path)
+
+    assert path.read_text(encoding = 'utf-8') == '\n'.join(str(spec.info()) for spec in specs)
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_create_specifications(tmp_path, parameters, workers):
+    count = clu.create_specifications(make_specification, parameters, tmp_path, workers = workers, chunksize = 2)
+
+    specs = [DummySpecification.load(tmp_path / 'inputs' / f'{n}.spec') for n in range(6)]
+
+    assert count == 6
+    assert [(spec.a, spec.b) for spec in specs] == [(p['a'], p['b']) for p in parameters]
+    assert (tmp_path / 'specifications.txt').read_text(encoding = 'utf-8') == '\n'.join(str(spec.info()) for spec in specs)
+
+
+def test_create_specifications_from_generator(tmp_path):
+    count = clu.create_specifications(make_specification, ({'a': n} for n in range(3)), tmp_path)
+
+    assert count == 3
+    assert len(list((tmp_path / 'inputs').iterdir())) == 3
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_save_specifications_to_bundle(tmp_path, parameters, workers):
+    specs = [make_specification(n, p) for n, p in enumerate(parameters)]
+
+    clu.save_specifications(specs, tmp_path, workers = workers, bundle = True)
+
+    assert [p.name for p in (tmp_path / 'inputs').iterdir()] == [clu.SPECIFICATIONS_BUNDLE]
+    for spec in specs:
+        assert clu.load_specification(tmp_path, spec.file_name) == spec
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_create_specifications_to_bundle(tmp_path, parameters, workers):
+    clu.create_specifications(make_specification, parameters, tmp_path, workers = workers, bundle = True)
+
+    specs = [clu.load_specification(tmp_path, n) for n in range(6)]
+
+    assert [(spec.a, spec.b) for spec in specs] == [(p['a'], p['b']) for p in parameters]
+    assert (tmp_path / 'specifications.txt').read_text(encoding = 'utf-8') == '\n'.join(str(spec.info()) for spec in specs)
+
+
+@pytest.mark.parametrize('bundle', [False, True])
+def test_job_processor_reads_specs(tmp_path, parameters, bundle):
+    specs = [make_specification(n, p) for n, p in enumerate(parameters)]
+    clu.save_specifications(specs, tmp_path, bundle = bundle)
+
+    jp = clu.JobProcessor('job', str(tmp_path))
+
+    assert jp.sim_names == [str(n) for n in range(6)]
+    assert jp.load_spec(3) == specs[3]
+
+
+SHARED = np.linspace(0, 1, 100000)
+
+
+def make_specification_with_shared_array(number, parameters):
+    return DummySpecification(f'spec_{number}', file_name = str(number), mesh = SHARED, **parameters)
+
+
+@pytest.mark.parametrize('bundle', [False, True])
+@pytest.mark.parametrize('workers', [None, 2])
+def test_create_specifications_with_store(tmp_path, parameters, bundle, workers):
+    clu.create_specifications(
+        make_specification_with_shared_array,
+        parameters,
+        tmp_path,
+        workers = workers,
+        bundle = bundle,
+        store = clu.job_store(tmp_path),
+    )
+
+    assert len(clu.job_store(tmp_path)) == 1
+
+    specs = [clu.load_specification(tmp_path, n) for n in range(6)]
+    assert np.all(specs[0].mesh == SHARED)
+    assert all(spec.mesh is specs[0].mesh for spec in specs)
+
+    jp = clu.JobProcessor('job', str(tmp_path))
+    assert jp.sim_names == [str(n) for n in range(6)]
+
+
+def test_saving_specifications_does_not_hash_their_contents(tmp_path, parameters, mocker):
+    content_hash = mocker.spy(DummySpecification, 'content_hash')
+
+    clu.create_specifications(make_specification, parameters, tmp_path)
+
+    assert content_hash.call_count == 0
+
+
+@pytest.mark.parametrize('create', [False, True])
+def test_specifications_are_not_read_far_ahead_of_writing(tmp_path, mocker, create):
+    produced = []
+
+    def combinations():
+        for n in range(100):
+            produced.append(n)
+            yield {'a': n}
+
+    ahead = []
+    add_bytes = si.bundles.BeetBundleWriter.add_bytes
+
+    def record_and_add_bytes(writer, name, data):
+        ahead.append(len(produced) - len(ahead))
+        return add_bytes(writer, name, data)
+
+    mocker.patch.object(si.bundles.BeetBundleWriter, 'add_bytes', autospec = True, side_effect = record_and_add_bytes)
+
+    if create:
+        clu.create_specifications(make_specification, combinations(), tmp_path, workers = 2, chunksize = 2, bundle = True)
+    else:
+        (tmp_path / 'inputs').mkdir()
+        clu.save_specifications((make_specification(n, p) for n, p in enumerate(combinations())), tmp_path, workers = 2, chunksize = 2, bundle = True)
+
+    assert len(ahead) == 100
+    assert max(ahead) <= 12  # a few chunks per worker, not the whole input
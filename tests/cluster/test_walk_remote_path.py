@@ -0,0 +1,127 @@
+import posixpath
+import stat
+import time
+
+import pytest
+
+import paramiko
+
+import simulacra as si
+import simulacra.cluster as clu
+
+TREE = {
+    '/home': ['a', 'b', '.hidden', 'logs', 'top.txt'],
+    '/home/a': ['1.sim', '2.sim', 'ignored.bin', 'c'],
+    '/home/a/c': ['3.spec'],
+    '/home/b': ['4.txt'],
+    '/home/.hidden': ['5.txt'],
+    '/home/logs': ['6.txt'],
+}
+
+
+class FakeSFTP:
+    def listdir_attr(self, path):
+        out = []
+        for name in TREE[path]:
+            attr = paramiko.SFTPAttributes()
+            attr.filename = name
+            attr.st_mode = stat.S_IFDIR if posixpath.join(path, name) in TREE else stat.S_IFREG
+            attr.st_size = 10
+            attr.st_mtime = 1000
+            out.append(attr)
+        return out
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope = 'function')
+def interface(mocker):
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: FakeSFTP())
+
+    ci = clu.ClusterInterface('host', 'user', 'key')
+    ci.ftp = FakeSFTP()
+
+    return ci
+
+
+def walk(interface, workers):
+    dirs, files = [], []
+    count = interface.walk_remote_path(
+        '/home',
+        func_on_dirs = lambda path, _: dirs.append(path),
+        func_on_files = lambda path, _: files.append(path),
+        blacklist_dir_names = ('logs',),
+        whitelist_file_ext = ('.txt', '.sim', '.spec'),
+        workers = workers,
+    )
+
+    return count, sorted(dirs), sorted(files)
+
+
+def test_serial_walk(interface):
+    count, dirs, files = walk(interface, workers = 1)
+
+    assert count == 11
+    assert dirs == ['/home/a', '/home/a/c', '/home/b']
+    assert files == ['/home/a/1.sim', '/home/a/2.sim', '/home/a/c/3.spec', '/home/b/4.txt', '/home/top.txt']
+
+
+@pytest.mark.parametrize('workers', [2, 8])
+def test_concurrent_walk_matches_serial(interface, workers):
+    assert walk(interface, workers = workers) == walk(interface, workers = 1)
+
+
+def test_concurrent_walk_uses_thread_local_sftp_channels(interface, mocker):
+    opened = []
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: opened.append(FakeSFTP()) or opened[-1])
+
+    walk(interface, workers = 3)
+
+    assert 1 <= len(opened) <= 3
+
+
+def test_concurrent_walk_propagates_errors(interface):
+    def fail(path, _):
+        raise ValueError(path)
+
+    with pytest.raises(ValueError):
+        interface.walk_remote_path('/home', func_on_files = fail, whitelist_file_ext = ('.txt',), workers = 2)
+
+
+class WideSFTP:
+    """A root with many directories, each with a few files."""
+
+    def __init__(self, listed):
+        self.listed = listed
+
+    def listdir_attr(self, path):
+        out = []
+        for n in range(100 if path == '/home' else 5):
+            attr = paramiko.SFTPAttributes()
+            attr.filename = str(n) if path == '/home' else f'{n}.txt'
+            attr.st_mode = stat.S_IFDIR if path == '/home' else stat.S_IFREG
+            out.append(attr)
+        self.listed.append((path, len(out)))
+        return out
+
+    def close(self):
+        pass
+
+
+def test_concurrent_walk_bounds_pending_files(interface, mocker):
+    listed = []
+    mocker.patch.object(paramiko.SFTPClient, 'from_transport', side_effect = lambda *args: WideSFTP(listed))
+
+    done = []
+    backlog = []
+
+    def slow(path, _):
+        time.sleep(.001)
+        done.append(path)
+        backlog.append(sum(count for path, count in listed if path != '/home') - len(done))
+
+    interface.walk_remote_path('/home', func_on_files = slow, whitelist_file_ext = ('.txt',), workers = 2, max_pending = 4)
+
+    assert len(done) == 500
+    assert max(backlog) < 100  # not every file in the tree
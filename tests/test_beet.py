@@ -1,3 +1,11 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import numpy as np
+
 import simulacra as si
 
 
@@ -33,3 +41,87 @@ def test_cloned_beet_not_equal():
     c = b.clone()
 
     assert c != b
+
+
+class HashedSpecification(si.Specification):
+    pass
+
+
+def test_content_hash_ignores_identity():
+    a = HashedSpecification('a', x = 1, mesh = np.linspace(0, 1, 10), potential = si.summables.Sum(si.summables.Summand()))
+    b = HashedSpecification('b', file_name = 'other', x = 1, mesh = np.linspace(0, 1, 10), potential = si.summables.Sum(si.summables.Summand()))
+
+    assert a.content_hash() == b.content_hash()
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    [
+        dict(x = 2),
+        dict(x = 1.0),
+        dict(x = 1, mesh = np.linspace(0, 1, 11)),
+        dict(x = 1, extra = None),
+    ],
+)
+def test_content_hash_depends_on_contents(kwargs):
+    base = HashedSpecification('a', x = 1, mesh = np.linspace(0, 1, 10))
+    kwargs.setdefault('mesh', np.linspace(0, 1, 10))
+
+    assert HashedSpecification('a', **kwargs).content_hash() != base.content_hash()
+
+
+def test_content_hash_is_stable_across_processes():
+    spec = HashedSpecification('a', x = 'text', mesh = np.arange(5))
+
+    code = (
+        'import numpy as np, simulacra as si\n'
+        'class HashedSpecification(si.Specification): pass\n'
+        'HashedSpecification.__module__ = "tests.test_beet"\n'
+        'print(HashedSpecification("a", x = "text", mesh = np.arange(5)).content_hash())'
+    )
+    output = subprocess.run([sys.executable, '-c', code], stdout = subprocess.PIPE, check = True)
+
+    assert output.stdout.decode().strip() == spec.content_hash()
+
+
+def make_scaled(k):
+    return lambda t: t * k
+
+
+SCALE = 2
+
+
+def scaled_by_global(t):
+    return t * SCALE
+
+
+@pytest.mark.parametrize(
+    'a, b',
+    [
+        (make_scaled(1), make_scaled(2)),
+        (lambda t: t * 2, lambda t: t * 3),
+        (lambda t: np.sin(t), lambda t: np.cos(t)),
+        (lambda t: (lambda x: x + 1)(t), lambda t: (lambda x: x + 2)(t)),
+    ],
+)
+def test_content_hash_depends_on_function_contents(a, b):
+    assert HashedSpecification('a', f = a).content_hash() != HashedSpecification('a', f = b).content_hash()
+
+
+def test_content_hash_depends_on_globals_used_by_functions():
+    global SCALE
+
+    before = HashedSpecification('a', f = scaled_by_global).content_hash()
+    SCALE = 3
+    try:
+        after = HashedSpecification('a', f = scaled_by_global).content_hash()
+    finally:
+        SCALE = 2
+
+    assert before != after
+
+
+def test_content_hash_is_none_for_undigestable_contents():
+    lock = threading.Lock()
+
+    assert HashedSpecification('a', f = lambda: lock).content_hash() is None
@@ -0,0 +1,79 @@
+import pytest
+
+import numpy as np
+
+import simulacra as si
+from simulacra import bundles
+
+
+@pytest.fixture(scope = 'function')
+def beets():
+    out = []
+    for n in range(5):
+        b = si.Beet(f'beet_{n}', file_name = str(n))
+        b.array = np.arange(n * 1000, dtype = float)
+        out.append(b)
+
+    return out
+
+
+@pytest.fixture(scope = 'function')
+def bundle_path(tmp_path, beets):
+    return bundles.write_bundle(tmp_path / 'beets.bundle', beets, mmap_threshold = 1000)
+
+
+def test_random_access(bundle_path, beets):
+    with bundles.BeetBundle(bundle_path) as bundle:
+        for n in (3, 0, 4):
+            loaded = bundle[n]
+            assert loaded == beets[n]
+            assert np.all(loaded.array == beets[n].array)
+
+
+def test_mapping_interface(bundle_path):
+    with bundles.BeetBundle(bundle_path) as bundle:
+        assert list(bundle) == ['0', '1', '2', '3', '4']
+        assert len(bundle) == 5
+        assert 2 in bundle
+        assert '7' not in bundle
+
+
+def test_mmap_from_bundle(bundle_path, beets):
+    with bundles.BeetBundle(bundle_path, mmap = True) as bundle:
+        assert np.all(bundle[4].array == beets[4].array)
+
+
+def test_read_bytes_matches_dump(bundle_path, beets, tmp_path):
+    with bundles.BeetBundle(bundle_path) as bundle:
+        data = bundle.read_bytes(2)
+
+    path = tmp_path / 'beet_2.beet'
+    path.write_bytes(data)
+
+    assert si.Beet.load(path) == beets[2]
+
+
+def test_load_metadata(bundle_path):
+    with bundles.BeetBundle(bundle_path) as bundle:
+        assert bundle.load_metadata(1)['name'] == 'beet_1'
+
+
+def test_duplicate_names_are_rejected(tmp_path, beets):
+    with pytest.raises(ValueError):
+        bundles.write_bundle(tmp_path / 'beets.bundle', [beets[0], beets[0]])
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_empty_bundle(tmp_path):
+    path = bundles.write_bundle(tmp_path / 'empty.bundle', [])
+
+    with bundles.BeetBundle(path) as bundle:
+        assert len(bundle) == 0
+
+
+def test_not_a_bundle(tmp_path, beets):
+    path = beets[0].save(target_dir = tmp_path)
+
+    with pytest.raises(ValueError):
+        bundles.BeetBundle(path)
@@ -0,0 +1,96 @@
+import pickle
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+from simulacra import serialization
+
+
+@pytest.fixture(scope = 'function')
+def store(tmp_path):
+    return serialization.ContentStore(tmp_path / 'store', threshold = 1000)
+
+
+@pytest.fixture(scope = 'function')
+def shared():
+    return np.linspace(0, 1, 10000)
+
+
+def make_beets(shared, n = 3):
+    beets = []
+    for i in range(n):
+        b = si.Beet(f'beet_{i}', file_name = str(i))
+        b.shared = shared
+        b.own = np.full(5000, i, dtype = float)
+        b.small = np.arange(10)
+        beets.append(b)
+
+    return beets
+
+
+def test_shared_values_are_stored_once(tmp_path, store, shared):
+    paths = [b.save(target_dir = tmp_path / 'beets', store = store) for b in make_beets(shared)]
+
+    assert len(store) == 4  # the shared array, and each Beet's own array
+
+    without_store = si.Beet('beet', file_name = 'plain')
+    without_store.shared = shared
+    plain_size = without_store.save(target_dir = tmp_path).stat().st_size
+    assert all(path.stat().st_size < plain_size / 5 for path in paths)
+
+
+def test_load_resolves_and_shares_values(tmp_path, store, shared):
+    beets = make_beets(shared)
+    paths = [b.save(target_dir = tmp_path, store = store) for b in beets]
+
+    loaded = [si.Beet.load(path, store = store) for path in paths]
+
+    assert loaded == beets
+    assert np.all(loaded[0].shared == shared)
+    assert all(b.shared is loaded[0].shared for b in loaded)
+    assert [b.own[0] for b in loaded] == [0, 1, 2]
+    assert not loaded[0].shared.flags.writeable
+    assert loaded[0].small.flags.writeable  # below the threshold, so stored inline
+
+
+def test_equal_content_has_equal_keys(store, shared):
+    assert store.key(shared) == store.key(shared.copy())
+    assert store.key(shared) != store.key(shared.astype(np.float32))
+    assert store.key(shared) != store.key(shared.reshape(100, 100))
+    assert store.key(shared.reshape(100, 100).T) == store.key(np.ascontiguousarray(shared.reshape(100, 100).T))
+
+
+def test_load_without_store_fails_clearly(tmp_path, store, shared):
+    path = make_beets(shared)[0].save(target_dir = tmp_path, store = store)
+
+    with pytest.raises(pickle.UnpicklingError, match = 'ContentStore'):
+        si.Beet.load(path)
+
+
+def test_other_types_are_stored_if_large(tmp_path, shared):
+    store = serialization.ContentStore(tmp_path / 'store', threshold = 1000, types = (dict,))
+
+    b = si.Beet('beet')
+    b.table = {n: str(n) for n in range(1000)}
+    b.tiny = {'a': 1}
+    loaded = si.Beet.load(b.save(target_dir = tmp_path, store = store), store = store)
+
+    assert len(store) == 1
+    assert loaded.table == b.table
+    assert loaded.tiny == b.tiny
+
+
+def test_store_is_picklable_without_its_cache(tmp_path, store, shared):
+    path = make_beets(shared)[0].save(target_dir = tmp_path, store = store)
+    si.Beet.load(path, store = store)
+
+    unpickled = pickle.loads(pickle.dumps(store))
+
+    assert unpickled.path == store.path
+    assert unpickled._cache == {}
+
+
+def test_get_store_is_shared(tmp_path):
+    assert serialization.get_store(tmp_path / 'store') is serialization.get_store(str(tmp_path / 'store'))
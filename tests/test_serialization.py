@@ -0,0 +1,165 @@
+import gzip
+import pickle
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+from simulacra import serialization
+
+AVAILABLE_CODECS = [name for name in serialization.CODECS if serialization.codec_available(name)]
+
+
+@pytest.fixture(scope = 'function')
+def beet():
+    b = si.Beet('beet')
+    b.array = np.linspace(0, 1, 10000)
+    b.small = [1, 2, 3]
+
+    return b
+
+
+@pytest.mark.parametrize('codec', AVAILABLE_CODECS)
+def test_save_and_load_with_codec(tmp_path, beet, codec):
+    path = beet.save(target_dir = tmp_path, codec = codec)
+    loaded = si.Beet.load(path)
+
+    assert loaded == beet
+    assert np.all(loaded.array == beet.array)
+    assert loaded.small == beet.small
+
+
+def test_loaded_arrays_are_writeable(tmp_path, beet):
+    path = beet.save(target_dir = tmp_path)
+    loaded = si.Beet.load(path)
+
+    loaded.array[0] = 5
+
+    assert loaded.array[0] == 5
+
+
+@pytest.mark.parametrize('codec', ['none', 'gzip'])
+def test_codec_is_recorded_in_header(tmp_path, beet, codec):
+    path = beet.save(target_dir = tmp_path, codec = codec)
+
+    with open(path, mode = 'rb') as f:
+        header = serialization.read_header(f)
+
+    assert header['codec'] == codec
+
+
+def test_uncompressed_save_uses_no_codec(tmp_path, beet):
+    path = beet.save(target_dir = tmp_path, compressed = False)
+
+    with open(path, mode = 'rb') as f:
+        assert serialization.read_header(f)['codec'] == 'none'
+
+
+def test_codec_instance_with_level(tmp_path, beet):
+    path = beet.save(target_dir = tmp_path, codec = serialization.GzipCodec(level = 1))
+
+    assert si.Beet.load(path) == beet
+
+
+class UncompressedBeet(si.Beet):
+    default_codec = 'none'
+
+
+def test_default_codec_class_attribute(tmp_path):
+    path = UncompressedBeet('beet').save(target_dir = tmp_path)
+
+    with open(path, mode = 'rb') as f:
+        assert serialization.read_header(f)['codec'] == 'none'
+
+
+def test_unknown_codec_raises(tmp_path, beet):
+    with pytest.raises(KeyError):
+        beet.save(target_dir = tmp_path, codec = 'not_a_codec')
+
+
+@pytest.mark.parametrize('op', [open, gzip.open])
+def test_load_legacy_files(tmp_path, beet, op):
+    path = tmp_path / 'legacy.beet'
+    with op(path, mode = 'wb') as f:
+        pickle.dump(beet, f, protocol = -1)
+
+    assert si.Beet.load(path) == beet
+
+
+@pytest.mark.parametrize('codec', ['none', 'gzip'])
+def test_mmap_load(tmp_path, beet, codec):
+    path = beet.save(target_dir = tmp_path, codec = codec, mmap_threshold = 1024)
+    loaded = si.Beet.load(path, mmap = True)
+
+    assert np.all(loaded.array == beet.array)
+    assert loaded.small == beet.small
+
+
+def test_mmapped_arrays_are_backed_by_the_file(tmp_path, beet):
+    path = beet.save(target_dir = tmp_path, mmap_threshold = 1024)
+    loaded = si.Beet.load(path, mmap = True)
+
+    assert not loaded.array.flags.owndata
+    assert loaded.array.flags.writeable
+
+
+def test_mmapped_arrays_are_copy_on_write(tmp_path, beet):
+    path = beet.save(target_dir = tmp_path, mmap_threshold = 1024)
+    loaded = si.Beet.load(path, mmap = True)
+
+    loaded.array[0] = 5
+    reloaded = si.Beet.load(path, mmap = True)
+
+    assert loaded.array[0] == 5
+    assert reloaded.array[0] == beet.array[0]
+
+
+def test_small_buffers_stay_compressed(tmp_path, beet):
+    beet.array = np.zeros(100000)  # very compressible
+
+    compressed_path = beet.save(target_dir = tmp_path / 'compressed', mmap_threshold = 10 ** 9)
+    raw_path = beet.save(target_dir = tmp_path / 'raw', mmap_threshold = 1024)
+
+    assert si.utils.get_file_size(compressed_path) < si.utils.get_file_size(raw_path)
+
+
+class ArraySimulation(si.Simulation):
+    def run(self):
+        pass
+
+
+class ArraySpecification(si.Specification):
+    simulation_type = ArraySimulation
+
+
+def test_simulations_compress_large_arrays_by_default(tmp_path):
+    sim = ArraySpecification('sim').to_sim()
+    sim.big = np.zeros(2 ** 18)  # very compressible, so only stored at full size if it is stored raw
+
+    path = sim.save(target_dir = tmp_path)
+
+    assert si.utils.get_file_size(path) < sim.big.nbytes
+
+
+def test_default_mmap_threshold(tmp_path, mocker):
+    mocker.patch.object(ArraySimulation, 'default_mmap_threshold', 1024)
+    sim = ArraySpecification('sim').to_sim()
+    sim.big = np.zeros(2 ** 18)
+
+    raw_path = sim.save(target_dir = tmp_path / 'raw')
+    compressed_path = sim.save(target_dir = tmp_path / 'compressed', mmap_threshold = None)
+    loaded = ArraySimulation.load(raw_path, mmap = True)
+
+    assert si.utils.get_file_size(raw_path) > sim.big.nbytes
+    assert si.utils.get_file_size(compressed_path) < sim.big.nbytes
+    assert np.all(loaded.big == sim.big)
+
+
+def test_unknown_format_version_raises(tmp_path, beet):
+    path = beet.save(target_dir = tmp_path)
+    data = path.read_bytes().replace(b'"version": 2', b'"version": 9', 1)
+    path.write_bytes(data)
+
+    with pytest.raises(ValueError):
+        si.Beet.load(path)
@@ -0,0 +1,67 @@
+import datetime
+import gzip
+import pickle
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+
+
+class DummySimulation(si.Simulation):
+    def run(self):
+        self.status = si.Status.RUNNING
+        self.status = si.Status.FINISHED
+
+
+class DummySpecification(si.Specification):
+    simulation_type = DummySimulation
+
+
+@pytest.fixture(scope = 'function')
+def sim():
+    spec = DummySpecification('dummy', a = 1, b = 'foo', mesh = np.linspace(0, 1, 10000))
+    return spec.to_sim()
+
+
+def test_metadata_of_unfinished_sim(tmp_path, sim):
+    path = sim.save(target_dir = tmp_path)
+    metadata = DummySimulation.load_metadata(path)
+
+    assert metadata['status'] == si.Status.INITIALIZED
+    assert metadata['uuid'] == sim.uuid
+    assert metadata['name'] == sim.name
+    assert metadata['file_name'] == sim.file_name
+    assert metadata['init_time'] == sim.init_time
+    assert metadata['end_time'] is None
+
+
+def test_metadata_of_finished_sim(tmp_path, sim):
+    sim.run()
+    path = sim.save(target_dir = tmp_path)
+    metadata = DummySimulation.load_metadata(path)
+
+    assert metadata['status'] == si.Status.FINISHED
+    assert metadata['end_time'] == sim.end_time
+    assert metadata['running_time'] == sim.running_time
+    assert isinstance(metadata['running_time'], datetime.timedelta)
+
+
+def test_metadata_includes_spec_extra_attributes(tmp_path, sim):
+    path = sim.save(target_dir = tmp_path)
+    extra = DummySimulation.load_metadata(path)['spec_extra_attributes']
+
+    assert extra['a'] == 1
+    assert extra['b'] == 'foo'
+    assert isinstance(extra['mesh'], str)  # not JSON-able, so stored as a repr
+    assert len(extra['mesh']) <= si.sims.METADATA_REPR_LENGTH
+
+
+def test_metadata_is_none_for_legacy_files(tmp_path, sim):
+    path = tmp_path / 'legacy.sim'
+    with gzip.open(path, mode = 'wb') as f:
+        pickle.dump(sim, f, protocol = -1)
+
+    assert DummySimulation.load_metadata(path) is None
+    assert DummySimulation.load(path) == sim
@@ -0,0 +1,151 @@
+import gc
+import time
+import weakref
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+
+
+@pytest.fixture(scope = 'function')
+def func(mocker):
+    return mocker.MagicMock(side_effect = lambda *args, **kwargs: len(args) + len(kwargs))
+
+
+def test_without_arguments(func):
+    memoized = si.utils.bounded_memoize(func)
+
+    memoized(1)
+    memoized(1)
+
+    assert func.call_count == 1
+    assert memoized.cache_info().hits == 1
+
+
+def test_lru_eviction(func):
+    memoized = si.utils.bounded_memoize(maxsize = 2)(func)
+
+    memoized(1)
+    memoized(2)
+    memoized(1)  # now 2 is the least recently used
+    memoized(3)
+    memoized(1)
+    memoized(2)
+
+    assert func.call_count == 4
+    info = memoized.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.entries) == (2, 4, 2, 2)
+
+
+def test_lfu_eviction(func):
+    memoized = si.utils.bounded_memoize(maxsize = 2, policy = 'lfu')(func)
+
+    for _ in range(3):
+        memoized(1)
+    memoized(2)
+    memoized(3)  # evicts 2, which has been used less than 1
+    memoized(1)
+
+    assert func.call_count == 3
+
+
+def test_ttl_expiration(func):
+    memoized = si.utils.bounded_memoize(ttl = .05)(func)
+
+    memoized(1)
+    memoized(1)
+    time.sleep(.1)
+    memoized(1)
+
+    assert func.call_count == 2
+    assert memoized.cache_info().expirations == 1
+
+
+def test_maxbytes():
+    memoized = si.utils.bounded_memoize(maxsize = None, maxbytes = 20000)(lambda n: np.zeros(n))
+
+    memoized(1000)
+    memoized(1001)
+    memoized(1002)
+    memoized(10 ** 6)  # too big to cache at all
+
+    info = memoized.cache_info()
+    assert info.entries == 2
+    assert info.bytes <= 20000
+
+
+def test_keys_use_equality_not_hash(func):
+    class Colliding:
+        def __init__(self, value):
+            self.value = value
+
+        def __hash__(self):
+            return 0
+
+        def __eq__(self, other):
+            return self.value == other.value
+
+    memoized = si.utils.bounded_memoize(lambda x: x.value)
+
+    assert [memoized(Colliding(n)) for n in range(3)] == [0, 1, 2]
+
+
+def test_array_and_unhashable_arguments(func):
+    memoized = si.utils.bounded_memoize(func)
+
+    memoized(np.arange(3), key = [1, {'a': 2}])
+    memoized(np.arange(3), key = [1, {'a': 2}])
+    memoized(np.arange(3).astype(float), key = [1, {'a': 2}])
+    memoized(np.arange(3).reshape(3, 1), key = [1, {'a': 2}])
+
+    assert func.call_count == 3
+
+
+def test_methods_have_per_instance_caches_that_do_not_leak(mocker):
+    calls = mocker.MagicMock()
+
+    class Foo:
+        @si.utils.bounded_memoize(maxsize = 1)
+        def method(self, x):
+            calls(x)
+            return x
+
+    a, b = Foo(), Foo()
+    a.method(1)
+    b.method(2)
+    a.method(1)
+    b.method(2)
+
+    assert calls.call_count == 2
+    assert a.method.cache_info().hits == 1
+    assert Foo.method.cache_info().entries == 2
+
+    ref = weakref.ref(a)
+    del a
+    gc.collect()
+
+    assert ref() is None
+    assert Foo.method.cache_info().entries == 1
+
+
+def test_cache_clear(func):
+    memoized = si.utils.bounded_memoize(func)
+
+    memoized(1)
+    memoized.cache_clear()
+    memoized(1)
+
+    assert func.call_count == 2
+
+
+def test_by_identity(func):
+    memoized = si.utils.bounded_memoize(by_identity = True)(func)
+
+    a = np.zeros(10)
+    memoized(a)
+    memoized(a)
+    memoized(a.copy())
+
+    assert func.call_count == 2
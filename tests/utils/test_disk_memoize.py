@@ -0,0 +1,153 @@
+import multiprocessing
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+
+
+def square(x):
+    return x ** 2
+
+
+def square_in_worker(directory_and_x):
+    directory, x = directory_and_x
+    memoized = si.utils.disk_memoize(directory)(square)
+    return memoized(x), memoized.cache_info().hits
+
+
+@pytest.fixture(scope = 'function')
+def func(mocker):
+    return mocker.MagicMock(side_effect = lambda x, **kwargs: np.full(1000, np.sum(x)))
+
+
+def memoize_mock(func, directory, **kwargs):
+    func.__module__ = __name__
+    func.__qualname__ = 'mock'
+    return si.utils.disk_memoize(directory, version = 1, **kwargs)(func)
+
+
+def test_results_survive_between_memoizers(tmp_path, func):
+    first = memoize_mock(func, tmp_path)
+    first(2)
+
+    second = memoize_mock(func, tmp_path)  # like a new session
+    result = second(2)
+
+    assert func.call_count == 1
+    assert np.all(result == 2)
+    assert second.cache_info().hits == 1
+
+
+def test_keys_are_stable_and_distinguish_arguments(tmp_path, func):
+    memoized = memoize_mock(func, tmp_path)
+
+    memoized(np.arange(6).reshape(2, 3), a = 1, b = 'x')
+    memoized(np.arange(6).reshape(2, 3), b = 'x', a = 1)
+    memoized(np.arange(6).reshape(3, 2), a = 1, b = 'x')
+    memoized(np.arange(6).reshape(2, 3), a = 1.0, b = 'x')
+
+    assert func.call_count == 3
+
+
+def test_version_separates_results(tmp_path, func):
+    memoize_mock(func, tmp_path)(1)
+    si.utils.disk_memoize(tmp_path, version = 2)(func)(1)
+
+    assert func.call_count == 2
+
+
+def test_default_version_is_the_source(tmp_path):
+    memoized = si.utils.disk_memoize(tmp_path)(square)
+
+    assert memoized(3) == 9
+    assert memoized.directory.name == si.utils.disk_memoize(tmp_path)(square).directory.name
+
+
+def test_lru_eviction_by_size(tmp_path, func):
+    memoized = memoize_mock(func, tmp_path, maxbytes = 20000, codec = 'none')
+
+    for x in range(5):
+        memoized(x)
+
+    info = memoized.cache_info()
+    assert info.bytes <= 20000
+    assert info.entries == 2
+    assert memoized.evictions == 3
+
+
+def test_corrupt_results_are_recomputed(tmp_path, func):
+    memoized = memoize_mock(func, tmp_path)
+    memoized(1)
+    path, = (p for p, _ in memoized._entries())
+    path.write_bytes(b'garbage')
+
+    assert np.all(memoized(1) == 1)
+    assert func.call_count == 2
+
+
+def test_shared_between_processes(tmp_path):
+    with multiprocessing.Pool(processes = 2) as pool:
+        first = pool.map(square_in_worker, [(tmp_path, x) for x in range(4)])
+        second = pool.map(square_in_worker, [(tmp_path, x) for x in range(4)])
+
+    assert [r for r, _ in first] == [r for r, _ in second] == [0, 1, 4, 9]
+    assert all(hits == 0 for _, hits in first)
+    assert all(hits == 1 for _, hits in second)
+
+
+def make_scaled(k):
+    return lambda t: t * k
+
+
+def apply(f, x):
+    return f(x)
+
+
+def test_closures_with_different_captured_values_are_different_keys(tmp_path):
+    memoized = si.utils.disk_memoize(tmp_path)(apply)
+
+    assert memoized(make_scaled(2), 3) == 6
+    assert memoized(make_scaled(5), 3) == 15
+    assert memoized(make_scaled(2), 3) == 6
+    assert memoized.cache_info().hits == 1
+
+
+def make_memoized_scaled(directory, k):
+    @si.utils.disk_memoize(directory)
+    def scaled(x):
+        return k * x
+
+    return scaled
+
+
+def test_memoized_closures_with_different_captured_values_have_different_versions(tmp_path):
+    assert make_memoized_scaled(tmp_path, 2)(3) == 6
+    assert make_memoized_scaled(tmp_path, 5)(3) == 15
+    assert make_memoized_scaled(tmp_path, 2).cache_info().entries == 1
+
+
+def test_cache_is_only_scanned_when_it_might_be_too_big(tmp_path, func, mocker):
+    memoized = memoize_mock(func, tmp_path, maxbytes = 2 ** 30)
+    entries = mocker.spy(memoized, '_entries')
+
+    for x in range(5):
+        memoized(x)
+
+    assert entries.call_count == 1
+
+
+def test_methods_are_keyed_by_instance_contents(tmp_path):
+    class Scaler:
+        def __init__(self, k):
+            self.k = k
+
+        @si.utils.disk_memoize(tmp_path)
+        def scale(self, x):
+            return self.k * x
+
+    assert Scaler(2).scale(3) == 6
+    assert Scaler(5).scale(3) == 15
+    assert Scaler(2).scale(3) == 6
+    assert Scaler(2).scale.cache_info().hits == 1
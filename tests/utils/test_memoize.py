@@ -1,5 +1,7 @@
 import pytest
 
+import numpy as np
+
 import simulacra as si
 
 
@@ -70,3 +72,47 @@ def test_cached_property(mocker):
     assert f.prop == 'foo'  # call again
     assert func.call_count == 2
     assert 'prop' in f.__dict__
+
+
+def test_memoize_multidimensional_array_arguments(memoized_mock):
+    func, memoized_func = memoized_mock
+
+    memoized_func(np.ones((3, 4)))
+    memoized_func(np.ones((3, 4)))
+    memoized_func(np.ones((4, 3)))
+    memoized_func(np.ones((3, 4), dtype = int))
+    memoized_func(x = np.ones((3, 4)))
+    memoized_func(x = np.ones((3, 4)))
+
+    assert func.call_count == 4
+
+
+def test_equal_arrays_hash_equally_regardless_of_layout():
+    a = np.arange(20.).reshape(4, 5)
+
+    assert si.utils.hash_args_kwargs(a.T) == si.utils.hash_args_kwargs(np.ascontiguousarray(a.T))
+    assert si.utils.hash_args_kwargs(a[:, ::2]) == si.utils.hash_args_kwargs(a[:, ::2].copy())
+    assert si.utils.array_digest(a) != si.utils.array_digest(a.ravel())
+
+
+def test_array_digest_of_unbufferable_dtypes():
+    dates = np.array(['2020-01-01', '2020-01-02'], dtype = 'datetime64[D]')
+
+    assert si.utils.array_digest(dates) == si.utils.array_digest(dates.copy())
+    assert si.utils.array_digest(np.array([1, 'a'], dtype = object)) == si.utils.array_digest(np.array([1, 'a'], dtype = object))
+
+
+def test_memoize_by_identity(mocker):
+    func = mocker.MagicMock()
+    memoized_func = si.utils.memoize(by_identity = True)(func)
+
+    a = np.zeros(10)
+    memoized_func(a)
+    memoized_func(a)
+    memoized_func(a.copy())  # equal, but a different array
+
+    a[0] = 1
+    si.utils.mark_array_modified(a)
+    memoized_func(a)
+
+    assert func.call_count == 3
@@ -0,0 +1,210 @@
+import os
+import sys
+
+import pytest
+
+import numpy as np
+
+import simulacra as si
+
+
+def square(x):
+    return x ** 2
+
+
+def pid(_):
+    return os.getpid()
+
+
+@pytest.fixture(scope = 'function', autouse = True)
+def shutdown():
+    yield
+    si.utils.shutdown_pools()
+
+
+def test_multi_map():
+    assert si.utils.multi_map(square, range(10), processes = 2) == tuple(x ** 2 for x in range(10))
+
+
+def test_multi_map_with_progress():
+    assert si.utils.multi_map(square, range(10), processes = 2, progress = True) == tuple(x ** 2 for x in range(10))
+
+
+def test_persistent_pool_is_reused_between_calls():
+    first = set(si.utils.multi_map(pid, range(20), processes = 2, chunksize = 1, persistent = True))
+    second = set(si.utils.multi_map(pid, range(20), processes = 2, chunksize = 1, persistent = True))
+
+    assert len(first | second) <= 2
+    assert os.getpid() not in first
+
+
+def test_default_pool_is_not_reused():
+    first = set(si.utils.multi_map(pid, range(4), processes = 2, chunksize = 1))
+    second = set(si.utils.multi_map(pid, range(4), processes = 2, chunksize = 1))
+
+    assert first.isdisjoint(second)
+
+
+@pytest.fixture(scope = 'function')
+def late_main_function():
+    """A function defined in __main__ after the persistent pool started, like one defined later in a notebook."""
+    si.utils.get_pool(2)
+
+    main = sys.modules['__main__']
+
+    def late(x):
+        return x + 1
+
+    late.__module__ = '__main__'
+    late.__qualname__ = late.__name__ = 'simulacra_test_late_function'
+    setattr(main, late.__name__, late)
+
+    yield late
+
+    delattr(main, late.__name__)
+
+
+def test_default_pool_sees_functions_defined_later_in_main(late_main_function):
+    assert si.utils.multi_map(late_main_function, range(3), processes = 2) == (1, 2, 3)
+    assert si.utils.run_in_process(late_main_function, args = (1,)) == 2
+
+
+@pytest.mark.parametrize('progress', [False, True])
+def test_persistent_pool_reports_functions_it_cannot_see(late_main_function, progress):
+    with pytest.raises(si.exceptions.StalePool):
+        si.utils.multi_map(late_main_function, range(3), processes = 2, persistent = True, progress = progress)
+
+    si.utils.shutdown_pools()
+    assert si.utils.multi_map(late_main_function, range(3), processes = 2, persistent = True) == (1, 2, 3)
+
+
+def test_shutdown_starts_a_new_pool():
+    first = si.utils.get_pool(2)
+    si.utils.shutdown_pools()
+
+    assert si.utils.get_pool(2) is not first
+
+
+def test_run_in_process():
+    assert si.utils.run_in_process(square, args = (3,)) == 9
+    assert si.utils.run_in_process(pid, args = (None,)) != os.getpid()
+
+
+def test_run_in_process_uses_a_fresh_process():
+    assert si.utils.run_in_process(pid, args = (None,)) != si.utils.run_in_process(pid, args = (None,))
+
+
+def test_run_in_process_can_reuse_the_persistent_pool():
+    first = si.utils.run_in_process(pid, args = (None,), persistent = True)
+
+    assert first != os.getpid()
+    assert si.utils.run_in_process(pid, args = (None,), persistent = True) == first
+    assert si.utils.run_in_process(square, kwargs = {'x': 3}, persistent = True) == 9
+
+
+@pytest.fixture(scope = 'function')
+def pool_of_one():
+    return si.utils.get_pool(1)
+
+
+def test_run_in_process_reports_functions_the_persistent_pool_cannot_see(pool_of_one, late_main_function):  # the pool starts before the function is defined
+    with pytest.raises(si.exceptions.StalePool):
+        si.utils.run_in_process(late_main_function, args = (1,), persistent = True)
+
+
+def test_multi_map_with_progress_rejects_unknown_kwargs():
+    with pytest.raises(TypeError):
+        si.utils.multi_map(square, range(10), processes = 2, progress = True, nonsense = 1)
+
+
+def test_multi_imap_unordered_streams_generators():
+    outputs = si.utils.multi_imap(square, (x for x in range(10)), processes = 2)
+
+    assert sorted(outputs) == [x ** 2 for x in range(10)]
+
+
+def test_multi_imap_ordered():
+    assert list(si.utils.multi_imap(square, range(10), processes = 2, ordered = True)) == [x ** 2 for x in range(10)]
+
+
+@pytest.mark.parametrize(
+    'targets, processes, expected',
+    [
+        (range(100), 4, 7),
+        (range(3), 4, 1),
+        (iter(range(100)), 4, 1),
+    ],
+)
+def test_chunksize(targets, processes, expected):
+    assert si.utils.processes._chunksize(targets, processes) == expected
+
+
+def total(array):
+    return array.sum()
+
+
+def write_attempt(array):
+    try:
+        array[0] = 1
+        return True
+    except ValueError:
+        return False
+
+
+def row_squares(row):
+    return row ** 2
+
+
+def test_shared_memory_inputs():
+    mesh = np.arange(1000.).reshape(10, 100)
+
+    outputs = si.utils.multi_map(total, [mesh[i] for i in range(10)], processes = 2, shared_memory = True)
+
+    assert outputs == tuple(mesh.sum(axis = 1))
+
+
+def test_shared_memory_views_with_strides():
+    mesh = np.arange(1000.).reshape(10, 100)
+    targets = [mesh[:, i] for i in range(0, 100, 7)] + [mesh.T[::-1], mesh[::2, ::3]]
+
+    outputs = si.utils.multi_map(total, targets, processes = 2, shared_memory = True)
+
+    assert outputs == tuple(t.sum() for t in targets)
+
+
+def test_shared_memory_inputs_are_read_only():
+    assert si.utils.multi_map(write_attempt, [np.zeros(3)], processes = 2, shared_memory = True) == (False,)
+
+
+def test_shared_memory_tuple_targets():
+    a = np.ones(5)
+
+    assert si.utils.multi_map(sum_pair, [(a, 1), (a, 2)], processes = 2, shared_memory = True) == (6, 7)
+
+
+def sum_pair(pair):
+    array, n = pair
+    return array.sum() + n
+
+
+@pytest.mark.parametrize('persistent', [False, True])
+def test_shared_output(persistent):
+    mesh = np.arange(1000.).reshape(10, 100)
+
+    output = si.utils.multi_map(row_squares, [mesh[i] for i in range(10)], processes = 2, output_shape = (100,), persistent = persistent)
+
+    assert output.shape == (10, 100)
+    assert np.all(output == mesh ** 2)
+
+
+def test_share_array_handle():
+    with si.utils.share_array(np.arange(10)) as shared:
+        assert si.utils.multi_map(total_of_handle, [shared], processes = 2) == (45,)
+
+
+def total_of_handle(shared):
+    shm, array = shared.attach()
+    t = array.sum()
+    del array
+    shm.close()
+    return t
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+import simulacra as si
+
+
+class BatchSimulation(si.Simulation):
+    def run(self, marker = None):
+        self.status = si.Status.RUNNING
+
+        if self.spec.behavior == 'sleep':
+            time.sleep(10)
+        elif self.spec.behavior == 'raise':
+            raise ValueError('bad physics')
+        elif self.spec.behavior == 'crash_once' and not os.path.exists(self.spec.marker):
+            open(self.spec.marker, 'w').close()
+            os._exit(1)
+
+        self.marker = marker
+        self.status = si.Status.FINISHED
+
+
+class BatchSpecification(si.Specification):
+    simulation_type = BatchSimulation
+
+    def __init__(self, name, behavior = 'ok', **kwargs):
+        super().__init__(name, **kwargs)
+        self.behavior = behavior
+
+
+def test_runs_and_saves_all_specs(tmp_path):
+    specs = [BatchSpecification(f'spec_{n}', file_name = str(n), n = n) for n in range(4)]
+
+    report = si.utils.run_batch_from_simlib(specs, tmp_path, processes = 2, progress = False, marker = 'hello')
+
+    assert sorted(report.finished) == ['0', '1', '2', '3']
+    assert report.failed == {}
+    for n in range(4):
+        sim = si.Simulation.load(tmp_path / f'{n}.sim')
+        assert sim.status == si.Status.FINISHED
+        assert sim.marker == 'hello'
+
+
+def test_skips_finished(tmp_path):
+    specs = [BatchSpecification(f'spec_{n}', file_name = str(n), n = n) for n in range(3)]
+    si.utils.run_batch_from_simlib(specs[:2], tmp_path, processes = 2, progress = False)
+
+    report = si.utils.run_batch_from_simlib(specs, tmp_path, processes = 2, progress = False)
+
+    assert report.skipped == ['0', '1']
+    assert report.finished == ['2']
+
+
+def test_failures_are_retried_and_reported(tmp_path):
+    specs = [
+        BatchSpecification('raise', behavior = 'raise'),
+        BatchSpecification('crash', behavior = 'crash_once', marker = str(tmp_path / 'crashed')),
+    ]
+
+    report = si.utils.run_batch_from_simlib(specs, tmp_path / 'simlib', processes = 2, retries = 1, progress = False)
+
+    assert report.finished == ['crash']
+    assert list(report.failed) == ['raise']
+    assert 'bad physics' in report.failed['raise']
+    assert report.retries == 2
+
+
+def test_timeout(tmp_path):
+    specs = [BatchSpecification('sleep', behavior = 'sleep'), BatchSpecification('ok')]
+
+    start = time.monotonic()
+    report = si.utils.run_batch_from_simlib(specs, tmp_path, processes = 2, timeout = .5, retries = 0, progress = False)
+
+    assert time.monotonic() - start < 5
+    assert report.finished == ['ok']
+    assert 'timed out' in report.failed['sleep']
@@ -0,0 +1,249 @@
+import pytest
+
+import simulacra as si
+
+
+class IndexedSimulation(si.Simulation):
+    def run(self):
+        self.status = si.Status.RUNNING
+        self.status = si.Status.FINISHED
+
+
+class IndexedSpecification(si.Specification):
+    simulation_type = IndexedSimulation
+
+
+@pytest.fixture(scope = 'function')
+def specs():
+    return [IndexedSpecification(f'spec_{n}', file_name = str(n), n = n) for n in range(3)]
+
+
+def test_no_index_by_default(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        si.utils.SimlibIndex(tmp_path)
+
+    assert si.utils.SimlibIndex.find(tmp_path) is None
+
+
+def test_create_rebuilds_from_existing_sims(tmp_path, specs):
+    sims = [spec.to_sim() for spec in specs]
+    sims[1].run()
+    for sim in sims:
+        sim.save(target_dir = tmp_path)
+
+    index = si.utils.SimlibIndex(tmp_path, create = True)
+
+    assert len(index) == 3
+    assert index.finished() == {'1'}
+    assert index.get('0').uuid == str(sims[0].uuid)
+    assert index.get('0').path == tmp_path / '0.sim'
+
+
+def test_save_keeps_index_in_sync(tmp_path, specs):
+    index = si.utils.SimlibIndex(tmp_path, create = True)
+
+    sim = specs[0].to_sim()
+    sim.save(target_dir = tmp_path)
+    assert index.get('0').status == 'initialized'
+
+    sim.run()
+    sim.save(target_dir = tmp_path)
+    assert index.get('0').status == 'finished'
+    assert index.get('1') is None
+
+
+def test_spec_hash_is_computed_once_per_sim(tmp_path, specs, mocker):
+    si.utils.SimlibIndex(tmp_path, create = True)
+    content_hash = mocker.spy(IndexedSpecification, 'content_hash')
+
+    sim = specs[0].to_sim()
+    for _ in range(3):
+        sim.save(target_dir = tmp_path)
+
+    assert content_hash.call_count == 1
+
+    loaded = si.Simulation.load(tmp_path / '0.sim')
+    assert '_spec_hash' not in loaded.__dict__
+    assert loaded.spec_hash == sim.spec_hash
+
+
+def test_index_is_opened_once_for_repeated_saves(tmp_path, specs, mocker):
+    si.utils.SimlibIndex(tmp_path, create = True)
+    migrate = mocker.spy(si.utils.SimlibIndex, '_migrate')
+
+    sim = specs[0].to_sim()
+    for _ in range(3):
+        sim.save(target_dir = tmp_path)
+
+    assert migrate.call_count == 1
+    assert si.utils.SimlibIndex.find(tmp_path) is si.utils.SimlibIndex.find(tmp_path)
+
+
+def test_spec_hash_follows_replaced_spec(specs):
+    sim = specs[0].to_sim()
+    first = sim.spec_hash
+
+    sim.spec = specs[1]
+
+    assert sim.spec_hash == specs[1].content_hash() != first
+
+
+def test_find_or_init_uses_index(tmp_path, specs, mocker):
+    si.utils.SimlibIndex(tmp_path, create = True)
+    si.utils.run_from_simlib(specs[0], simlib = tmp_path)
+
+    load = mocker.spy(si.Simulation, 'load')
+    unfinished = si.utils.find_or_init_sim_from_spec(specs[1], search_dir = tmp_path)
+    finished = si.utils.find_or_init_sim_from_spec(specs[0], search_dir = tmp_path)
+
+    assert unfinished.status == si.Status.INITIALIZED
+    assert finished.status == si.Status.FINISHED
+    assert load.call_count == 1  # only for the sim that is in the index
+
+
+def test_find_or_init_recovers_from_removed_file(tmp_path, specs):
+    index = si.utils.SimlibIndex(tmp_path, create = True)
+    si.utils.run_from_simlib(specs[0], simlib = tmp_path)
+    (tmp_path / '0.sim').unlink()
+
+    sim = si.utils.find_or_init_sim_from_spec(specs[0], search_dir = tmp_path)
+
+    assert sim.status == si.Status.INITIALIZED
+    assert index.get('0') is None
+
+
+def test_find_or_init_loads_sims_missing_from_index(tmp_path, specs, mocker):
+    index = si.utils.SimlibIndex(tmp_path / 'simlib', create = True)
+    si.utils.run_from_simlib(specs[0], simlib = tmp_path / 'elsewhere')
+    (tmp_path / 'elsewhere' / '0.sim').replace(tmp_path / 'simlib' / '0.sim')  # copied in after the index was built
+
+    run = mocker.spy(IndexedSimulation, 'run')
+    sim = si.utils.run_from_simlib(specs[0], simlib = tmp_path / 'simlib')
+
+    assert sim.status == si.Status.FINISHED
+    assert run.call_count == 0
+    assert index.get('0').status == 'finished'
+
+
+def test_batch_runner_uses_index(tmp_path, specs, mocker):
+    si.utils.run_batch_from_simlib(specs[:2], tmp_path, processes = 2, progress = False)
+
+    assert si.utils.SimlibIndex(tmp_path).finished() == {'0', '1'}
+
+    load_metadata = mocker.spy(si.Simulation, 'load_metadata')
+    report = si.utils.run_batch_from_simlib(specs, tmp_path, processes = 2, progress = False)
+
+    assert report.skipped == ['0', '1']
+    assert report.finished == ['2']
+    assert load_metadata.call_count == 0
+
+
+def test_reuses_finished_sim_with_same_contents(tmp_path, specs, mocker):
+    si.utils.SimlibIndex(tmp_path, create = True)
+    original = si.utils.run_from_simlib(specs[0], simlib = tmp_path)
+
+    renamed = IndexedSpecification('renamed', n = 0)
+    run = mocker.spy(IndexedSimulation, 'run')
+    sim = si.utils.run_from_simlib(renamed, simlib = tmp_path, match_contents = True)
+
+    assert run.call_count == 0
+    assert sim.status == si.Status.FINISHED
+    assert sim.spec is renamed
+    assert sim.file_name == 'renamed'
+    assert sim.uuid != original.uuid
+    assert si.utils.SimlibIndex(tmp_path).get('renamed').spec_hash == renamed.content_hash()
+
+
+def test_reuses_finished_sim_with_custom_file_extension(tmp_path, specs, mocker):
+    si.utils.SimlibIndex(tmp_path, create = True)
+    si.utils.run_from_simlib(specs[0], simlib = tmp_path, file_extension = 'custom')
+
+    renamed = IndexedSpecification('renamed', n = 0)
+    run = mocker.spy(IndexedSimulation, 'run')
+    si.utils.run_from_simlib(renamed, simlib = tmp_path, match_contents = True, file_extension = 'custom')
+
+    assert run.call_count == 0
+    assert sorted(path.name for path in tmp_path.glob('*.custom')) == ['0.custom', 'renamed.custom']
+    assert not list(tmp_path.glob('*.sim'))
+    assert si.utils.SimlibIndex(tmp_path).get('renamed', 'custom').spec_hash == renamed.content_hash()
+
+
+def test_batch_runner_uses_file_extension(tmp_path, specs):
+    report = si.utils.run_batch_from_simlib(specs, simlib = tmp_path, processes = 2, progress = False, file_extension = 'custom')
+
+    assert sorted(report.finished) == ['0', '1', '2']
+    assert sorted(path.name for path in tmp_path.glob('*.custom')) == ['0.custom', '1.custom', '2.custom']
+    assert si.utils.SimlibIndex(tmp_path).finished(file_extension = 'custom') == {'0', '1', '2'}
+
+
+def test_does_not_reuse_sims_by_contents_by_default(tmp_path, specs, mocker):
+    si.utils.SimlibIndex(tmp_path, create = True)
+    si.utils.run_from_simlib(specs[0], simlib = tmp_path)
+
+    run = mocker.spy(IndexedSimulation, 'run')
+    si.utils.run_from_simlib(IndexedSpecification('renamed', n = 0), simlib = tmp_path)
+    changed = si.utils.run_from_simlib(IndexedSpecification('spec_0', file_name = '0', n = 100), simlib = tmp_path)
+
+    assert run.call_count == 1
+    assert changed.spec == specs[0]  # the finished Simulation, loaded as it was
+
+
+def test_finished_sim_with_same_name_and_different_contents_is_not_replaced(tmp_path, specs):
+    si.utils.SimlibIndex(tmp_path, create = True)
+    original = si.utils.run_from_simlib(specs[0], simlib = tmp_path)
+
+    changed = IndexedSpecification('spec_0', file_name = '0', n = 100)
+    with pytest.raises(si.exceptions.MismatchedSimulation):
+        si.utils.run_from_simlib(changed, simlib = tmp_path, match_contents = True)
+
+    assert si.Simulation.load(tmp_path / '0.sim').uuid == original.uuid
+
+    sim = si.utils.find_or_init_sim_from_spec(changed, search_dir = tmp_path, match_contents = True, replace_mismatched = True)
+
+    assert sim.status == si.Status.INITIALIZED
+    assert sim.spec is changed
+
+
+def test_batch_reports_finished_sims_with_different_contents_as_failed(tmp_path, specs):
+    si.utils.run_batch_from_simlib(specs[:1], tmp_path, processes = 1, progress = False)
+    original = si.Simulation.load(tmp_path / '0.sim')
+
+    changed = IndexedSpecification('spec_0', file_name = '0', n = 100)
+    report = si.utils.run_batch_from_simlib([changed], tmp_path, processes = 1, progress = False, match_contents = True)
+
+    assert report.finished == []
+    assert list(report.failed) == ['0']
+    assert si.Simulation.load(tmp_path / '0.sim').uuid == original.uuid
+
+    report = si.utils.run_batch_from_simlib([changed], tmp_path, processes = 1, progress = False, match_contents = True, replace_mismatched = True)
+
+    assert report.finished == ['0']
+    assert si.Simulation.load(tmp_path / '0.sim').spec.n == 100
+
+
+def test_index_migration_adds_spec_hash(tmp_path, specs):
+    import sqlite3
+
+    connection = sqlite3.connect(str(tmp_path / si.utils.SIMLIB_INDEX))
+    connection.execute('CREATE TABLE sims (name TEXT PRIMARY KEY, file_name TEXT NOT NULL, file_extension TEXT NOT NULL, uuid TEXT, status TEXT, mtime REAL)')
+    connection.commit()
+    connection.close()
+
+    index = si.utils.SimlibIndex(tmp_path)
+    sim = specs[0].to_sim()
+    sim.save(target_dir = tmp_path)
+
+    assert index.get('0').spec_hash == specs[0].content_hash()
+
+
+def test_batch_runs_each_contents_once(tmp_path, mocker):
+    specs = [IndexedSpecification(f'spec_{n}', file_name = str(n), n = n % 2) for n in range(6)]
+
+    report = si.utils.run_batch_from_simlib(specs, tmp_path, processes = 3, progress = False, match_contents = True)
+
+    assert sorted(report.finished) == [str(n) for n in range(6)]
+    assert report.skipped == []  # the ones that reused a Simulation are reported as finished
+    uuids = {si.Simulation.load(tmp_path / f'{n}.sim').uuid for n in range(6)}
+    assert len(uuids) == 6
+    starts = {si.Simulation.load(tmp_path / f'{n}.sim').start_time for n in range(6)}
+    assert len(starts) == 2  # only two were actually run
@@ -1,5 +1,11 @@
+import gc
+import threading
+import weakref
+
 import pytest
 
+import numpy as np
+
 import simulacra as si
 
 
@@ -105,3 +111,151 @@ def test_watched_memoize(mocker):
 
     assert f.method(0) == 4
     assert func.call_count == 4
+
+
+def test_instances_have_separate_memos(mocker):
+    a, b = Foo(), Foo()
+    a.inner = mocker.MagicMock()
+    b.inner = mocker.MagicMock()
+    b.w = False
+
+    for _ in range(3):
+        a.memoized(1)
+        b.memoized(1)
+
+    assert a.inner.call_count == b.inner.call_count == 1
+
+
+def test_memos_do_not_keep_instances_alive():
+    foo = Foo()
+    foo.inner = lambda x: x
+    foo.memoized(1)
+
+    ref = weakref.ref(foo)
+    del foo
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_keeps_memos_for_recent_watched_values(mocker):
+    class Animator:
+        def __init__(self):
+            self.frame = 0
+            self.inner = mocker.MagicMock()
+
+        @si.utils.watched_memoize(lambda s: s.frame, states = 2)
+        def memoized(self, x):
+            return self.inner(x)
+
+    animator = Animator()
+    for frame in (0, 1, 0, 1, 0):
+        animator.frame = frame
+        animator.memoized(1)
+
+    assert animator.inner.call_count == 2
+
+    animator.frame = 2  # evicts the memo for frame 1, the least recently used
+    animator.memoized(1)
+    animator.frame = 1
+    animator.memoized(1)
+
+    assert animator.inner.call_count == 4
+
+
+def test_concurrent_calls(mocker):
+    foo = Foo()
+    foo.inner = mocker.MagicMock(side_effect = lambda x: x)
+
+    wrong = []
+
+    def hammer(n):
+        for x in range(50):
+            if foo.memoized(x) != x:
+                wrong.append(x)
+            if n == 0 and x % 10 == 0:
+                foo.w = not foo.w
+
+    threads = [threading.Thread(target = hammer, args = (n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert wrong == []
+    assert foo.inner.call_count >= 50
+
+
+class Unhashable:
+    __hash__ = None
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def test_unhashable_watched_values_are_compared_by_equality(mocker):
+    inner = mocker.MagicMock(return_value = 'result')
+
+    class Watched:
+        def __init__(self):
+            self.state = Unhashable(1)
+
+        @si.utils.watched_memoize(lambda s: s.state)
+        def memoized(self, x):
+            return inner(x)
+
+    watched = Watched()
+    watched.memoized(1)
+    watched.state = Unhashable(1)  # equal, but not the same object
+    watched.memoized(1)
+
+    assert inner.call_count == 1
+
+    watched.state = Unhashable(2)
+    watched.memoized(1)
+
+    assert inner.call_count == 2
+
+
+def test_watched_values_holding_arrays_are_compared_by_contents(mocker):
+    inner = mocker.MagicMock(return_value = 'result')
+
+    class Watched:
+        def __init__(self):
+            self.state = [np.arange(3), Unhashable(1)]
+
+        @si.utils.watched_memoize(lambda s: s.state)
+        def memoized(self, x):
+            return inner(x)
+
+    watched = Watched()
+    watched.memoized(1)
+    watched.state = [np.arange(3), Unhashable(1)]
+    watched.memoized(1)
+
+    assert inner.call_count == 1
+
+    watched.state = [np.arange(4), Unhashable(1)]
+    watched.memoized(1)
+
+    assert inner.call_count == 2
+
+
+def test_memos_for_unreferenceable_instances_are_bounded():
+    class Slotted:
+        __slots__ = ('w',)
+
+        def __init__(self):
+            self.w = True
+
+        @si.utils.watched_memoize(lambda s: s.w)
+        def memoized(self, x):
+            return x
+
+    for _ in range(si.utils.MAX_UNREFERENCEABLE_INSTANCES + 10):
+        Slotted().memoized(1)
+
+    assert len(Slotted.__dict__['memoized'].unreferenceable_memos) == si.utils.MAX_UNREFERENCEABLE_INSTANCES